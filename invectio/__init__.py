@@ -23,13 +23,45 @@ __email__ = "fridex.devel@gmail.com"
 __title__ = "invectio"
 
 
-from .lib import gather_library_usage  # noqa: F401
-from .lib import gather_symbols_provided  # noqa: F401
+from .diff import diff_paths  # noqa: F401
+from .diff import diff_reports  # noqa: F401
+from .environment import gather_symbols_provided_env  # noqa: F401
+from .gather import gather_library_usage  # noqa: F401
+from .gather import gather_library_usage_from_sources  # noqa: F401
+from .gather import gather_symbols_provided  # noqa: F401
+from .gather import gather_symbols_provided_from_sources  # noqa: F401
+from .gather import iter_library_usage  # noqa: F401
+from .gather import iter_library_usage_from_sources  # noqa: F401
+from .gather import iter_library_usage_results  # noqa: F401
+from .gather import iter_library_usage_results_from_sources  # noqa: F401
+from .gather import iter_symbols_provided_results  # noqa: F401
+from .gather import iter_symbols_provided_results_from_sources  # noqa: F401
 from .lib import get_standard_imports  # noqa: F401
+from .plugins import InvectioPlugin  # noqa: F401
+from .plugins import get_plugins  # noqa: F401
+from .plugins import register_plugin  # noqa: F401
+from .result import LibraryUsage  # noqa: F401
+from .result import SymbolsProvided  # noqa: F401
 
 
 __all__ = [
+    "InvectioPlugin",
+    "LibraryUsage",
+    "SymbolsProvided",
+    "diff_paths",
+    "diff_reports",
     "gather_library_usage",
+    "gather_library_usage_from_sources",
     "gather_symbols_provided",
+    "gather_symbols_provided_env",
+    "gather_symbols_provided_from_sources",
+    "get_plugins",
     "get_standard_imports",
+    "iter_library_usage",
+    "iter_library_usage_from_sources",
+    "iter_library_usage_results",
+    "iter_library_usage_results_from_sources",
+    "iter_symbols_provided_results",
+    "iter_symbols_provided_results_from_sources",
+    "register_plugin",
 ]
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Aggregate library usage of files into usage of directories or top-level packages."""
+
+import os
+from pathlib import Path
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+
+import attr
+
+AGGREGATE_MODES = ("directory", "package")
+
+
+def get_aggregate_key(file_name: str, aggregate: str, root: str = "") -> str:
+    """Get the directory or the top-level package (a directory in the root) usage of the given file is aggregated to.
+
+    Keys are paths like file names are, files stored directly in the root are aggregated to the root.
+    """
+    if aggregate not in AGGREGATE_MODES:
+        raise ValueError(
+            f"Unknown aggregation {aggregate!r}, expected one of {', '.join(AGGREGATE_MODES)}",
+        )
+
+    directory = Path(os.path.relpath(file_name, root or os.curdir)).parent
+    if aggregate == "package" and directory.parts:
+        directory = Path(directory.parts[0])
+
+    return os.path.normpath(os.path.join(root, directory))
+
+
+def merge_usage(
+    usage: Dict[str, List[str]],
+    other_usage: Dict[str, List[str]],
+) -> Dict[str, List[str]]:
+    """Merge two reports of aggregated library usage of the same key (e.g. found in different shards)."""
+    result = dict(usage)
+    for module, symbols in other_usage.items():
+        result[module] = sorted(set(result.get(module, ())).union(symbols))
+
+    return {module: result[module] for module in sorted(result)}
+
+
+def merge_counts(
+    counts: Dict[str, int],
+    other_counts: Dict[str, int],
+) -> Dict[str, int]:
+    """Merge two aggregated counts of symbol usages of the same key, counts of the same symbol are summed."""
+    result = dict(counts)
+    for symbol, count in other_counts.items():
+        result[symbol] = result.get(symbol, 0) + count
+
+    return result
+
+
+@attr.s(slots=True)
+class UsageAggregator:
+    """Merge library usage of files into usage of directories or top-level packages as files are analyzed.
+
+    Only merged sets are kept, reports of files are not needed once they are added.
+    """
+
+    aggregate = attr.ib(type=str, validator=attr.validators.in_(AGGREGATE_MODES))
+    root = attr.ib(type=str, default="")
+    usage = attr.ib(type=Dict[str, Dict[str, Set[str]]], factory=dict)
+    counts = attr.ib(type=Dict[str, Dict[str, int]], factory=dict)
+
+    def add(
+        self,
+        file_name: str,
+        file_report: Dict[str, List[str]],
+        file_counts: Optional[Dict[str, int]] = None,
+    ) -> None:
+        """Merge library usage of a file, number of usages of symbols are summed if given."""
+        key = get_aggregate_key(file_name, self.aggregate, self.root)
+        usage = self.usage.setdefault(key, {})
+        for module, symbols in file_report.items():
+            usage.setdefault(module, set()).update(symbols)
+
+        if file_counts is not None:
+            counts = self.counts.setdefault(key, {})
+            for symbol, count in file_counts.items():
+                counts[symbol] = counts.get(symbol, 0) + count
+
+    def get_report(self) -> Dict[str, Dict[str, List[str]]]:
+        """Get aggregated library usage in the same shape as reports of files are."""
+        return {
+            key: {module: sorted(symbols) for module, symbols in sorted(usage.items())}
+            for key, usage in sorted(self.usage.items())
+        }
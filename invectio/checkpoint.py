@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Journal results of long-running scans so that interrupted scans can be resumed."""
+
+import json
+import logging
+import os
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Set
+from typing import TextIO
+from typing import Tuple
+from typing import Type
+
+import attr
+
+from invectio import __version__ as invectio_version
+from .gather import _create_result
+from .gather import _store_counts_locations
+from .gather import iter_library_usage
+from .metrics import ScanMetrics
+from .plugins import InvectioPlugin
+
+_LOGGER = logging.getLogger(__name__)
+_CHECKPOINT_FORMAT = 1
+
+
+@attr.s(slots=True)
+class _Journal:
+    """An append-only newline delimited JSON journal of results of files analyzed.
+
+    The first line is a header describing the scan, each following line is a record of a single file with
+    "key" (file name) and either "report" (together with "counts", "locations" and "plugins" if requested)
+    or "error" entries.
+    """
+
+    file_path = attr.ib(type=str)
+    header = attr.ib(type=Dict[str, Any])
+    report = attr.ib(type=Dict[str, Dict[str, List[str]]], factory=dict)
+    errors = attr.ib(type=Dict[str, str], factory=dict)
+    counts = attr.ib(type=Dict[str, Dict[str, int]], factory=dict)
+    locations = attr.ib(type=Dict[str, Dict[str, Dict[str, List[int]]]], factory=dict)
+    plugin_reports = attr.ib(type=Dict[str, Dict[str, Any]], factory=dict)
+    _output = attr.ib(type=Optional[TextIO], default=None, init=False)
+
+    def _restore(self, record: Dict[str, Any]) -> None:
+        """Restore results of a single file from a record."""
+        key = record["key"]
+        if "error" in record:
+            self.errors[key] = record["error"]
+            return
+
+        self.report[key] = record["report"]
+        if "counts" in record:
+            self.counts[key] = record["counts"]
+        if "locations" in record:
+            self.locations[key] = record["locations"]
+        for plugin_name, plugin_report in record.get("plugins", {}).items():
+            self.plugin_reports.setdefault(plugin_name, {})[key] = plugin_report
+
+    def _load(self) -> int:
+        """Load records journaled by a previous run, return size of the valid part of the journal.
+
+        A record not terminated by a newline was not fully written (e.g. the process was killed), it is discarded.
+        """
+        try:
+            journal_file = open(self.file_path, "rb")
+        except FileNotFoundError:
+            return 0
+
+        size = 0
+        with journal_file:
+            for line in journal_file:
+                if not line.endswith(b"\n"):
+                    _LOGGER.warning(
+                        "Discarding truncated record at the end of checkpoint %r",
+                        self.file_path,
+                    )
+                    break
+
+                try:
+                    record = json.loads(line)
+                except ValueError as exc:
+                    raise ValueError(
+                        f"Checkpoint {self.file_path!r} is corrupted at offset {size}",
+                    ) from exc
+
+                if size == 0:
+                    if record != self.header:
+                        raise ValueError(
+                            f"Checkpoint {self.file_path!r} was created by a scan with different options "
+                            f"or a different version of Invectio",
+                        )
+                else:
+                    self._restore(record)
+
+                size += len(line)
+
+        return size
+
+    def open(self) -> None:
+        """Load the journal if it exists and open it for appending, the journal is created otherwise."""
+        size = self._load()
+        if size == 0:
+            self._output = open(self.file_path, "w")
+            self._output.write(json.dumps(self.header, sort_keys=True))
+            self._output.write("\n")
+            self._output.flush()
+            return
+
+        _LOGGER.info(
+            "Resuming from checkpoint %r, %d files already analyzed",
+            self.file_path,
+            len(self.report) + len(self.errors),
+        )
+        os.truncate(self.file_path, size)
+        self._output = open(self.file_path, "a")
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """Append a record of a file analyzed, the record is flushed so it survives the process being killed."""
+        if self._output is None:
+            raise ValueError(f"Checkpoint {self.file_path!r} is not open")
+
+        self._output.write(json.dumps(record, sort_keys=True))
+        self._output.write("\n")
+        self._output.flush()
+        self._restore(record)
+
+    def close(self) -> None:
+        """Sync the journal to disk and close it."""
+        if self._output is None:
+            return
+
+        os.fsync(self._output.fileno())
+        self._output.close()
+        self._output = None
+
+    def get_keys(self) -> Set[str]:
+        """Get names of files journaled."""
+        return self.report.keys() | self.errors.keys()
+
+
+def _write_errors(journal: _Journal, errors: Dict[str, str]) -> None:
+    """Journal errors of files that failed to parse since the last call, errors journaled are removed."""
+    for file_name in list(errors):
+        journal.write({"key": file_name, "error": errors.pop(file_name)})
+
+
+def _get_header(path: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Create a header of the journal describing the scan, a journal can be resumed only by the same scan."""
+    return {
+        "checkpoint": _CHECKPOINT_FORMAT,
+        # Round-trip to compare with headers loaded (e.g. tuples become lists).
+        "options": json.loads(json.dumps({"path": path, **options})),
+        "version": invectio_version,
+    }
+
+
+def gather_library_usage_checkpoint(
+    path: str,
+    checkpoint: str,
+    *,
+    ignore_errors: bool = False,
+    without_standard_imports: bool = False,
+    without_builtin_imports: bool = False,
+    without_builtins: bool = False,
+    scope_aware: bool = False,
+    target_python: Optional[str] = None,
+    fallback_parser: Optional[str] = None,
+    plugins: Optional[Sequence[Type[InvectioPlugin]]] = None,
+    shard: Optional[Tuple[int, int]] = None,
+    with_counts: bool = False,
+    with_locations: bool = False,
+    metrics: Optional[ScanMetrics] = None,
+) -> Dict[str, Any]:
+    """Gather library usage as `gather_library_usage` does, results of each file are journaled to the checkpoint.
+
+    If the checkpoint exists, files journaled by a previous (interrupted) run are not analyzed again and the
+    result is the same as the result of an uninterrupted run. A checkpoint can be resumed only with the same
+    path and options.
+    """
+    journal = _Journal(
+        checkpoint,
+        _get_header(
+            path,
+            {
+                "fallback_parser": fallback_parser,
+                "ignore_errors": ignore_errors,
+                "plugins": sorted(plugin.name for plugin in plugins)
+                if plugins
+                else None,
+                "scope_aware": scope_aware,
+                "shard": shard,
+                "target_python": target_python,
+                "with_counts": with_counts,
+                "with_locations": with_locations,
+                "without_builtin_imports": without_builtin_imports,
+                "without_builtins": without_builtins,
+                "without_standard_imports": without_standard_imports,
+            },
+        ),
+    )
+    journal.open()
+    try:
+        errors: Dict[str, str] = {}
+        plugin_reports: Dict[str, Dict[str, Any]] = {}
+        counts: Dict[str, Dict[str, int]] = {}
+        locations: Dict[str, Dict[str, Dict[str, List[int]]]] = {}
+        for file_name, file_report in iter_library_usage(
+            path,
+            ignore_errors=ignore_errors,
+            without_standard_imports=without_standard_imports,
+            without_builtin_imports=without_builtin_imports,
+            without_builtins=without_builtins,
+            scope_aware=scope_aware,
+            target_python=target_python,
+            fallback_parser=fallback_parser,
+            errors=errors,
+            plugins=plugins,
+            plugin_reports=plugin_reports,
+            shard=shard,
+            counts=counts if with_counts else None,
+            locations=locations if with_locations else None,
+            metrics=metrics,
+            exclude=journal.get_keys(),
+        ):
+            record: Dict[str, Any] = {"key": file_name, "report": file_report}
+            if with_counts:
+                record["counts"] = counts.pop(file_name)
+            if with_locations:
+                record["locations"] = locations.pop(file_name)
+            if plugins:
+                record["plugins"] = {
+                    plugin_name: reports.pop(file_name)
+                    for plugin_name, reports in plugin_reports.items()
+                    if file_name in reports
+                }
+            journal.write(record)
+            _write_errors(journal, errors)
+
+        _write_errors(journal, errors)
+    finally:
+        journal.close()
+
+    result = _create_result(
+        journal.report,
+        journal.errors,
+        plugins,
+        journal.plugin_reports,
+    )
+    _store_counts_locations(
+        result,
+        journal.counts if with_counts else None,
+        journal.locations if with_locations else None,
+    )
+    return result
@@ -17,17 +17,49 @@
 
 """A command line interface to Invectio."""
 
+import os
 import sys
 import logging
 import json
+import signal
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import TextIO
+from typing import Tuple
+from typing import Union
 
 import click
 import daiquiri
 
 from invectio import __version__
 from invectio import __title__
+from invectio import diff_paths
+from invectio import diff_reports
 from invectio import gather_library_usage
 from invectio import gather_symbols_provided
+from invectio import gather_symbols_provided_env
+from invectio import get_plugins
+from invectio import iter_library_usage
+from invectio.aggregate import AGGREGATE_MODES
+from invectio.checkpoint import gather_library_usage_checkpoint
+from invectio.environment import annotate_distributions
+from invectio.environment import get_import_index
+from invectio.environment import load_import_index
+from invectio.git import gather_library_usage_git
+from invectio.graph import iter_usage_edges
+from invectio.graph import write_edge_list
+from invectio.graph import write_graphml
+from invectio.metrics import ScanMetrics
+from invectio.query import find_library_usage
+from invectio.sampling import gather_library_usage_sample
+from invectio.sampling import parse_sample
+from invectio.shard import merge_shards
+from invectio.shard import parse_shard
+from invectio.shard import write_ndjson
+from invectio.watch import LibraryUsageWatch
+from invectio.watch import UsageIndex
 
 daiquiri.setup(level=logging.INFO)
 
@@ -78,6 +110,41 @@ def cli(
     _LOGGER.debug("Version: %s", __version__)
 
 
+def _write_usage_graph(
+    file_reports: Iterable[Tuple[str, Dict[str, List[str]]]],
+    output: TextIO,
+    output_format: str,
+) -> None:
+    """Write library usage as a graph in the requested format."""
+    edges = iter_usage_edges(file_reports)
+    if output_format == "csv":
+        write_edge_list(edges, output)
+    else:
+        write_graphml(edges, output)
+
+
+def _parse_shard(ctx, _, value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Parse shard option given as K/N."""
+    if value is None:
+        return None
+
+    try:
+        return parse_shard(value)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc))
+
+
+def _parse_sample(ctx, _, value: Optional[str]) -> Optional[Union[float, int]]:
+    """Parse sample option given as a fraction or as a number of files."""
+    if value is None:
+        return None
+
+    try:
+        return parse_sample(value)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc))
+
+
 @cli.command()
 @click.argument("path")
 @click.option(
@@ -104,26 +171,372 @@ def cli(
     show_default=True,
     help="Do not report usage of Python's builtins.",
 )
+@click.option(
+    "--scope-aware/--no-scope-aware",
+    is_flag=True,
+    show_default=True,
+    help="Resolve names per scope so that local names shadowing imports are not reported.",
+)
+@click.option(
+    "--target-python",
+    type=str,
+    metavar="MAJOR.MINOR",
+    help="Parse sources using grammar of the given Python version.",
+)
+@click.option(
+    "--fallback-parser",
+    type=str,
+    metavar="MODULE:CALLABLE",
+    help="Parser used in worker processes for sources that fail to parse, called with source code and file name.",
+)
+@click.option(
+    "--output-format",
+    "-f",
+    type=click.Choice(["json", "ndjson", "csv", "graphml"]),
+    default="json",
+    show_default=True,
+    help="Format of the output; ndjson writes one record per file (mergeable using merge command), "
+    "csv and graphml produce a file -> module -> symbol graph written in a streaming way.",
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.File("w"),
+    default="-",
+    show_default=True,
+    help="File to write the output to.",
+)
+@click.option(
+    "--git-diff",
+    type=str,
+    metavar="REV_RANGE",
+    help="Analyze only Python files changed in the given revision range, PATH points to a git repository.",
+)
+@click.option(
+    "--base-report",
+    type=click.File("r"),
+    help="A report to merge results of --git-diff into.",
+)
+@click.option(
+    "--distributions/--no-distributions",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Annotate used modules with distributions installed in the current environment providing them.",
+)
+@click.option(
+    "--distribution-mapping",
+    type=click.File("r"),
+    help="A JSON file mapping import names to distribution names used to annotate used modules.",
+)
+@click.option(
+    "--with-plugins/--without-plugins",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Run plugins registered using the invectio.plugins entry point group in the same traversal.",
+)
+@click.option(
+    "--shard",
+    type=str,
+    metavar="K/N",
+    callback=_parse_shard,
+    help="Analyze only the K-th of N shards, files are assigned to shards based on a stable hash of their path.",
+)
+@click.option(
+    "--sample",
+    type=str,
+    metavar="FRACTION|COUNT",
+    callback=_parse_sample,
+    help="Analyze only a random sample of files and estimate usage frequency of modules and symbols.",
+)
+@click.option(
+    "--seed",
+    type=int,
+    help="Seed used to draw the sample, a random one is used (and reported) if not provided.",
+)
+@click.option(
+    "--stratify/--no-stratify",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Sample files proportionally from each top-level directory.",
+)
+@click.option(
+    "--confidence",
+    type=click.FloatRange(0.0, 1.0, min_open=True, max_open=True),
+    default=0.95,
+    show_default=True,
+    help="Confidence level of intervals reported for estimates computed from a sample.",
+)
+@click.option(
+    "--with-counts/--without-counts",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Report number of usages of each symbol per file under the counts key.",
+)
+@click.option(
+    "--with-locations/--without-locations",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Report delta-encoded line numbers and columns of symbol usages per file under the locations key.",
+)
+@click.option(
+    "--progress/--no-progress",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Report number of files processed, throughput and ETA on standard error.",
+)
+@click.option(
+    "--metrics-file",
+    type=str,
+    metavar="FILE",
+    help="Write scan metrics in Prometheus text format to the given file during the scan.",
+)
+@click.option(
+    "--metrics-port",
+    type=click.IntRange(0, 65535),
+    metavar="PORT",
+    help="Expose scan metrics in Prometheus text format over HTTP on the given port during the scan.",
+)
+@click.option(
+    "--checkpoint",
+    type=str,
+    metavar="FILE",
+    help="Journal results of each file analyzed to the given file, an interrupted scan is resumed from it.",
+)
+@click.option(
+    "--aggregate",
+    type=click.Choice(AGGREGATE_MODES),
+    help="Report usage merged per directory or per top-level package instead of usage of each file.",
+)
 def whatuses(
     path: str,
+    output: TextIO,
     ignore_errors: bool = False,
     without_standard_imports: bool = False,
     without_builtin_imports: bool = False,
     without_builtins: bool = False,
+    scope_aware: bool = False,
+    target_python: Optional[str] = None,
+    fallback_parser: Optional[str] = None,
+    output_format: str = "json",
+    git_diff: Optional[str] = None,
+    base_report: Optional[TextIO] = None,
+    distributions: bool = False,
+    distribution_mapping: Optional[TextIO] = None,
+    with_plugins: bool = False,
+    shard: Optional[Tuple[int, int]] = None,
+    sample: Optional[Union[float, int]] = None,
+    seed: Optional[int] = None,
+    stratify: bool = False,
+    confidence: float = 0.95,
+    with_counts: bool = False,
+    with_locations: bool = False,
+    progress: bool = False,
+    metrics_file: Optional[str] = None,
+    metrics_port: Optional[int] = None,
+    checkpoint: Optional[str] = None,
+    aggregate: Optional[str] = None,
 ) -> None:
     """Gather information about symbol usage by a module or a source file."""
-    result = gather_library_usage(
-        path,
-        ignore_errors=ignore_errors,
-        without_standard_imports=without_standard_imports,
-        without_builtin_imports=without_builtin_imports,
-        without_builtins=without_builtins,
+    if base_report is not None and git_diff is None:
+        raise click.BadParameter("Base report can be used only with --git-diff")
+
+    if shard is not None and git_diff is not None:
+        raise click.BadParameter("Sharding cannot be used with --git-diff")
+
+    metrics = None
+    if progress or metrics_file is not None or metrics_port is not None:
+        if git_diff is not None or sample is not None:
+            raise click.BadParameter(
+                "Metrics cannot be used with --git-diff or --sample",
+            )
+
+        metrics = ScanMetrics(
+            progress=sys.stderr if progress else None,
+            textfile=metrics_file,
+        )
+
+    if checkpoint is not None and (git_diff is not None or sample is not None):
+        raise click.BadParameter(
+            "Checkpoints cannot be used with --git-diff or --sample",
+        )
+
+    if aggregate is not None:
+        if git_diff is not None or sample is not None or checkpoint is not None:
+            raise click.BadParameter(
+                "Aggregation cannot be used with --git-diff, --sample or --checkpoint",
+            )
+
+        if with_locations:
+            raise click.BadParameter(
+                "Locations cannot be reported if usage is aggregated",
+            )
+
+        if with_plugins:
+            raise click.BadParameter("Plugins cannot be run if usage is aggregated")
+
+    if (with_plugins or distributions or distribution_mapping is not None) and (
+        sample is not None or output_format not in ("json", "ndjson")
+    ):
+        raise click.BadParameter(
+            "Plugins and distributions cannot be used with --sample or graph output formats",
+        )
+
+    if with_plugins and git_diff is not None:
+        raise click.BadParameter("Plugins cannot be used with --git-diff")
+
+    if (with_counts or with_locations) and (
+        git_diff is not None
+        or sample is not None
+        or output_format not in ("json", "ndjson")
+    ):
+        raise click.BadParameter(
+            "Counts and locations cannot be used with --git-diff, --sample or graph output formats",
+        )
+
+    if sample is not None:
+        if git_diff is not None or shard is not None or output_format != "json":
+            raise click.BadParameter(
+                "Sampling cannot be used with --git-diff, --shard or output formats other than json",
+            )
+
+        result = gather_library_usage_sample(
+            path,
+            sample,
+            seed=seed,
+            stratify=stratify,
+            confidence=confidence,
+            ignore_errors=ignore_errors,
+            without_standard_imports=without_standard_imports,
+            without_builtin_imports=without_builtin_imports,
+            without_builtins=without_builtins,
+            scope_aware=scope_aware,
+            target_python=target_python,
+        )
+        click.echo(json.dumps(result, indent=2, sort_keys=True), file=output)
+        return
+
+    import_index = None
+    if distribution_mapping is not None:
+        import_index = load_import_index(distribution_mapping)
+    elif distributions:
+        import_index = get_import_index()
+
+    if git_diff is not None:
+        result = gather_library_usage_git(
+            git_diff,
+            repo=path,
+            base_report=json.load(base_report) if base_report else None,
+            ignore_errors=ignore_errors,
+            without_standard_imports=without_standard_imports,
+            without_builtin_imports=without_builtin_imports,
+            without_builtins=without_builtins,
+            scope_aware=scope_aware,
+            target_python=target_python,
+        )
+        if import_index is not None:
+            annotate_distributions(result, import_index)
+
+        if output_format == "json":
+            click.echo(json.dumps(result, indent=2, sort_keys=True), file=output)
+        elif output_format == "ndjson":
+            write_ndjson(result, output)
+        else:
+            _write_usage_graph(result["report"].items(), output, output_format)
+        return
+
+    server = (
+        metrics.serve(metrics_port)
+        if metrics is not None and metrics_port is not None
+        else None
     )
-    click.echo(json.dumps(result, indent=2, sort_keys=True))
+    try:
+        if (
+            output_format not in ("json", "ndjson")
+            and checkpoint is None
+            and aggregate is None
+        ):
+            _write_usage_graph(
+                iter_library_usage(
+                    path,
+                    ignore_errors=ignore_errors,
+                    without_standard_imports=without_standard_imports,
+                    without_builtin_imports=without_builtin_imports,
+                    without_builtins=without_builtins,
+                    scope_aware=scope_aware,
+                    target_python=target_python,
+                    fallback_parser=fallback_parser,
+                    shard=shard,
+                    metrics=metrics,
+                ),
+                output,
+                output_format,
+            )
+            return
+
+        if checkpoint is not None:
+            try:
+                result = gather_library_usage_checkpoint(
+                    path,
+                    checkpoint,
+                    ignore_errors=ignore_errors,
+                    without_standard_imports=without_standard_imports,
+                    without_builtin_imports=without_builtin_imports,
+                    without_builtins=without_builtins,
+                    scope_aware=scope_aware,
+                    target_python=target_python,
+                    fallback_parser=fallback_parser,
+                    plugins=get_plugins() if with_plugins else None,
+                    shard=shard,
+                    with_counts=with_counts,
+                    with_locations=with_locations,
+                    metrics=metrics,
+                )
+            except ValueError as exc:
+                raise click.ClickException(str(exc))
+        else:
+            result = gather_library_usage(
+                path,
+                ignore_errors=ignore_errors,
+                without_standard_imports=without_standard_imports,
+                without_builtin_imports=without_builtin_imports,
+                without_builtins=without_builtins,
+                scope_aware=scope_aware,
+                target_python=target_python,
+                fallback_parser=fallback_parser,
+                plugins=get_plugins() if with_plugins else None,
+                shard=shard,
+                with_counts=with_counts,
+                with_locations=with_locations,
+                metrics=metrics,
+                aggregate=aggregate,
+            )
+    finally:
+        if metrics is not None:
+            metrics.report(final=True)
+        if server is not None:
+            server.shutdown()
+
+    if output_format not in ("json", "ndjson"):
+        _write_usage_graph(sorted(result["report"].items()), output, output_format)
+        return
+
+    if import_index is not None:
+        annotate_distributions(result, import_index)
+
+    if output_format == "ndjson":
+        write_ndjson(result, output)
+    else:
+        click.echo(json.dumps(result, indent=2, sort_keys=True), file=output)
 
 
 @cli.command()
-@click.argument("path")
+@click.argument("path", required=False)
 @click.option(
     "--ignore-errors/--no-ignore-errors",
     is_flag=True,
@@ -137,18 +550,345 @@ def whatuses(
     show_default=True,
     help="Ignore syntax or parsing errors for Python files.",
 )
+@click.option(
+    "--target-python",
+    type=str,
+    metavar="MAJOR.MINOR",
+    help="Parse sources using grammar of the given Python version.",
+)
+@click.option(
+    "--fallback-parser",
+    type=str,
+    metavar="MODULE:CALLABLE",
+    help="Parser used in worker processes for sources that fail to parse, called with source code and file name.",
+)
+@click.option(
+    "--environment",
+    is_flag=True,
+    default=False,
+    help="Gather symbols provided by installed distributions, PATH optionally points to a site-packages directory.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=int,
+    help="Number of worker processes used to process distributions with --environment.",
+)
+@click.option(
+    "--with-plugins/--without-plugins",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Run plugins registered using the invectio.plugins entry point group in the same traversal.",
+)
+@click.option(
+    "--shard",
+    type=str,
+    metavar="K/N",
+    callback=_parse_shard,
+    help="Analyze only the K-th of N shards, files (distributions with --environment) are assigned to shards "
+    "based on a stable hash of their path (name).",
+)
+@click.option(
+    "--output-format",
+    "-f",
+    type=click.Choice(["json", "ndjson"]),
+    default="json",
+    show_default=True,
+    help="Format of the output; ndjson writes one record per file (distribution) mergeable using merge command.",
+)
 def whatprovides(
-    path: str,
+    path: Optional[str],
     ignore_errors: bool = False,
     include_private: bool = False,
+    target_python: Optional[str] = None,
+    fallback_parser: Optional[str] = None,
+    environment: bool = False,
+    jobs: Optional[int] = None,
+    with_plugins: bool = False,
+    shard: Optional[Tuple[int, int]] = None,
+    output_format: str = "json",
 ) -> None:
     """Gather information about symbols provided by a module or a source file."""
-    result = gather_symbols_provided(
+    if environment:
+        result = gather_symbols_provided_env(
+            [path] if path else None,
+            ignore_errors=ignore_errors,
+            include_private=include_private,
+            target_python=target_python,
+            fallback_parser=fallback_parser,
+            plugins=get_plugins() if with_plugins else None,
+            jobs=jobs,
+            shard=shard,
+        )
+    elif path is None:
+        raise click.BadParameter(
+            "Path to sources has to be provided",
+            param_hint="PATH",
+        )
+    else:
+        result = gather_symbols_provided(
+            path,
+            ignore_errors=ignore_errors,
+            include_private=include_private,
+            target_python=target_python,
+            fallback_parser=fallback_parser,
+            plugins=get_plugins() if with_plugins else None,
+            shard=shard,
+        )
+
+    if output_format == "ndjson":
+        write_ndjson(result, sys.stdout)
+    else:
+        click.echo(json.dumps(result, indent=2, sort_keys=True))
+
+
+def _load_report(path: str) -> Optional[dict]:
+    """Load a report stored in a JSON file, return None if the path does not point to a report."""
+    if not (os.path.isfile(path) and path.endswith(".json")):
+        return None
+
+    with open(path) as report_file:
+        return json.load(report_file)
+
+
+@cli.command()
+@click.argument("old")
+@click.argument("new")
+@click.option(
+    "--whatuses/--whatprovides",
+    "library_usage",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Compare library usage or symbols provided when paths to sources are given.",
+)
+@click.option(
+    "--ignore-errors/--no-ignore-errors",
+    is_flag=True,
+    show_default=True,
+    help="Ignore syntax or parsing errors for Python files.",
+)
+@click.option(
+    "--include-private/--no-include-private",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Include private symbols when comparing symbols provided.",
+)
+def diff(
+    old: str,
+    new: str,
+    library_usage: bool = False,
+    ignore_errors: bool = False,
+    include_private: bool = False,
+) -> None:
+    """Compare two reports (JSON files produced by Invectio) or two paths to sources."""
+    old_report = _load_report(old)
+    new_report = _load_report(new)
+
+    if old_report is not None and new_report is not None:
+        result = diff_reports(old_report, new_report)
+    elif old_report is None and new_report is None:
+        result = diff_paths(
+            old,
+            new,
+            library_usage=library_usage,
+            include_private=include_private,
+            ignore_errors=ignore_errors,
+        )
+    else:
+        raise click.BadParameter(
+            "Both arguments have to be either reports or paths to sources",
+        )
+
+    click.echo(json.dumps(result, indent=2, sort_keys=True))
+
+
+@cli.command()
+@click.argument("symbols", nargs=-1, required=True)
+@click.argument("path")
+@click.option(
+    "--ignore-errors/--no-ignore-errors",
+    is_flag=True,
+    show_default=True,
+    help="Ignore syntax or parsing errors for Python files.",
+)
+@click.option(
+    "--scope-aware/--no-scope-aware",
+    is_flag=True,
+    show_default=True,
+    help="Resolve names per scope so that local names shadowing imports are not reported.",
+)
+@click.option(
+    "--target-python",
+    type=str,
+    metavar="MAJOR.MINOR",
+    help="Parse sources using grammar of the given Python version.",
+)
+def uses(
+    symbols: Tuple[str, ...],
+    path: str,
+    ignore_errors: bool = False,
+    scope_aware: bool = False,
+    target_python: Optional[str] = None,
+) -> None:
+    """Check whether sources use the given symbols, exit with 1 if any of them is not used."""
+    result = find_library_usage(
         path,
+        symbols,
         ignore_errors=ignore_errors,
-        include_private=include_private,
+        scope_aware=scope_aware,
+        target_python=target_python,
     )
     click.echo(json.dumps(result, indent=2, sort_keys=True))
+    if result["missing"]:
+        sys.exit(1)
+
+
+@cli.command()
+@click.argument(
+    "shards",
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.File("w"),
+    default="-",
+    show_default=True,
+    help="File to write the merged report to.",
+)
+def merge(shards: Tuple[str, ...], output: TextIO) -> None:
+    """Merge reports of shards produced using --shard and --output-format ndjson into a single report."""
+    try:
+        merge_shards(list(shards), output)
+    except ValueError as exc:
+        raise click.ClickException(str(exc))
+
+
+def _dump_index(index: UsageIndex, dump_file: str) -> None:
+    """Atomically write the given usage index to a file."""
+    temporary_file = f"{dump_file}.tmp"
+    with open(temporary_file, "w") as output:
+        json.dump(index.to_dict(), output, indent=2, sort_keys=True)
+
+    os.replace(temporary_file, dump_file)
+
+
+@cli.command()
+@click.argument("path")
+@click.option(
+    "--without-standard-imports/--with-standard-imports",
+    is_flag=True,
+    show_default=True,
+    help="Do not report usage of Python's standard library.",
+)
+@click.option(
+    "--without-builtin-imports/--with-builtin-imports",
+    is_flag=True,
+    show_default=True,
+    help="Do not report usage of Python's standard library.",
+)
+@click.option(
+    "--without-builtins/--with-builtins",
+    is_flag=True,
+    show_default=True,
+    help="Do not report usage of Python's builtins.",
+)
+@click.option(
+    "--scope-aware/--no-scope-aware",
+    is_flag=True,
+    show_default=True,
+    help="Resolve names per scope so that local names shadowing imports are not reported.",
+)
+@click.option(
+    "--target-python",
+    type=str,
+    metavar="MAJOR.MINOR",
+    help="Parse sources using grammar of the given Python version.",
+)
+@click.option(
+    "--debounce",
+    type=float,
+    default=0.2,
+    show_default=True,
+    help="Seconds without any change to wait for before changed files are re-analyzed.",
+)
+@click.option(
+    "--polling/--no-polling",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Detect changes by polling instead of using inotify.",
+)
+@click.option(
+    "--dump-file",
+    type=str,
+    help="A JSON file kept up to date with the current usage index.",
+)
+def watch(
+    path: str,
+    without_standard_imports: bool = False,
+    without_builtin_imports: bool = False,
+    without_builtins: bool = False,
+    scope_aware: bool = False,
+    target_python: Optional[str] = None,
+    debounce: float = 0.2,
+    polling: bool = False,
+    dump_file: Optional[str] = None,
+) -> None:
+    """Watch sources and keep library usage index up to date, send SIGUSR1 to print the current index."""
+    dump_requested = False
+
+    def _request_dump(*_) -> None:
+        nonlocal dump_requested
+        dump_requested = True
+
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, _request_dump)
+
+    library_usage_watch = LibraryUsageWatch(
+        path,
+        without_standard_imports=without_standard_imports,
+        without_builtin_imports=without_builtin_imports,
+        without_builtins=without_builtins,
+        scope_aware=scope_aware,
+        target_python=target_python,
+        debounce=debounce,
+        polling=polling,
+    )
+    with library_usage_watch:
+        _LOGGER.info(
+            "Watching %d files in %r",
+            len(library_usage_watch.index.report)
+            + len(library_usage_watch.index.errors),
+            path,
+        )
+        if dump_file:
+            _dump_index(library_usage_watch.index, dump_file)
+
+        try:
+            while True:
+                refreshed = library_usage_watch.step(0.5)
+                if refreshed:
+                    _LOGGER.info("Re-analyzed %d files", len(refreshed))
+                    if dump_file:
+                        _dump_index(library_usage_watch.index, dump_file)
+
+                if dump_requested:
+                    dump_requested = False
+                    click.echo(
+                        json.dumps(
+                            library_usage_watch.index.to_dict(),
+                            indent=2,
+                            sort_keys=True,
+                        ),
+                    )
+        except KeyboardInterrupt:
+            pass
 
 
 __name__ == "__main__" and sys.exit(cli())
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Compare two reports produced by Invectio."""
+
+import logging
+import os
+from collections import defaultdict
+from typing import Any
+from typing import DefaultDict
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Set
+
+from invectio import __version__ as invectio_version
+from .gather import gather_library_usage
+from .lib import InvectioSymbolsProvidedVisitor
+from .sources import _iter_path_sources
+from .sources import _iter_source_ast
+
+_LOGGER = logging.getLogger(__name__)
+
+
+_LIBRARY_USAGE = "library usage"
+_SYMBOLS_PROVIDED = "symbols provided"
+_ENVIRONMENT = "symbols provided by distributions"
+
+
+def _get_report_kind(report: Dict[str, Any]) -> Optional[str]:
+    """Get kind of the given report - whatuses, whatprovides or whatprovides --environment, None if it cannot be told.
+
+    Library usage reports map files to modules and symbols, reports of distributions map distribution names to
+    versions and reports of files.
+    """
+    for value in report.values():
+        if not isinstance(value, dict):
+            return _SYMBOLS_PROVIDED
+
+        for nested_value in value.values():
+            return _ENVIRONMENT if isinstance(nested_value, dict) else _LIBRARY_USAGE
+
+    return None
+
+
+def _index_report(report: Dict[str, Any], kind: Optional[str]) -> Dict[str, Set[str]]:
+    """Index symbols in the given report by modules, symbols provided by all distributions are indexed together."""
+    index: DefaultDict[str, Set[str]] = defaultdict(set)
+
+    if kind == _LIBRARY_USAGE:
+        for file_report in report.values():
+            for module, symbols in file_report.items():
+                index[module].update(symbols)
+        return index
+
+    if kind == _ENVIRONMENT:
+        file_reports: Iterable[List[str]] = (
+            symbols
+            for versions in report.values()
+            for version_report in versions.values()
+            for symbols in version_report.values()
+        )
+    else:
+        file_reports = report.values()
+
+    for symbols in file_reports:
+        for symbol in symbols:
+            index[symbol.rsplit(".", maxsplit=1)[0]].add(symbol)
+
+    return index
+
+
+def _diff_versions(
+    old_report: Dict[str, Dict[str, Any]],
+    new_report: Dict[str, Dict[str, Any]],
+) -> Dict[str, Dict[str, List[str]]]:
+    """Compare versions of distributions in two reports of distributions, report distributions that changed."""
+    result = {}
+    for name in sorted(old_report.keys() | new_report.keys()):
+        old_versions = sorted(old_report.get(name, {}))
+        new_versions = sorted(new_report.get(name, {}))
+        if old_versions != new_versions:
+            result[name] = {"new": new_versions, "old": old_versions}
+
+    return result
+
+
+def diff_reports(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Compare results of two library usage or two symbols provided gatherings.
+
+    Symbols are compared per module, files they were found in are not taken into account. Reports are indexed
+    and compared using sets in time linear in their size, only the differences found are sorted. When comparing
+    symbols provided by distributions installed in two environments, distributions whose versions differ are
+    reported under the "versions" key.
+    """
+    old_report = old.get("report", {})
+    new_report = new.get("report", {})
+    old_kind = _get_report_kind(old_report)
+    new_kind = _get_report_kind(new_report)
+    if old_kind is not None and new_kind is not None and old_kind != new_kind:
+        raise ValueError(f"Cannot compare a {old_kind} report with a {new_kind} report")
+
+    old_index = _index_report(old_report, old_kind)
+    new_index = _index_report(new_report, new_kind)
+
+    added = {}
+    removed = {}
+    for module in old_index.keys() | new_index.keys():
+        old_symbols = old_index.get(module, set())
+        new_symbols = new_index.get(module, set())
+        module_added = new_symbols - old_symbols
+        if module_added:
+            added[module] = sorted(module_added)
+        module_removed = old_symbols - new_symbols
+        if module_removed:
+            removed[module] = sorted(module_removed)
+
+    result = {
+        "added": {module: added[module] for module in sorted(added)},
+        "removed": {module: removed[module] for module in sorted(removed)},
+        "version": invectio_version,
+    }
+    if _ENVIRONMENT in (old_kind, new_kind):
+        result["versions"] = _diff_versions(old_report, new_report)
+
+    return result
+
+
+def _gather_symbols_provided_relative(
+    path: str,
+    *,
+    include_private: bool,
+    ignore_errors: bool,
+) -> Dict[str, Any]:
+    """Gather symbols provided, name modules relative to the given path so that two trees can be compared."""
+    root = path if os.path.isdir(path) else os.path.dirname(path)
+
+    report = {}
+    for python_file, file_ast in _iter_source_ast(
+        _iter_path_sources(path),
+        ignore_errors=ignore_errors,
+    ):
+        file_name = os.path.relpath(str(python_file), root)
+        visitor = InvectioSymbolsProvidedVisitor(
+            file_name=file_name,
+            include_private=include_private,
+        )
+        visitor.visit(file_ast)
+        report[file_name] = sorted(visitor.get_module_report())
+
+    return {"report": report}
+
+
+def diff_paths(
+    old_path: str,
+    new_path: str,
+    *,
+    library_usage: bool = False,
+    include_private: bool = False,
+    ignore_errors: bool = False,
+) -> Dict[str, Any]:
+    """Compare symbols provided (or library usage if requested) by sources found in two paths.
+
+    Symbols provided are named relatively to the given directories.
+    """
+    if library_usage:
+        _LOGGER.debug("Comparing library usage of %r and %r", old_path, new_path)
+        old = gather_library_usage(old_path, ignore_errors=ignore_errors)
+        new = gather_library_usage(new_path, ignore_errors=ignore_errors)
+    else:
+        _LOGGER.debug("Comparing symbols provided by %r and %r", old_path, new_path)
+        old = _gather_symbols_provided_relative(
+            old_path,
+            include_private=include_private,
+            ignore_errors=ignore_errors,
+        )
+        new = _gather_symbols_provided_relative(
+            new_path,
+            include_private=include_private,
+            ignore_errors=ignore_errors,
+        )
+
+    return diff_reports(old, new)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Gather information about distributions installed in a Python environment."""
+
+import functools
+import json
+import logging
+import re
+from concurrent.futures import ProcessPoolExecutor
+from importlib import metadata
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Generator
+from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import Sequence
+from typing import Set
+from typing import TextIO
+from typing import Tuple
+from typing import Type
+
+from invectio import __version__ as invectio_version
+from .gather import gather_symbols_provided_from_sources
+from .plugins import InvectioPlugin
+from .shard import in_shard
+
+_LOGGER = logging.getLogger(__name__)
+_MODULE_SUFFIXES = frozenset((".py", ".so", ".pyd"))
+_NON_IMPORTABLE_SUFFIXES = (".dist-info", ".egg-info", ".data", ".pth")
+_NAME_SEPARATORS = re.compile(r"[-_.]+")
+
+
+def _get_distribution_python_files(
+    distribution: metadata.Distribution,
+) -> List[Tuple[str, str]]:
+    """Get Python files installed by the given distribution based on its RECORD file.
+
+    Files are returned as pairs of a path relative to the installation directory and an absolute path.
+    """
+    result = []
+    for file in distribution.files or []:
+        if file.suffix != ".py" or file.parts[0] == "..":
+            # Files installed outside of the installation directory (e.g. scripts) are not importable.
+            continue
+
+        result.append((file.as_posix(), str(distribution.locate_file(file))))
+
+    return result
+
+
+def _normalize_name(name: str) -> str:
+    """Normalize a distribution name so that different spellings of the same name compare equal (PEP 503)."""
+    return _NAME_SEPARATORS.sub("-", name).lower()
+
+
+def _iter_distributions(
+    path: Optional[List[str]],
+) -> Generator[Tuple[str, metadata.Distribution], None, None]:
+    """Iterate over names and distributions found in the given path, sys.path is used if no path is given.
+
+    Distributions with missing or broken metadata (e.g. leftovers of failed installations) are skipped.
+    """
+    if path is not None:
+        distributions = metadata.distributions(path=path)  # type: ignore
+    else:
+        distributions = metadata.distributions()
+
+    for distribution in distributions:
+        name = distribution.metadata.get("Name")  # type: ignore
+        if not name:
+            _LOGGER.warning(
+                "Skipping distribution installed in %r without a name in its metadata",
+                str(distribution.locate_file("")),
+            )
+            continue
+
+        yield name, distribution
+
+
+def _gather_distribution_symbols_provided(
+    files: List[Tuple[str, str]],
+    include_private: bool,
+    ignore_errors: bool,
+    target_python: Optional[str],
+    fallback_parser: Optional[str],
+    plugins: Optional[Sequence[Type[InvectioPlugin]]],
+) -> Dict[str, Any]:
+    """Gather symbols provided by files of a distribution, meant to be run in a worker process."""
+    return gather_symbols_provided_from_sources(
+        ((file_name, Path(file_path)) for file_name, file_path in files),
+        include_private=include_private,
+        ignore_errors=ignore_errors,
+        target_python=target_python,
+        fallback_parser=fallback_parser,
+        plugins=plugins,
+    )
+
+
+def _get_top_level_names(distribution: metadata.Distribution) -> Set[str]:
+    """Get names importable from the given distribution using top_level.txt, or RECORD if not available."""
+    top_level = distribution.read_text("top_level.txt")
+    if top_level is not None:
+        return {line.strip() for line in top_level.splitlines() if line.strip()}
+
+    result = set()
+    for file in distribution.files or []:
+        top_level_part = file.parts[0]
+        if top_level_part in ("..", "__pycache__") or top_level_part.endswith(
+            _NON_IMPORTABLE_SUFFIXES,
+        ):
+            continue
+
+        if len(file.parts) > 1:
+            result.add(top_level_part)
+        elif file.suffix in _MODULE_SUFFIXES:
+            result.add(top_level_part.split(".", maxsplit=1)[0])
+
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def _get_import_index(path: Optional[Tuple[str, ...]]) -> Dict[str, Tuple[str, ...]]:
+    """Compute the import name to distribution names index, cached per path."""
+    index: Dict[str, Set[str]] = {}
+    for name, distribution in _iter_distributions(
+        list(path) if path is not None else None,
+    ):
+        for import_name in _get_top_level_names(distribution):
+            index.setdefault(import_name, set()).add(name)
+
+    return {import_name: tuple(sorted(names)) for import_name, names in index.items()}
+
+
+def get_import_index(
+    path: Optional[List[str]] = None,
+) -> Dict[str, Tuple[str, ...]]:
+    """Get an index mapping top-level import names to names of distributions providing them.
+
+    The index is computed from top_level.txt (or RECORD) files of distributions found in the given path (sys.path
+    if not provided). It is cached, the returned dictionary must not be modified.
+    """
+    return _get_import_index(tuple(path) if path is not None else None)
+
+
+def load_import_index(mapping_file: TextIO) -> Dict[str, Tuple[str, ...]]:
+    """Load an index mapping top-level import names to distribution names from a JSON file.
+
+    Values in the mapping are either a distribution name or a list of distribution names.
+    """
+    mapping = json.load(mapping_file)
+    return {
+        import_name: (names,) if isinstance(names, str) else tuple(names)
+        for import_name, names in mapping.items()
+    }
+
+
+def annotate_distributions(
+    result: Dict[str, Any],
+    import_index: Mapping[str, Tuple[str, ...]],
+) -> Dict[str, Any]:
+    """Annotate modules found in a library usage report with distributions providing them.
+
+    Distributions are stored under the "distributions" key of the result, modules not found in the index are
+    assigned an empty list.
+    """
+    distributions = {}
+    for file_report in result["report"].values():
+        for module in file_report:
+            if module not in distributions:
+                distributions[module] = list(import_index.get(module, ()))
+
+    result["distributions"] = distributions
+    return result
+
+
+def gather_symbols_provided_env(
+    path: Optional[List[str]] = None,
+    *,
+    include_private: bool = False,
+    ignore_errors: bool = False,
+    target_python: Optional[str] = None,
+    fallback_parser: Optional[str] = None,
+    plugins: Optional[Sequence[Type[InvectioPlugin]]] = None,
+    jobs: Optional[int] = None,
+    shard: Optional[Tuple[int, int]] = None,
+) -> Dict[str, Any]:
+    """Gather symbols provided by distributions installed in a Python environment.
+
+    Python files of each distribution are listed using its RECORD file, distributions are processed
+    concurrently in worker processes. Reports are grouped by distribution name and version. If a shard (K, N)
+    is given, only distributions assigned to the K-th of N shards based on a hash of their name are processed.
+    Files that fail to parse are retried with the fallback parser, if given. Reports of plugins are stored under
+    the "plugins" key grouped by plugin name, distribution name and version.
+    """
+    report: Dict[str, Dict[str, Any]] = {}
+    errors: Dict[str, Dict[str, Any]] = {}
+    plugin_reports: Dict[str, Dict[str, Dict[str, Any]]] = {
+        plugin.name: {} for plugin in plugins or ()
+    }
+
+    seen: Set[str] = set()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {}
+        for name, distribution in _iter_distributions(path):
+            version = distribution.version
+            normalized_name = _normalize_name(name)
+            if normalized_name in seen:
+                # The first distribution found shadows others, as done by the import system.
+                _LOGGER.debug(
+                    "Skipping distribution %r in version %r shadowed by a distribution found earlier",
+                    name,
+                    version,
+                )
+                continue
+
+            seen.add(normalized_name)
+
+            if shard is not None and not in_shard(name, shard):
+                continue
+
+            files = _get_distribution_python_files(distribution)
+            if not files:
+                _LOGGER.warning(
+                    "No Python files found in RECORD of distribution %r in version %r",
+                    name,
+                    version,
+                )
+                continue
+
+            _LOGGER.debug(
+                "Gathering symbols provided by %r in version %r",
+                name,
+                version,
+            )
+            future = executor.submit(
+                _gather_distribution_symbols_provided,
+                files,
+                include_private,
+                ignore_errors,
+                target_python,
+                fallback_parser,
+                plugins,
+            )
+            futures[future] = (name, version)
+
+        for future, (name, version) in futures.items():
+            result = future.result()
+            report.setdefault(name, {})[version] = result["report"]
+            if result["errors"]:
+                errors.setdefault(name, {})[version] = result["errors"]
+            for plugin_name, plugin_report in result.get("plugins", {}).items():
+                distribution_reports = plugin_reports[plugin_name].setdefault(name, {})
+                distribution_reports[version] = plugin_report
+
+    env_result = {
+        "errors": errors,
+        "report": report,
+        "version": invectio_version,
+    }
+    if plugins:
+        env_result["plugins"] = plugin_reports
+
+    return env_result
@@ -0,0 +1,621 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Gather library usage and symbols provided by sources found in a path or given in memory.
+
+Functions accepting a path list sources found in the path and delegate to their `*_from_sources` counterparts.
+"""
+
+import ast
+import logging
+import os
+import sys
+from typing import Any
+from typing import Container
+from typing import Dict
+from typing import Generator
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Set
+from typing import Tuple
+from typing import Type
+
+from invectio import __version__ as invectio_version
+from .aggregate import UsageAggregator
+from .lib import InvectioSymbolsProvidedVisitor
+from .lib import _get_library_usage_file_report
+from .lib import get_standard_imports
+from .metrics import ScanMetrics
+from .plugins import InvectioPlugin
+from .plugins import PluginDispatcher
+from .result import LibraryUsage
+from .result import SymbolsProvided
+from .sources import Source
+from .sources import _iter_path_sources
+from .sources import _iter_source_ast
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _store_plugin_reports(
+    plugin_reports: Dict[str, Dict[str, Any]],
+    file_name: str,
+    plugin_dispatcher: PluginDispatcher,
+) -> None:
+    """Store reports computed by plugins for the given file, reports are keyed by plugin name and file."""
+    for plugin_name, plugin_report in plugin_dispatcher.get_reports().items():
+        plugin_reports.setdefault(plugin_name, {})[file_name] = plugin_report
+
+
+def _sort_usage(usage: Dict[str, Set[str]]) -> Dict[str, List[str]]:
+    """Turn sets of symbols used into the serializable report form."""
+    return {module: sorted(symbols) for module, symbols in usage.items()}
+
+
+def _iter_library_usage(
+    sources: Iterable[Source],
+    *,
+    ignore_errors: bool,
+    without_standard_imports: bool,
+    without_builtin_imports: bool,
+    without_builtins: bool,
+    scope_aware: bool,
+    target_python: Optional[str],
+    fallback_parser: Optional[str],
+    errors: Optional[Dict[str, str]],
+    plugins: Optional[Sequence[Type[InvectioPlugin]]] = None,
+    plugin_reports: Optional[Dict[str, Dict[str, Any]]] = None,
+    counts: Optional[Dict[str, Dict[str, int]]] = None,
+    locations: Optional[Dict[str, Dict[str, Dict[str, List[int]]]]] = None,
+    metrics: Optional[ScanMetrics] = None,
+) -> Generator[Tuple[str, Dict[str, Set[str]]], None, None]:
+    """Compute library usage of the given sources as sets of symbols, collect counts and locations if requested."""
+    standard_imports = get_standard_imports() if without_standard_imports else None
+    builtin_imports = set(sys.builtin_module_names) if without_builtin_imports else None
+
+    notebook_cells: Dict[str, List[Tuple[int, int]]] = {}
+    for file_name, file_ast in _iter_source_ast(
+        sources,
+        ignore_errors=ignore_errors,
+        target_python=target_python,
+        fallback_parser=fallback_parser,
+        errors=errors,
+        notebook_cells=notebook_cells,
+        metrics=metrics,
+    ):
+        plugin_dispatcher = (
+            PluginDispatcher.create(plugins, file_name) if plugins else None
+        )
+        usage = _get_library_usage_file_report(
+            file_ast,
+            without_builtins=without_builtins,
+            scope_aware=scope_aware,
+            standard_imports=standard_imports,
+            builtin_imports=builtin_imports,
+            plugin_dispatcher=plugin_dispatcher,
+            file_counts=counts.setdefault(file_name, {})
+            if counts is not None
+            else None,
+            file_locations=locations.setdefault(file_name, {})
+            if locations is not None
+            else None,
+            cells=notebook_cells.pop(file_name, None),
+        )
+        if plugin_dispatcher is not None and plugin_reports is not None:
+            _store_plugin_reports(plugin_reports, file_name, plugin_dispatcher)
+
+        yield file_name, usage
+
+
+def iter_library_usage_from_sources(
+    sources: Iterable[Source],
+    *,
+    ignore_errors: bool = False,
+    without_standard_imports: bool = False,
+    without_builtin_imports: bool = False,
+    without_builtins: bool = False,
+    scope_aware: bool = False,
+    target_python: Optional[str] = None,
+    fallback_parser: Optional[str] = None,
+    errors: Optional[Dict[str, str]] = None,
+    plugins: Optional[Sequence[Type[InvectioPlugin]]] = None,
+    plugin_reports: Optional[Dict[str, Dict[str, Any]]] = None,
+    counts: Optional[Dict[str, Dict[str, int]]] = None,
+    locations: Optional[Dict[str, Dict[str, Dict[str, List[int]]]]] = None,
+    metrics: Optional[ScanMetrics] = None,
+) -> Generator[Tuple[str, Dict[str, List[str]]], None, None]:
+    """Iterate over library usage reports computed for in-memory sources, one source at a time.
+
+    Sources are given as (name, content) pairs, where content is bytes, str, a path or a file-like object,
+    or as file-like objects with a `name` attribute. Sources with names ending with .ipynb are treated as
+    Jupyter notebooks, their code cells are analyzed as a single module.
+
+    If errors are ignored, files that failed to parse are stored in the errors dictionary. Reports of plugins
+    run in the same traversal are stored in the plugin reports dictionary keyed by plugin name and file.
+    Number of usages and encoded locations (see `encode_locations`) of each symbol are stored in counts and
+    locations dictionaries keyed by file, if given. Progress and throughput metrics are updated as files are
+    analyzed, if given.
+    """
+    for file_name, usage in _iter_library_usage(
+        sources,
+        ignore_errors=ignore_errors,
+        without_standard_imports=without_standard_imports,
+        without_builtin_imports=without_builtin_imports,
+        without_builtins=without_builtins,
+        scope_aware=scope_aware,
+        target_python=target_python,
+        fallback_parser=fallback_parser,
+        errors=errors,
+        plugins=plugins,
+        plugin_reports=plugin_reports,
+        counts=counts,
+        locations=locations,
+        metrics=metrics,
+    ):
+        yield file_name, _sort_usage(usage)
+
+
+def iter_library_usage(
+    path: str,
+    *,
+    ignore_errors: bool = False,
+    without_standard_imports: bool = False,
+    without_builtin_imports: bool = False,
+    without_builtins: bool = False,
+    scope_aware: bool = False,
+    target_python: Optional[str] = None,
+    fallback_parser: Optional[str] = None,
+    errors: Optional[Dict[str, str]] = None,
+    plugins: Optional[Sequence[Type[InvectioPlugin]]] = None,
+    plugin_reports: Optional[Dict[str, Dict[str, Any]]] = None,
+    shard: Optional[Tuple[int, int]] = None,
+    counts: Optional[Dict[str, Dict[str, int]]] = None,
+    locations: Optional[Dict[str, Dict[str, Dict[str, List[int]]]]] = None,
+    metrics: Optional[ScanMetrics] = None,
+    exclude: Optional[Container[str]] = None,
+) -> Generator[Tuple[str, Dict[str, List[str]]], None, None]:
+    """Iterate over library usage reports computed for sources in the given path, one file at a time.
+
+    Jupyter notebooks found are analyzed too. If a shard (K, N) is given, only files assigned to the K-th of
+    N shards are analyzed. Files found in exclude (e.g. files analyzed by a previous run) are skipped. See
+    `iter_library_usage_from_sources` for other options.
+    """
+    yield from iter_library_usage_from_sources(
+        _iter_path_sources(
+            path,
+            notebooks=True,
+            shard=shard,
+            exclude=exclude,
+            metrics=metrics,
+        ),
+        ignore_errors=ignore_errors,
+        without_standard_imports=without_standard_imports,
+        without_builtin_imports=without_builtin_imports,
+        without_builtins=without_builtins,
+        scope_aware=scope_aware,
+        target_python=target_python,
+        fallback_parser=fallback_parser,
+        errors=errors,
+        plugins=plugins,
+        plugin_reports=plugin_reports,
+        counts=counts,
+        locations=locations,
+        metrics=metrics,
+    )
+
+
+def iter_library_usage_results_from_sources(
+    sources: Iterable[Source],
+    *,
+    ignore_errors: bool = False,
+    without_standard_imports: bool = False,
+    without_builtin_imports: bool = False,
+    without_builtins: bool = False,
+    scope_aware: bool = False,
+    target_python: Optional[str] = None,
+    fallback_parser: Optional[str] = None,
+    errors: Optional[Dict[str, str]] = None,
+) -> Generator[Tuple[str, LibraryUsage], None, None]:
+    """Iterate over library usage of in-memory sources as `LibraryUsage` objects, one source at a time.
+
+    Symbols are kept in frozensets and are not sorted, meant for callers checking membership or counting
+    symbols. See `iter_library_usage_from_sources` for options.
+    """
+    for file_name, usage in _iter_library_usage(
+        sources,
+        ignore_errors=ignore_errors,
+        without_standard_imports=without_standard_imports,
+        without_builtin_imports=without_builtin_imports,
+        without_builtins=without_builtins,
+        scope_aware=scope_aware,
+        target_python=target_python,
+        fallback_parser=fallback_parser,
+        errors=errors,
+    ):
+        yield file_name, LibraryUsage.from_sets(usage)
+
+
+def iter_library_usage_results(
+    path: str,
+    *,
+    ignore_errors: bool = False,
+    without_standard_imports: bool = False,
+    without_builtin_imports: bool = False,
+    without_builtins: bool = False,
+    scope_aware: bool = False,
+    target_python: Optional[str] = None,
+    fallback_parser: Optional[str] = None,
+    errors: Optional[Dict[str, str]] = None,
+    shard: Optional[Tuple[int, int]] = None,
+) -> Generator[Tuple[str, LibraryUsage], None, None]:
+    """Iterate over library usage of sources in the given path as `LibraryUsage` objects, one file at a time.
+
+    See `iter_library_usage` and `iter_library_usage_results_from_sources` for options.
+    """
+    yield from iter_library_usage_results_from_sources(
+        _iter_path_sources(path, notebooks=True, shard=shard),
+        ignore_errors=ignore_errors,
+        without_standard_imports=without_standard_imports,
+        without_builtin_imports=without_builtin_imports,
+        without_builtins=without_builtins,
+        scope_aware=scope_aware,
+        target_python=target_python,
+        fallback_parser=fallback_parser,
+        errors=errors,
+    )
+
+
+def _create_aggregator(
+    aggregate: Optional[str],
+    root: str,
+    with_locations: bool,
+    plugins: Optional[Sequence[Type[InvectioPlugin]]],
+) -> Optional[UsageAggregator]:
+    """Create an aggregator of library usage if aggregation is requested."""
+    if aggregate is None:
+        return None
+
+    if with_locations:
+        raise ValueError("Locations cannot be reported if usage is aggregated")
+
+    if plugins:
+        # Reports of plugins are computed per file, keeping them would defeat the aggregation.
+        raise ValueError("Plugins cannot be run if usage is aggregated")
+
+    return UsageAggregator(aggregate, root=root)
+
+
+def _collect_report(
+    file_reports: Iterable[Tuple[str, Dict[str, List[str]]]],
+    aggregator: Optional[UsageAggregator],
+    counts: Dict[str, Dict[str, int]],
+) -> Dict[str, Dict[str, List[str]]]:
+    """Collect reports of files, merge them (and counts of files, if any) into aggregated usage if requested."""
+    if aggregator is None:
+        return dict(file_reports)
+
+    for file_name, file_report in file_reports:
+        aggregator.add(file_name, file_report, counts.pop(file_name, None))
+
+    # Counts of files were all merged.
+    counts.update(aggregator.counts)
+    return aggregator.get_report()
+
+
+def _store_counts_locations(
+    result: Dict[str, Any],
+    counts: Optional[Dict[str, Dict[str, int]]],
+    locations: Optional[Dict[str, Dict[str, Dict[str, List[int]]]]],
+) -> None:
+    """Store counts and locations in the result if they were requested."""
+    if counts is not None:
+        result["counts"] = counts
+
+    if locations is not None:
+        result["locations"] = locations
+
+
+def _create_result(
+    report: Dict[str, Any],
+    errors: Dict[str, str],
+    plugins: Optional[Sequence[Type[InvectioPlugin]]],
+    plugin_reports: Dict[str, Dict[str, Any]],
+    aggregator: Optional[UsageAggregator] = None,
+) -> Dict[str, Any]:
+    """Create the resulting dictionary returned by gathering functions."""
+    result = {
+        "errors": errors,
+        "report": report,
+        "version": invectio_version,
+    }
+    if plugins:
+        result["plugins"] = {
+            plugin.name: plugin_reports.get(plugin.name, {}) for plugin in plugins
+        }
+
+    if aggregator is not None:
+        result["aggregate"] = aggregator.aggregate
+
+    return result
+
+
+def _gather_library_usage(
+    sources: Iterable[Source],
+    *,
+    root: str,
+    ignore_errors: bool,
+    without_standard_imports: bool,
+    without_builtin_imports: bool,
+    without_builtins: bool,
+    scope_aware: bool,
+    target_python: Optional[str],
+    fallback_parser: Optional[str],
+    plugins: Optional[Sequence[Type[InvectioPlugin]]],
+    with_counts: bool,
+    with_locations: bool,
+    metrics: Optional[ScanMetrics],
+    aggregate: Optional[str],
+) -> Dict[str, Any]:
+    """Gather library usage of the given sources, usage is aggregated relative to the given root if requested."""
+    aggregator = _create_aggregator(aggregate, root, with_locations, plugins)
+    errors: Dict[str, str] = {}
+    plugin_reports: Dict[str, Dict[str, Any]] = {}
+    counts: Dict[str, Dict[str, int]] = {}
+    locations: Dict[str, Dict[str, Dict[str, List[int]]]] = {}
+    report = _collect_report(
+        iter_library_usage_from_sources(
+            sources,
+            ignore_errors=ignore_errors,
+            without_standard_imports=without_standard_imports,
+            without_builtin_imports=without_builtin_imports,
+            without_builtins=without_builtins,
+            scope_aware=scope_aware,
+            target_python=target_python,
+            fallback_parser=fallback_parser,
+            errors=errors,
+            plugins=plugins,
+            plugin_reports=plugin_reports,
+            counts=counts if with_counts else None,
+            locations=locations if with_locations else None,
+            metrics=metrics,
+        ),
+        aggregator,
+        counts,
+    )
+
+    result = _create_result(report, errors, plugins, plugin_reports, aggregator)
+    _store_counts_locations(
+        result,
+        counts if with_counts else None,
+        locations if with_locations else None,
+    )
+    return result
+
+
+def gather_library_usage_from_sources(
+    sources: Iterable[Source],
+    *,
+    ignore_errors: bool = False,
+    without_standard_imports: bool = False,
+    without_builtin_imports: bool = False,
+    without_builtins: bool = False,
+    scope_aware: bool = False,
+    target_python: Optional[str] = None,
+    fallback_parser: Optional[str] = None,
+    plugins: Optional[Sequence[Type[InvectioPlugin]]] = None,
+    with_counts: bool = False,
+    with_locations: bool = False,
+    metrics: Optional[ScanMetrics] = None,
+    aggregate: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Statically extract any library call from in-memory sources.
+
+    The scope-aware mode does not report names that shadow imports (e.g. function parameters) as library usage.
+    Sources are parsed using grammar of the target Python version, if given. Files that fail to parse are
+    retried with the fallback parser - an import string of a callable accepting source code (bytes for files
+    read from the filesystem) and file name and returning `ast.Module`. Plugins are run in the same traversal,
+    their reports are stored under the "plugins" key. Number of usages and locations of symbols per file are
+    stored under "counts" and "locations" keys if requested. Metrics, if given, are updated as files are
+    analyzed. If aggregation ("directory" or "package") is requested, usage (and counts) of files is merged
+    into usage of their directories or top-level packages as files are analyzed, only the merged usage is
+    reported; names of sources are used as paths.
+    """
+    return _gather_library_usage(
+        sources,
+        root="",
+        ignore_errors=ignore_errors,
+        without_standard_imports=without_standard_imports,
+        without_builtin_imports=without_builtin_imports,
+        without_builtins=without_builtins,
+        scope_aware=scope_aware,
+        target_python=target_python,
+        fallback_parser=fallback_parser,
+        plugins=plugins,
+        with_counts=with_counts,
+        with_locations=with_locations,
+        metrics=metrics,
+        aggregate=aggregate,
+    )
+
+
+def gather_library_usage(
+    path: str,
+    *,
+    ignore_errors: bool = False,
+    without_standard_imports: bool = False,
+    without_builtin_imports: bool = False,
+    without_builtins: bool = False,
+    scope_aware: bool = False,
+    target_python: Optional[str] = None,
+    fallback_parser: Optional[str] = None,
+    plugins: Optional[Sequence[Type[InvectioPlugin]]] = None,
+    shard: Optional[Tuple[int, int]] = None,
+    with_counts: bool = False,
+    with_locations: bool = False,
+    metrics: Optional[ScanMetrics] = None,
+    aggregate: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Find all sources in the given path and statically extract any library call.
+
+    If a shard (K, N) is given, only files assigned to the K-th of N shards based on a hash of their path are
+    analyzed. Usage is aggregated relative to the given path. See `gather_library_usage_from_sources` for
+    other options.
+    """
+    return _gather_library_usage(
+        _iter_path_sources(path, notebooks=True, shard=shard, metrics=metrics),
+        root=path if os.path.isdir(path) else os.path.dirname(path),
+        ignore_errors=ignore_errors,
+        without_standard_imports=without_standard_imports,
+        without_builtin_imports=without_builtin_imports,
+        without_builtins=without_builtins,
+        scope_aware=scope_aware,
+        target_python=target_python,
+        fallback_parser=fallback_parser,
+        plugins=plugins,
+        with_counts=with_counts,
+        with_locations=with_locations,
+        metrics=metrics,
+        aggregate=aggregate,
+    )
+
+
+def _gather_symbols_provided(
+    file_asts: Iterable[Tuple[str, ast.Module]],
+    *,
+    include_private: bool,
+    plugins: Optional[Sequence[Type[InvectioPlugin]]],
+    plugin_reports: Dict[str, Dict[str, Any]],
+) -> Dict[str, List[str]]:
+    """Compute symbols provided by the given parsed files."""
+    report = {}
+    for file_name, file_ast in file_asts:
+        visitor = InvectioSymbolsProvidedVisitor(
+            file_name=file_name,
+            include_private=include_private,
+        )
+        visitor.visit(file_ast)
+
+        if plugins:
+            # The symbols provided visitor does not traverse the tree, plugins walk it.
+            plugin_dispatcher = PluginDispatcher.create(plugins, file_name)
+            plugin_dispatcher.walk(file_ast)
+            _store_plugin_reports(plugin_reports, file_name, plugin_dispatcher)
+
+        report[file_name] = sorted(visitor.get_module_report())
+
+    return report
+
+
+def gather_symbols_provided_from_sources(
+    sources: Iterable[Source],
+    include_private: bool = False,
+    ignore_errors: bool = False,
+    target_python: Optional[str] = None,
+    fallback_parser: Optional[str] = None,
+    plugins: Optional[Sequence[Type[InvectioPlugin]]] = None,
+) -> Dict[str, Any]:
+    """Gather symbols provided by in-memory sources, names of sources are used to derive module names."""
+    errors: Dict[str, str] = {}
+    plugin_reports: Dict[str, Dict[str, Any]] = {}
+    report = _gather_symbols_provided(
+        _iter_source_ast(
+            sources,
+            ignore_errors=ignore_errors,
+            target_python=target_python,
+            fallback_parser=fallback_parser,
+            errors=errors,
+        ),
+        include_private=include_private,
+        plugins=plugins,
+        plugin_reports=plugin_reports,
+    )
+
+    return _create_result(report, errors, plugins, plugin_reports)
+
+
+def gather_symbols_provided(
+    path: str,
+    include_private: bool = False,
+    ignore_errors: bool = False,
+    target_python: Optional[str] = None,
+    fallback_parser: Optional[str] = None,
+    plugins: Optional[Sequence[Type[InvectioPlugin]]] = None,
+    shard: Optional[Tuple[int, int]] = None,
+) -> Dict[str, Any]:
+    """Gather symbols provided by a library, only files assigned to the given shard (K, N) if requested."""
+    return gather_symbols_provided_from_sources(
+        _iter_path_sources(path, shard=shard),
+        include_private=include_private,
+        ignore_errors=ignore_errors,
+        target_python=target_python,
+        fallback_parser=fallback_parser,
+        plugins=plugins,
+    )
+
+
+def iter_symbols_provided_results_from_sources(
+    sources: Iterable[Source],
+    *,
+    include_private: bool = False,
+    ignore_errors: bool = False,
+    target_python: Optional[str] = None,
+    fallback_parser: Optional[str] = None,
+    errors: Optional[Dict[str, str]] = None,
+) -> Generator[Tuple[str, SymbolsProvided], None, None]:
+    """Iterate over symbols provided by in-memory sources as `SymbolsProvided` objects, one source at a time.
+
+    If errors are ignored, files that failed to parse are stored in the errors dictionary.
+    """
+    for file_name, file_ast in _iter_source_ast(
+        sources,
+        ignore_errors=ignore_errors,
+        target_python=target_python,
+        fallback_parser=fallback_parser,
+        errors=errors,
+    ):
+        visitor = InvectioSymbolsProvidedVisitor(
+            file_name=file_name,
+            include_private=include_private,
+        )
+        visitor.visit(file_ast)
+        yield file_name, visitor.get_symbols_provided()
+
+
+def iter_symbols_provided_results(
+    path: str,
+    *,
+    include_private: bool = False,
+    ignore_errors: bool = False,
+    target_python: Optional[str] = None,
+    fallback_parser: Optional[str] = None,
+    errors: Optional[Dict[str, str]] = None,
+    shard: Optional[Tuple[int, int]] = None,
+) -> Generator[Tuple[str, SymbolsProvided], None, None]:
+    """Iterate over symbols provided by sources in the given path as `SymbolsProvided` objects, one file at a time.
+
+    See `iter_symbols_provided_results_from_sources` for options.
+    """
+    yield from iter_symbols_provided_results_from_sources(
+        _iter_path_sources(path, shard=shard),
+        include_private=include_private,
+        ignore_errors=ignore_errors,
+        target_python=target_python,
+        fallback_parser=fallback_parser,
+        errors=errors,
+    )
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Gather library usage for Python files changed in a git revision range."""
+
+import logging
+import os
+import subprocess
+from typing import Any
+from typing import Dict
+from typing import Generator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from invectio import __version__ as invectio_version
+from .gather import iter_library_usage_from_sources
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _run_git(repo: str, *args: str) -> bytes:
+    """Run a git command in the given repository and return its standard output."""
+    process = subprocess.run(
+        ["git", "-C", repo, *args],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    if process.returncode != 0:
+        raise ValueError(
+            f"Git command {args[0]!r} failed in {repo!r}: {process.stderr.decode(errors='replace').strip()}",
+        )
+
+    return process.stdout
+
+
+def _parse_rev_range(rev_range: str) -> Tuple[str, str]:
+    """Parse the given revision range, return the range to be diffed and the revision to read sources from."""
+    for separator in ("...", ".."):
+        if separator in rev_range:
+            start, end = rev_range.split(separator, maxsplit=1)
+            end = end or "HEAD"
+            return f"{start}{separator}{end}", end
+
+    return f"{rev_range}..HEAD", "HEAD"
+
+
+def _iter_changed_python_files(
+    repo: str,
+    rev_range: str,
+) -> Generator[Tuple[str, str], None, None]:
+    """Iterate over Python files changed in the given revision range, yield their change status and path."""
+    output = _run_git(
+        repo,
+        "diff",
+        "--name-status",
+        "--no-renames",
+        "-z",
+        rev_range,
+        "--",
+        "*.py",
+    )
+
+    items = output.decode().split("\0")
+    for status, path in zip(items[::2], items[1::2]):
+        yield status, path
+
+
+def _iter_blobs(
+    repo: str,
+    revision: str,
+    paths: List[str],
+) -> Generator[Tuple[str, bytes], None, None]:
+    """Read contents of files at the given revision directly from the git object store."""
+    if not paths:
+        return
+
+    process = subprocess.Popen(
+        ["git", "-C", repo, "cat-file", "--batch"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+    )
+    assert process.stdin is not None and process.stdout is not None
+
+    try:
+        for path in paths:
+            process.stdin.write(f"{revision}:{path}\n".encode())
+            process.stdin.flush()
+
+            header = process.stdout.readline().decode().split()
+            if len(header) != 3 or header[1] != "blob":
+                raise ValueError(
+                    f"Failed to read {path!r} at revision {revision!r} from {repo!r}",
+                )
+
+            content = process.stdout.read(int(header[2]))
+            process.stdout.read(1)  # Trailing newline.
+            yield path, content
+    finally:
+        process.stdin.close()
+        process.stdout.close()
+        process.wait()
+
+
+def _get_repo_path(file_name: str, repo: str) -> str:
+    """Get path of a file stored in a base report relative to the repository root.
+
+    Reports created by scanning the repository (e.g. `whatuses <repo>`) store paths prefixed with the repository
+    path or absolute paths, reports created from a revision range store paths relative to the repository root.
+    """
+    root = os.path.abspath(repo)
+    path = os.path.abspath(file_name)
+    if os.path.isabs(file_name) or os.path.commonpath((root, path)) == root:
+        file_name = os.path.relpath(path, root)
+
+    file_name = os.path.normpath(file_name)
+    if file_name == os.pardir or file_name.startswith(f"{os.pardir}{os.sep}"):
+        raise ValueError(
+            f"File {file_name!r} stored in the base report is not stored in the repository {repo!r}",
+        )
+
+    return file_name
+
+
+def gather_library_usage_git(
+    rev_range: str,
+    *,
+    repo: str = ".",
+    base_report: Optional[Dict[str, Any]] = None,
+    ignore_errors: bool = False,
+    without_standard_imports: bool = False,
+    without_builtin_imports: bool = False,
+    without_builtins: bool = False,
+    scope_aware: bool = False,
+    target_python: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Gather library usage for Python files changed in the given revision range of a git repository.
+
+    Sources are read from the git object store, no checkout is performed. Files are reported relative to
+    the repository root. If a base report is given, results are merged into it - entries for changed files
+    are replaced and entries for deleted files are removed. Files in the base report are made relative to the
+    repository root, files outside of the repository are refused.
+    """
+    diff_range, revision = _parse_rev_range(rev_range)
+
+    report: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    if base_report is not None:
+        report = {
+            _get_repo_path(file_name, repo): file_report
+            for file_name, file_report in base_report.get("report", {}).items()
+        }
+        errors = {
+            _get_repo_path(file_name, repo): error
+            for file_name, error in base_report.get("errors", {}).items()
+        }
+
+    changed = []
+    for status, path in _iter_changed_python_files(repo, diff_range):
+        errors.pop(path, None)
+        report.pop(path, None)
+        if status == "D":
+            _LOGGER.debug("File %r was deleted", path)
+            continue
+
+        changed.append(path)
+
+    report.update(
+        iter_library_usage_from_sources(
+            _iter_blobs(repo, revision, changed),
+            ignore_errors=ignore_errors,
+            without_standard_imports=without_standard_imports,
+            without_builtin_imports=without_builtin_imports,
+            without_builtins=without_builtins,
+            scope_aware=scope_aware,
+            target_python=target_python,
+            errors=errors,
+        ),
+    )
+
+    return {
+        "errors": errors,
+        "report": report,
+        "version": invectio_version,
+    }
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Export library usage as a dependency graph (file -> module -> symbol)."""
+
+import csv
+from typing import Dict
+from typing import Generator
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import TextIO
+from typing import Tuple
+from xml.sax.saxutils import escape
+from xml.sax.saxutils import quoteattr
+
+_EDGE_LIST_HEADER = ("file", "module", "symbol")
+_GRAPHML_HEADER = """\
+<?xml version="1.0" encoding="UTF-8"?>
+<graphml xmlns="http://graphml.graphdrawing.org/xmlns"
+         xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+         xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns
+                             http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">
+  <key id="kind" for="node" attr.name="kind" attr.type="string"/>
+  <key id="name" for="node" attr.name="name" attr.type="string"/>
+  <key id="relation" for="edge" attr.name="relation" attr.type="string"/>
+  <graph id="invectio" edgedefault="directed">
+"""
+_GRAPHML_FOOTER = """\
+  </graph>
+</graphml>
+"""
+
+
+def iter_usage_edges(
+    file_reports: Iterable[Tuple[str, Dict[str, List[str]]]],
+) -> Generator[Tuple[str, str, str], None, None]:
+    """Turn library usage reports into (file, module, symbol) triples.
+
+    Triples for one file and one module are yielded next to each other.
+    """
+    for file_name, file_report in file_reports:
+        for module, symbols in file_report.items():
+            for symbol in symbols:
+                yield file_name, module, symbol
+
+
+def write_edge_list(
+    edges: Iterable[Tuple[str, str, str]],
+    output: TextIO,
+    *,
+    delimiter: str = ",",
+) -> int:
+    """Write (file, module, symbol) triples as a columnar CSV edge list, return number of rows written."""
+    writer = csv.writer(output, delimiter=delimiter, lineterminator="\n")
+    writer.writerow(_EDGE_LIST_HEADER)
+
+    count = 0
+    for edge in edges:
+        writer.writerow(edge)
+        count += 1
+
+    return count
+
+
+def _graphml_node(node_id: str, kind: str, name: str) -> str:
+    """Serialize a GraphML node."""
+    return (
+        f"    <node id={quoteattr(node_id)}>"
+        f'<data key="kind">{kind}</data>'
+        f'<data key="name">{escape(name)}</data>'
+        "</node>\n"
+    )
+
+
+def _graphml_edge(source: str, target: str, relation: str) -> str:
+    """Serialize a GraphML edge."""
+    return (
+        f"    <edge source={quoteattr(source)} target={quoteattr(target)}>"
+        f'<data key="relation">{relation}</data>'
+        "</edge>\n"
+    )
+
+
+def write_graphml(edges: Iterable[Tuple[str, str, str]], output: TextIO) -> None:
+    """Write (file, module, symbol) triples as a GraphML document.
+
+    Files are linked to modules they import and to symbols they use ("imports" and "uses" relations), modules
+    are linked to their symbols ("provides" relation), so each triple is preserved. Nodes are emitted lazily on
+    their first occurrence so only node identifiers seen so far are kept in memory.
+    """
+    output.write(_GRAPHML_HEADER)
+
+    seen_modules: Set[str] = set()
+    seen_symbols: Set[str] = set()
+    last_file: Optional[str] = None
+    last_file_module: Optional[Tuple[str, str]] = None
+
+    for file_name, module, symbol in edges:
+        file_id = f"file:{file_name}"
+        module_id = f"module:{module}"
+        symbol_id = f"symbol:{symbol}"
+
+        if file_name != last_file:
+            # Files are reported once, edges for the same file are next to each other.
+            output.write(_graphml_node(file_id, "file", file_name))
+            last_file = file_name
+
+        if module not in seen_modules:
+            output.write(_graphml_node(module_id, "module", module))
+            seen_modules.add(module)
+
+        if (file_name, module) != last_file_module:
+            output.write(_graphml_edge(file_id, module_id, "imports"))
+            last_file_module = (file_name, module)
+
+        if symbol not in seen_symbols:
+            # A symbol always belongs to exactly one module, the edge is unique.
+            output.write(_graphml_node(symbol_id, "symbol", symbol))
+            output.write(_graphml_edge(module_id, symbol_id, "provides"))
+            seen_symbols.add(symbol)
+
+        # Triples are unique, so is the edge.
+        output.write(_graphml_edge(file_id, symbol_id, "uses"))
+
+    output.write(_GRAPHML_FOOTER)
@@ -18,25 +18,29 @@
 """A library part of Invectio for static analysis of Python sources."""
 
 import ast
+import bisect
 import builtins
 import distutils.sysconfig as sysconfig
-import glob
 import logging
 import os
 import sys
 from collections import defaultdict
-from pathlib import Path
 from typing import Any
 from typing import DefaultDict
 from typing import Dict
 from typing import Generator
+from typing import Iterable
 from typing import List
+from typing import Sequence
 from typing import Set
+from typing import Optional
 from typing import Tuple
+from typing import Union
 
 import attr
 
-from invectio import __version__ as invectio_version
+from .plugins import PluginDispatcher
+from .result import SymbolsProvided
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -44,11 +48,41 @@ _LOGGER.setLevel(
     logging.DEBUG if bool(int(os.getenv("INVECTIO_VERBOSE", 0))) else logging.INFO,
 )
 _BUILTINS = frozenset(dir(builtins))
+_MOVED_TO_GATHER = frozenset(("gather_library_usage", "gather_symbols_provided"))
+
+
+def _iter_arguments(arguments: ast.arguments) -> Generator[ast.arg, None, None]:
+    """Iterate over all the arguments of a function."""
+    yield from getattr(arguments, "posonlyargs", [])
+    yield from arguments.args
+    if arguments.vararg is not None:
+        yield arguments.vararg
+    yield from arguments.kwonlyargs
+    if arguments.kwarg is not None:
+        yield arguments.kwarg
+
+
+@attr.s(slots=True)
+class _Scope:
+    """A scope tracked by the library usage visitor when running in the scope-aware mode."""
+
+    kind = attr.ib(type=str)
+    imports = attr.ib(type=dict, default=attr.Factory(dict))
+    imports_from = attr.ib(type=dict, default=attr.Factory(dict))
+    imported_names = attr.ib(type=Set[str], default=attr.Factory(set))
+    local_names = attr.ib(type=Set[str], default=attr.Factory(set))
+    global_names = attr.ib(type=Set[str], default=attr.Factory(set))
+    nonlocal_names = attr.ib(type=Set[str], default=attr.Factory(set))
 
 
 @attr.s(slots=True)
 class InvectioLibraryUsageVisitor(ast.NodeVisitor):
-    """Visitor for capturing imports, nodes and relevant parts to be reported by Invectio."""
+    """Visitor for capturing imports, nodes and relevant parts to be reported by Invectio.
+
+    In the scope-aware mode, imports and other name bindings are tracked per module, class, function and
+    comprehension scope so that local names shadowing imports are not reported as library usage. Number of
+    usages and their (line, column) locations are recorded per module and symbol if requested.
+    """
 
     without_builtins = attr.ib(type=bool, default=False)
     imports = attr.ib(type=dict, default=attr.Factory(dict))
@@ -57,21 +91,101 @@ class InvectioLibraryUsageVisitor(ast.NodeVisitor):
         type=DefaultDict[str, Set[str]],
         default=attr.Factory(lambda: defaultdict(set)),
     )
+    scope_aware = attr.ib(type=bool, default=False)
+    plugin_dispatcher = attr.ib(type=Optional[PluginDispatcher], default=None)
+    with_counts = attr.ib(type=bool, default=False)
+    with_locations = attr.ib(type=bool, default=False)
+    counts = attr.ib(type=Dict[str, Dict[str, int]], factory=dict)
+    locations = attr.ib(type=Dict[str, Dict[str, List[Tuple[int, int]]]], factory=dict)
+    _scopes = attr.ib(type=List[_Scope], init=False)
+
+    @_scopes.default
+    def _scopes_default(self) -> List[_Scope]:
+        """Create the module scope, it shares import tables with the visitor."""
+        return [
+            _Scope(kind="module", imports=self.imports, imports_from=self.imports_from),
+        ]
+
+    def visit(self, node: ast.AST) -> Any:
+        """Visit a node, the node is dispatched to plugins (if any) beforehand."""
+        if self.plugin_dispatcher is not None:
+            self.plugin_dispatcher.dispatch(node)
+
+        return ast.NodeVisitor.visit(self, node)
+
+    def _dispatch_only(self, node: ast.AST) -> None:
+        """Dispatch a node which is not visited by this visitor to plugins."""
+        if self.plugin_dispatcher is not None:
+            self.plugin_dispatcher.dispatch(node)
+
+    def _bind(self, name: str, *, imported: bool = False) -> _Scope:
+        """Bind the given name in the current scope, return the scope in which the name was bound."""
+        scope = self._scopes[-1]
+        if name in scope.global_names:
+            scope = self._scopes[0]
+        elif name in scope.nonlocal_names:
+            for enclosing_scope in reversed(self._scopes[:-1]):
+                if enclosing_scope.kind == "function":
+                    scope = enclosing_scope
+                    break
+
+        scope.local_names.discard(name)
+        if not imported:
+            scope.local_names.add(name)
+            scope.imports_from.pop(name, None)
+            if name in scope.imported_names:
+                scope.imported_names.discard(name)
+                for import_name in [
+                    i for i in scope.imports if i.split(".", maxsplit=1)[0] == name
+                ]:
+                    scope.imports.pop(import_name)
+
+        return scope
+
+    def _lookup(self, name: str) -> Optional[_Scope]:
+        """Find the scope in which the given name is bound, return None if the name is bound to a local."""
+        scopes = self._scopes
+        if name in scopes[-1].global_names:
+            scopes = scopes[:1]
+
+        for idx in range(len(scopes) - 1, -1, -1):
+            scope = scopes[idx]
+            if scope.kind == "class" and idx != len(scopes) - 1:
+                # Names bound in a class body are not visible in nested scopes.
+                continue
+
+            if name in scope.local_names:
+                return None
+
+            if name in scope.imports_from or name in scope.imported_names:
+                return scope
+
+        return self._scopes[0]
 
     def visit_Import(self, import_node: ast.Import) -> None:  # noqa: N802
         """Visit `import` statements and capture imported modules/names."""
+        imports = self._scopes[-1].imports if self.scope_aware else self.imports
         for alias in import_node.names:
             if alias.asname is not None:
-                if alias.asname in self.imports:
+                if alias.asname in imports and not self.scope_aware:
                     _LOGGER.warning(
                         "Detected multiple imports with same name %r, results of calls "
                         "will differ based on actual execution",
                         alias.asname,
                     )
 
-                self.imports[alias.asname] = alias.name
+                name = alias.asname
             else:
-                self.imports[alias.name] = alias.name
+                name = alias.name
+
+            if self.scope_aware:
+                bound_name = name.split(".", maxsplit=1)[0]
+                scope = self._bind(bound_name, imported=True)
+                scope.imports_from.pop(bound_name, None)
+                scope.imported_names.add(bound_name)
+                imports = scope.imports
+
+            imports[name] = alias.name
 
     def visit_ImportFrom(self, import_from_node: ast.ImportFrom) -> None:  # noqa: N802
         """Visit `import from` statements and capture imported modules/names."""
@@ -82,42 +196,245 @@ class InvectioLibraryUsageVisitor(ast.NodeVisitor):
             )
             return
 
+        imports_from = self.imports_from
         for alias in import_from_node.names:
-            if alias.asname:
-                if (
-                    alias.asname in self.imports_from
-                    and self.imports_from[alias.asname]["module"]
-                    != import_from_node.module
-                ):
-                    _LOGGER.warning(
-                        "Multiple imports for %r found (%r and %r), detection might give misleading results",
-                        import_from_node.module,
-                        self.imports_from[alias.asname]["module"],
-                        alias.asname,
-                    )
-                self.imports_from[alias.asname] = {
-                    "module": import_from_node.module,
-                    "name": alias.name,
-                }
-            else:
-                if (
-                    alias.name in self.imports_from
-                    and self.imports_from[alias.name]["module"]
-                    != import_from_node.module
-                ):
-                    _LOGGER.warning(
-                        "Multiple imports for %r found (%r and %r), detection might give misleading results",
-                        import_from_node.module,
-                        self.imports_from[alias.name]["module"],
-                        alias.name,
-                    )
-                self.imports_from[alias.name] = {
-                    "module": import_from_node.module,
-                    "name": alias.name,
-                }
+            name = alias.asname or alias.name
+
+            if self.scope_aware:
+                # Imports are resolved in the order they are bound, the last binding wins.
+                scope = self._bind(name, imported=True)
+                if name in scope.imported_names:
+                    scope.imported_names.discard(name)
+                    for import_name in [
+                        i for i in scope.imports if i.split(".", maxsplit=1)[0] == name
+                    ]:
+                        scope.imports.pop(import_name)
+                imports_from = scope.imports_from
+            elif (
+                name in imports_from
+                and imports_from[name]["module"] != import_from_node.module
+            ):
+                _LOGGER.warning(
+                    "Multiple imports for %r found (%r and %r), detection might give misleading results",
+                    import_from_node.module,
+                    imports_from[name]["module"],
+                    name,
+                )
+
+            imports_from[name] = {
+                "module": import_from_node.module,
+                "name": alias.name,
+            }
+
+    def visit_Global(self, global_node: ast.Global) -> None:  # noqa: N802
+        """Visit `global` statements, names are bound in the module scope."""
+        self._scopes[-1].global_names.update(global_node.names)
+
+    def visit_Nonlocal(self, nonlocal_node: ast.Nonlocal) -> None:  # noqa: N802
+        """Visit `nonlocal` statements, names are bound in an enclosing function scope."""
+        self._scopes[-1].nonlocal_names.update(nonlocal_node.names)
+
+    def _visit_arguments_enclosing(self, arguments: ast.arguments) -> None:
+        """Visit parts of function arguments evaluated in the enclosing scope."""
+        for default in arguments.defaults:
+            self.visit(default)
+
+        for kw_default in arguments.kw_defaults:
+            if kw_default is not None:
+                self.visit(kw_default)
+
+        for arg in _iter_arguments(arguments):
+            if arg.annotation is not None:
+                self.visit(arg.annotation)
+
+    def _visit_function(
+        self,
+        function_node: Union[ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda],
+    ) -> None:
+        """Visit a function or a lambda, its body is visited in a new scope."""
+        body: Sequence[ast.AST]
+        if isinstance(function_node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            for decorator in function_node.decorator_list:
+                self.visit(decorator)
+
+            self._visit_arguments_enclosing(function_node.args)
+            if function_node.returns is not None:
+                self.visit(function_node.returns)
+
+            self._bind(function_node.name)
+            body = function_node.body
+        else:
+            self._visit_arguments_enclosing(function_node.args)
+            body = [function_node.body]
+
+        self._dispatch_only(function_node.args)
+        self._scopes.append(_Scope(kind="function"))
+        for arg in _iter_arguments(function_node.args):
+            self._dispatch_only(arg)
+            self._bind(arg.arg)
+
+        for item in body:
+            self.visit(item)
+
+        self._scopes.pop()
+
+    def visit_FunctionDef(self, function_def: ast.FunctionDef) -> None:  # noqa: N802
+        """Visit a function definition."""
+        if not self.scope_aware:
+            self.generic_visit(function_def)
+            return
+
+        self._visit_function(function_def)
+
+    def visit_AsyncFunctionDef(  # noqa: N802
+        self,
+        async_function_def: ast.AsyncFunctionDef,
+    ) -> None:
+        """Visit an async function definition."""
+        if not self.scope_aware:
+            self.generic_visit(async_function_def)
+            return
+
+        self._visit_function(async_function_def)
+
+    def visit_Lambda(self, lambda_node: ast.Lambda) -> None:  # noqa: N802
+        """Visit a lambda function."""
+        if not self.scope_aware:
+            self.generic_visit(lambda_node)
+            return
+
+        self._visit_function(lambda_node)
+
+    def visit_ClassDef(self, class_def: ast.ClassDef) -> None:  # noqa: N802
+        """Visit a class definition."""
+        if not self.scope_aware:
+            self.generic_visit(class_def)
+            return
+
+        for decorator in class_def.decorator_list:
+            self.visit(decorator)
+
+        for base in class_def.bases:
+            self.visit(base)
+
+        for keyword in class_def.keywords:
+            self.visit(keyword)
+
+        self._scopes.append(_Scope(kind="class"))
+        for item in class_def.body:
+            self.visit(item)
+        self._scopes.pop()
+
+        self._bind(class_def.name)
+
+    def _visit_comprehension(
+        self,
+        comprehension_node: Union[
+            ast.ListComp,
+            ast.SetComp,
+            ast.GeneratorExp,
+            ast.DictComp,
+        ],
+        elements: List[ast.expr],
+    ) -> None:
+        """Visit a comprehension, targets are bound in a new scope."""
+        if not self.scope_aware:
+            self.generic_visit(comprehension_node)
+            return
+
+        # The first iterable is evaluated in the enclosing scope.
+        self.visit(comprehension_node.generators[0].iter)
+
+        self._scopes.append(_Scope(kind="comprehension"))
+        for idx, generator in enumerate(comprehension_node.generators):
+            self._dispatch_only(generator)
+            if idx != 0:
+                self.visit(generator.iter)
+
+            self.visit(generator.target)
+            for if_node in generator.ifs:
+                self.visit(if_node)
+
+        for element in elements:
+            self.visit(element)
+
+        self._scopes.pop()
+
+    def visit_ListComp(self, list_comp: ast.ListComp) -> None:  # noqa: N802
+        """Visit a list comprehension."""
+        self._visit_comprehension(list_comp, [list_comp.elt])
+
+    def visit_SetComp(self, set_comp: ast.SetComp) -> None:  # noqa: N802
+        """Visit a set comprehension."""
+        self._visit_comprehension(set_comp, [set_comp.elt])
+
+    def visit_GeneratorExp(self, generator_exp: ast.GeneratorExp) -> None:  # noqa: N802
+        """Visit a generator expression."""
+        self._visit_comprehension(generator_exp, [generator_exp.elt])
+
+    def visit_DictComp(self, dict_comp: ast.DictComp) -> None:  # noqa: N802
+        """Visit a dict comprehension."""
+        self._visit_comprehension(dict_comp, [dict_comp.key, dict_comp.value])
+
+    def visit_NamedExpr(self, named_expr: ast.NamedExpr) -> None:  # noqa: N802
+        """Visit an assignment expression, the target is bound outside of comprehensions."""
+        if not self.scope_aware:
+            self.generic_visit(named_expr)
+            return
+
+        self.visit(named_expr.value)
+
+        if self.plugin_dispatcher is not None:
+            self.plugin_dispatcher.walk(named_expr.target)
+
+        comprehension_scopes = []
+        while self._scopes[-1].kind == "comprehension":
+            comprehension_scopes.append(self._scopes.pop())
+
+        self._bind(named_expr.target.id)
+        self._scopes.extend(reversed(comprehension_scopes))
+
+    def visit_ExceptHandler(self, handler: ast.ExceptHandler) -> None:  # noqa: N802
+        """Visit an exception handler, the exception can be bound to a name."""
+        if not self.scope_aware:
+            self.generic_visit(handler)
+            return
+
+        if handler.type is not None:
+            self.visit(handler.type)
+
+        if handler.name is not None:
+            self._bind(handler.name)
+
+        for item in handler.body:
+            self.visit(item)
+
+    def _visit_match_capture(self, pattern: ast.AST, name: Optional[str]) -> None:
+        """Visit a capture pattern in a match statement."""
+        if self.scope_aware and name is not None:
+            self._bind(name)
+
+        self.generic_visit(pattern)
+
+    def visit_MatchAs(self, match_as: ast.AST) -> None:  # noqa: N802
+        """Visit a capture pattern in a match statement."""
+        self._visit_match_capture(match_as, getattr(match_as, "name", None))
+
+    def visit_MatchStar(self, match_star: ast.AST) -> None:  # noqa: N802
+        """Visit a star pattern in a match statement."""
+        self._visit_match_capture(match_star, getattr(match_star, "name", None))
+
+    def visit_MatchMapping(self, match_mapping: ast.AST) -> None:  # noqa: N802
+        """Visit a mapping pattern in a match statement."""
+        self._visit_match_capture(match_mapping, getattr(match_mapping, "rest", None))
 
     def visit_Attribute(self, attr_node: ast.Attribute) -> None:  # noqa: N802
         """Visit a function call in ast."""
+        if self.plugin_dispatcher is not None:
+            # Nodes forming the attribute are not visited, dispatch them to plugins.
+            for child_node in ast.iter_child_nodes(attr_node):
+                self.plugin_dispatcher.walk(child_node)
+
         attrs = []
         item = attr_node
 
@@ -131,42 +448,77 @@ class InvectioLibraryUsageVisitor(ast.NodeVisitor):
                 return
 
         attrs = list(reversed(attrs))
-        self._maybe_mark_usage(item.id, attrs)
+        self._maybe_mark_usage(item.id, attrs, attr_node)
 
     def visit_Name(self, name_name: ast.Name) -> None:  # noqa: N802
         """Visit a name node in ast."""
-        self._maybe_mark_usage(name_name.id, [])
+        if self.scope_aware and not isinstance(name_name.ctx, ast.Load):
+            self._bind(name_name.id)
+            return
+
+        self._maybe_mark_usage(name_name.id, [], name_name)
+
+    def _mark_usage(self, module: str, used: str, node: ast.AST) -> None:
+        """Record usage of a symbol from the given module found in the given node."""
+        self.usage[module].add(used)
+
+        if self.with_counts:
+            module_counts = self.counts.setdefault(module, {})
+            module_counts[used] = module_counts.get(used, 0) + 1
+
+        if self.with_locations:
+            self.locations.setdefault(module, {}).setdefault(used, []).append(
+                (node.lineno, node.col_offset),  # type: ignore
+            )
 
-    def _maybe_mark_usage(self, item_id: str, attrs: list) -> None:
+    def _maybe_mark_usage(self, item_id: str, attrs: list, node: ast.AST) -> None:
         """Mark usage of an attribute."""
+        imports = self.imports
+        imports_from = self.imports_from
+        if self.scope_aware:
+            scope = self._lookup(item_id)
+            if scope is None:
+                _LOGGER.debug("Name %r is shadowed by a local name", item_id)
+                return
+
+            imports = scope.imports
+            imports_from = scope.imports_from
+
         all_import_types = [item_id]
         for attr_item in attrs:
             all_import_types.append(f"{all_import_types[-1]}.{attr_item}")
 
+        # A node can resolve to the same symbol multiple times (e.g. with both `import os` and `import os.path`),
+        # it is still a single usage.
+        marked: Dict[str, str] = {}
+
         for import_type in all_import_types:
-            if import_type in self.imports_from:
-                module = self.imports_from[item_id]["module"].split(".", maxsplit=1)[0]
+            if import_type in imports_from:
+                module = imports_from[item_id]["module"].split(".", maxsplit=1)[0]
 
-                used = self.imports_from[item_id]["module"]
-                used += "." + self.imports_from[item_id]["name"]
+                used = imports_from[item_id]["module"]
+                used += "." + imports_from[item_id]["name"]
                 if attrs:
                     used += "." + ".".join(attrs)
 
-                self.usage[module].add(used)
+                marked[used] = module
 
-            if import_type in self.imports:
-                module = self.imports[import_type].split(".", maxsplit=1)[0]
+            if import_type in imports:
+                module = imports[import_type].split(".", maxsplit=1)[0]
                 used = module + "." + ".".join(attrs)
-                self.usage[module].add(used)
+                marked[used] = module
 
             if not self.without_builtins:
                 if import_type in _BUILTINS:
-                    self.usage["__builtins__"].add(f"__builtins__.{import_type}")
+                    marked[f"__builtins__.{import_type}"] = "__builtins__"
                 elif (
                     import_type.startswith("__builtins__.")
                     and import_type[len("__builtins__.") :] in _BUILTINS
                 ):
-                    self.usage["__builtins__"].add(import_type)
+                    marked[import_type] = "__builtins__"
+
+        for used, module in marked.items():
+            self._mark_usage(module, used, node)
 
     def get_module_report(self) -> dict:
         """Get raw module report after the library scan discovery."""
@@ -308,15 +660,23 @@ class InvectioSymbolsProvidedVisitor:
             if handler:
                 handler(item)
 
-    def get_module_report(self) -> Set[str]:
-        """Get report once the traversal is done."""
-        module_name = (
+    def _get_module_name(self) -> str:
+        """Derive name of the module from the file name."""
+        return (
             self.file_name[: -len(".py")]
             if self.file_name.endswith(".py")
             else self.file_name
         ).replace("/", ".")
+
+    def get_module_report(self) -> Set[str]:
+        """Get report once the traversal is done."""
+        module_name = self._get_module_name()
         return {f"{module_name}.{s}" for s in self.symbols}
 
+    def get_symbols_provided(self) -> SymbolsProvided:
+        """Get symbols provided as a typed result once the traversal is done."""
+        return SymbolsProvided(self._get_module_name(), frozenset(self.symbols))
+
 
 def get_standard_imports() -> Set[str]:
     """Get Python's standard imports."""
@@ -335,104 +695,114 @@ def get_standard_imports() -> Set[str]:
     return result
 
 
-def _get_python_files(path: str) -> List[str]:
-    """Get Python files for the given path."""
-    if os.path.isfile(path):
-        files = [path]
-    else:
-        files = glob.glob(f"{path}/**/*.py", recursive=True)
+def _get_library_usage_file_report(
+    file_ast: ast.Module,
+    *,
+    without_builtins: bool,
+    scope_aware: bool,
+    standard_imports: Optional[Set[str]],
+    builtin_imports: Optional[Set[str]],
+    plugin_dispatcher: Optional[PluginDispatcher] = None,
+    file_counts: Optional[Dict[str, int]] = None,
+    file_locations: Optional[Dict[str, Dict[str, List[int]]]] = None,
+    cells: Optional[List[Tuple[int, int]]] = None,
+) -> Dict[str, Set[str]]:
+    """Compute library usage of a single parsed file as sets of symbols, omit standard and builtin imports if given.
+
+    Counts and encoded locations of symbols used are stored in the given dictionaries, if any. Locations
+    in notebooks are reported relative to cells given as (first line, cell index) pairs.
+    """
+    visitor = InvectioLibraryUsageVisitor(
+        without_builtins=without_builtins,
+        scope_aware=scope_aware,
+        plugin_dispatcher=plugin_dispatcher,
+        with_counts=file_counts is not None,
+        with_locations=file_locations is not None,
+    )
+    visitor.visit(file_ast)
+
+    file_report = {}
+    for module_import, symbols in visitor.usage.items():
+        if standard_imports is not None and module_import in standard_imports:
+            _LOGGER.debug("Omitting standard library import %r", module_import)
+            continue
+
+        if builtin_imports is not None and module_import in builtin_imports:
+            _LOGGER.debug("Omitting builtin import %r", module_import)
+            continue
 
-    if not files:
-        raise FileNotFoundError(f"No files to process for {str(path)!r}")
+        file_report[module_import] = symbols
 
-    return files
+        if file_counts is not None:
+            file_counts.update(visitor.counts[module_import])
 
+        if file_locations is not None:
+            for symbol, locations in visitor.locations[module_import].items():
+                file_locations[symbol] = encode_locations(locations, cells)
 
-def _iter_python_file_ast(
-    path: str, *, ignore_errors: bool
-) -> Generator[Tuple[Path, ast.Module], None, None]:
-    """Get AST for all the files given the path."""
-    for python_file in _get_python_files(path):
-        python_file_path = Path(python_file)
-        _LOGGER.debug("Parsing file %r", str(python_file_path.absolute()))
-        try:
-            yield python_file_path, ast.parse(python_file_path.read_text())
-        except Exception:
-            if ignore_errors:
-                _LOGGER.exception("Failed to parse Python file %r", python_file)
-                continue
+    return file_report
 
-            raise
 
+def get_cell_location(cells: List[Tuple[int, int]], line: int) -> Tuple[int, int]:
+    """Map a line of a module built from notebook cells, given as (first line, cell index) pairs, to cell and line."""
+    first_line, cell_index = cells[
+        max(bisect.bisect_right(cells, (line, sys.maxsize)) - 1, 0)
+    ]
+    return cell_index, line - first_line + 1
 
-def gather_library_usage(
-    path: str,
-    *,
-    ignore_errors: bool = False,
-    without_standard_imports: bool = False,
-    without_builtin_imports: bool = False,
-    without_builtins: bool = False,
-) -> Dict[str, Any]:
-    """Find all sources in the given path and statically extract any library call."""
-    standard_imports: Set[str] = set()
-    if without_standard_imports:
-        standard_imports = get_standard_imports()
-
-    builtin_imports: Set[str] = set()
-    if without_builtin_imports:
-        builtin_imports = set(sys.builtin_module_names)
-
-    report = {}
-
-    for python_file, file_ast in _iter_python_file_ast(
-        path,
-        ignore_errors=ignore_errors,
-    ):
-        visitor = InvectioLibraryUsageVisitor(without_builtins=without_builtins)
-        visitor.visit(file_ast)
-
-        file_report = {}
-        module_report = visitor.get_module_report()
-        for module_import, symbols in module_report.items():
-            if without_standard_imports and module_import in standard_imports:
-                _LOGGER.debug("Omitting standard library import %r", module_import)
-                continue
 
-            if without_builtin_imports and module_import in builtin_imports:
-                _LOGGER.debug("Omitting builtin import %r", module_import)
-                continue
+def encode_locations(
+    locations: Iterable[Tuple[int, int]],
+    cells: Optional[List[Tuple[int, int]]] = None,
+) -> Dict[str, List[int]]:
+    """Encode (line, column) locations compactly, locations are sorted and lines are delta-encoded.
 
-            file_report[module_import] = symbols
+    The first line is stored as is, each following line as a difference to the previous one. If notebook
+    cells are given as (first line, cell index) pairs, lines are relative to cells and cell indexes are stored
+    under the "cells" key.
+    """
+    lines = []
+    columns = []
+    cell_indexes = []
+    last_line = 0
+    for line, column in sorted(locations):
+        if cells:
+            cell_index, line = get_cell_location(cells, line)
+            cell_indexes.append(cell_index)
+
+        lines.append(line - last_line)
+        columns.append(column)
+        last_line = line
+
+    result = {"columns": columns, "lines": lines}
+    if cells:
+        result["cells"] = cell_indexes
+
+    return result
 
-        report[str(python_file)] = file_report
 
-    return {
-        "report": report,
-        "version": invectio_version,
-    }
+def decode_locations(encoded: Dict[str, List[int]]) -> List[Tuple[int, ...]]:
+    """Decode locations encoded using `encode_locations` to a list of (line, column) or (cell, line, column) tuples."""
+    result: List[Tuple[int, ...]] = []
+    line = 0
+    for line_delta, column in zip(encoded["lines"], encoded["columns"]):
+        line += line_delta
+        result.append((line, column))
 
+    if "cells" in encoded:
+        return [(cell, *location) for cell, location in zip(encoded["cells"], result)]
 
-def gather_symbols_provided(
-    path: str,
-    include_private: bool = False,
-    ignore_errors: bool = False,
-) -> Dict[str, Any]:
-    """Gather symbols provided by a library."""
-    report = {}
+    return result
 
-    for python_file, file_ast in _iter_python_file_ast(
-        path,
-        ignore_errors=ignore_errors,
-    ):
-        visitor = InvectioSymbolsProvidedVisitor(
-            file_name=str(python_file),
-            include_private=include_private,
-        )
-        visitor.visit(file_ast)
 
-        report[str(python_file)] = sorted(visitor.get_module_report())
+def __getattr__(name: str) -> Any:
+    """Keep gathering functions importable from their original location, they live in `invectio.gather` now.
+
+    The module is imported lazily as it imports this one.
+    """
+    if name in _MOVED_TO_GATHER:
+        from . import gather
+
+        return getattr(gather, name)
 
-    return {
-        "report": report,
-        "version": invectio_version,
-    }
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Collect progress and throughput metrics of scans, report them on a progress line or in Prometheus text format."""
+
+import bisect
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import Any
+from typing import List
+from typing import Optional
+from typing import TextIO
+
+import attr
+
+_LOGGER = logging.getLogger(__name__)
+
+# Upper bounds of per-file latency histogram buckets in seconds, the last +Inf bucket is implicit.
+_LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+# Minimal number of seconds between two progress reports.
+_REPORT_INTERVAL = 0.5
+_PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@attr.s(slots=True)
+class ScanMetrics:
+    """Counters and a per-file latency histogram updated while sources are scanned.
+
+    Metrics are updated as each file is read, parsed and analyzed. If a progress stream is given, a progress line
+    with throughput and ETA (known only if the number of files to be scanned is known) is rewritten on it. If
+    a text file is given, metrics are written to it in Prometheus text format (e.g. for the node exporter textfile
+    collector). Both are refreshed at most every half a second and once the scan is finished.
+    """
+
+    files_total = attr.ib(type=Optional[int], default=None)
+    progress = attr.ib(type=Optional[TextIO], default=None)
+    textfile = attr.ib(type=Optional[str], default=None)
+    files_processed = attr.ib(type=int, default=0, init=False)
+    parse_errors = attr.ib(type=int, default=0, init=False)
+    bytes_read = attr.ib(type=int, default=0, init=False)
+    latency_sum = attr.ib(type=float, default=0.0, init=False)
+    latency_buckets = attr.ib(
+        type=List[int],
+        init=False,
+        factory=lambda: [0] * (len(_LATENCY_BUCKETS) + 1),
+    )
+    _started = attr.ib(type=float, init=False, factory=time.monotonic)
+    _last_report = attr.ib(type=Optional[float], default=None, init=False)
+    _progress_width = attr.ib(type=int, default=0, init=False)
+    _lock = attr.ib(type=Any, init=False, factory=threading.Lock)
+
+    def observe_file(self, size: int, latency: float, *, error: bool = False) -> None:
+        """Record a file of the given size processed in the given number of seconds."""
+        with self._lock:
+            self.files_processed += 1
+            self.bytes_read += size
+            self.latency_sum += latency
+            self.latency_buckets[bisect.bisect_left(_LATENCY_BUCKETS, latency)] += 1
+            if error:
+                self.parse_errors += 1
+
+        now = time.monotonic()
+        if self._last_report is None or now - self._last_report >= _REPORT_INTERVAL:
+            self._last_report = now
+            self.report()
+
+    def get_rate(self) -> float:
+        """Get number of files processed per second."""
+        elapsed = time.monotonic() - self._started
+        return self.files_processed / elapsed if elapsed > 0 else 0.0
+
+    def get_eta(self) -> Optional[float]:
+        """Get estimated number of seconds until all the files are processed, None if unknown."""
+        rate = self.get_rate()
+        if self.files_total is None or rate == 0.0:
+            return None
+
+        return max(0, self.files_total - self.files_processed) / rate
+
+    def format_progress(self) -> str:
+        """Format a single line describing progress of the scan."""
+        if self.files_total:
+            processed = (
+                f"{self.files_processed}/{self.files_total} files"
+                f" ({100 * self.files_processed / self.files_total:.1f} %)"
+            )
+        else:
+            processed = f"{self.files_processed} files"
+
+        eta = self.get_eta()
+        return (
+            f"{processed}, {self.get_rate():.1f} files/s, {self.bytes_read / 2 ** 20:.1f} MiB read, "
+            f"{self.parse_errors} errors, ETA {timedelta(seconds=round(eta)) if eta is not None else '?'}"
+        )
+
+    def to_prometheus(self) -> str:
+        """Render metrics in Prometheus text exposition format."""
+        with self._lock:
+            lines = [
+                "# HELP invectio_files_processed_total Number of files processed.",
+                "# TYPE invectio_files_processed_total counter",
+                f"invectio_files_processed_total {self.files_processed}",
+                "# HELP invectio_parse_errors_total Number of files that failed to parse.",
+                "# TYPE invectio_parse_errors_total counter",
+                f"invectio_parse_errors_total {self.parse_errors}",
+                "# HELP invectio_bytes_read_total Number of bytes of sources read.",
+                "# TYPE invectio_bytes_read_total counter",
+                f"invectio_bytes_read_total {self.bytes_read}",
+            ]
+            if self.files_total is not None:
+                lines.extend(
+                    (
+                        "# HELP invectio_files Number of files to be processed.",
+                        "# TYPE invectio_files gauge",
+                        f"invectio_files {self.files_total}",
+                    ),
+                )
+
+            lines.extend(
+                (
+                    "# HELP invectio_file_latency_seconds Time spent reading, parsing and analyzing a file.",
+                    "# TYPE invectio_file_latency_seconds histogram",
+                ),
+            )
+            cumulative = 0
+            for bound, count in zip(_LATENCY_BUCKETS, self.latency_buckets):
+                cumulative += count
+                lines.append(
+                    f'invectio_file_latency_seconds_bucket{{le="{bound!r}"}} {cumulative}',
+                )
+
+            lines.extend(
+                (
+                    f'invectio_file_latency_seconds_bucket{{le="+Inf"}} {self.files_processed}',
+                    f"invectio_file_latency_seconds_sum {self.latency_sum}",
+                    f"invectio_file_latency_seconds_count {self.files_processed}",
+                ),
+            )
+
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, textfile: str) -> None:
+        """Atomically write metrics in Prometheus text format to the given file."""
+        temporary_file = f"{textfile}.tmp"
+        with open(temporary_file, "w") as output:
+            output.write(self.to_prometheus())
+
+        os.replace(temporary_file, textfile)
+
+    def report(self, *, final: bool = False) -> None:
+        """Refresh the progress line and the metrics text file, if configured."""
+        if self.progress is not None:
+            line = self.format_progress()
+            # Overwrite leftovers of a longer line reported previously.
+            self.progress.write(f"\r{line.ljust(self._progress_width)}")
+            self._progress_width = len(line)
+            if final:
+                self.progress.write("\n")
+            self.progress.flush()
+
+        if self.textfile is not None:
+            try:
+                self.write_textfile(self.textfile)
+            except OSError as exc:
+                _LOGGER.warning(
+                    "Failed to write metrics to %r: %s",
+                    self.textfile,
+                    str(exc),
+                )
+
+    def serve(self, port: int, address: str = "") -> ThreadingHTTPServer:
+        """Expose metrics over HTTP in a daemon thread, the caller is responsible for shutting the server down."""
+        metrics = self
+
+        class _MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802
+                """Respond with metrics in Prometheus text format."""
+                content = metrics.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", _PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                """Log requests on debug level instead of writing them to standard error."""
+                _LOGGER.debug(format, *args)
+
+        server = ThreadingHTTPServer((address, port), _MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        _LOGGER.info("Serving metrics on port %d", server.server_address[1])
+        return server
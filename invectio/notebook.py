@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Extract Python sources from Jupyter notebooks without loading whole notebooks into memory."""
+
+import codecs
+import io
+import json
+import logging
+import re
+from pathlib import Path
+from typing import IO
+from typing import Any
+from typing import Generator
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+_LOGGER = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 64 * 1024
+_WHITESPACE = " \t\r\n"
+_LITERAL_CHARACTERS = frozenset("+-.0123456789Eaeflnrstu")
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+# Cell magics whose body is Python code, bodies of other cell magics (e.g. %%bash) are dropped.
+_PYTHON_CELL_MAGICS = frozenset(("capture", "debug", "prun", "time", "timeit"))
+_MAGIC_ASSIGNMENT = re.compile(
+    r"^(\s*)([A-Za-z_][\w.]*(?:\s*,\s*[A-Za-z_][\w.]*)*)\s*=\s*[!%]",
+)
+# Help requests, e.g. os.path? or np.*load*?? (wildcard search), optionally followed by a comment.
+_HELP_REQUEST = re.compile(r"^\s*[A-Za-z_*][\w.*]*\s*\?\??\s*(?:#.*)?$")
+_OPENING_BRACKETS = frozenset("([{")
+_CLOSING_BRACKETS = frozenset(")]}")
+
+
+class _JsonPullParser:
+    """A minimal pull parser reading JSON from a stream in chunks.
+
+    Values not needed can be skipped without building Python objects for them, so large values (e.g. cell
+    outputs with embedded images) are never held in memory as a whole.
+    """
+
+    def __init__(self, stream: IO[Any]) -> None:
+        """Initialize the parser reading from the given text or binary stream (UTF-8 is assumed)."""
+        self._stream = stream
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._position = 0
+
+    def _fill(self) -> bool:
+        """Read the next chunk into the buffer, return False at the end of the stream."""
+        chunk = self._stream.read(_CHUNK_SIZE)
+        if not chunk:
+            return False
+
+        if isinstance(chunk, bytes):
+            chunk = self._decoder.decode(chunk)
+
+        self._buffer = self._buffer[self._position :] + chunk
+        self._position = 0
+        return True
+
+    def _peek(self) -> str:
+        """Get the next non-whitespace character without consuming it, empty string at the end of the stream."""
+        while True:
+            while self._position < len(self._buffer):
+                if self._buffer[self._position] not in _WHITESPACE:
+                    return self._buffer[self._position]
+                self._position += 1
+
+            if not self._fill():
+                return ""
+
+    def _expect(self, character: str) -> None:
+        """Consume the given character."""
+        found = self._peek()
+        if found != character:
+            raise ValueError(
+                f"Invalid JSON, expected {character!r} but found {found!r}",
+            )
+
+        self._position += 1
+
+    def _scan_string(self, keep: bool) -> Optional[str]:
+        """Scan a string, the opening quote has to be consumed already, return its raw content if requested."""
+        parts = []
+        while True:
+            match = _STRING_SPECIAL.search(self._buffer, self._position)
+            if match is None or (
+                match.group() == "\\" and match.start() + 1 >= len(self._buffer)
+            ):
+                end = len(self._buffer) if match is None else match.start()
+                if keep:
+                    parts.append(self._buffer[self._position : end])
+                self._position = end
+                if not self._fill():
+                    raise ValueError("Invalid JSON, unterminated string")
+                continue
+
+            if match.group() == '"':
+                if keep:
+                    parts.append(self._buffer[self._position : match.start()])
+                self._position = match.start() + 1
+                return "".join(parts) if keep else None
+
+            # Keep the backslash together with the escaped character.
+            if keep:
+                parts.append(self._buffer[self._position : match.start() + 2])
+            self._position = match.start() + 2
+
+    def _read_string(self) -> str:
+        """Read a string value."""
+        self._expect('"')
+        return json.loads(f'"{self._scan_string(keep=True)}"')
+
+    def _read_literal(self) -> Any:
+        """Read a number, true, false or null."""
+        self._peek()
+        parts = []
+        while True:
+            start = self._position
+            while (
+                self._position < len(self._buffer)
+                and self._buffer[self._position] in _LITERAL_CHARACTERS
+            ):
+                self._position += 1
+
+            parts.append(self._buffer[start : self._position])
+            if self._position < len(self._buffer) or not self._fill():
+                break
+
+        literal = "".join(parts)
+        if not literal:
+            raise ValueError(f"Invalid JSON, unexpected character {self._peek()!r}")
+
+        return json.loads(literal)
+
+    def iter_object(self) -> Generator[str, None, None]:
+        """Iterate over keys of an object, the value has to be read or skipped before the iteration continues."""
+        self._expect("{")
+        if self._peek() == "}":
+            self._position += 1
+            return
+
+        while True:
+            key = self._read_string()
+            self._expect(":")
+            yield key
+
+            character = self._peek()
+            self._position += 1
+            if character == "}":
+                return
+            if character != ",":
+                raise ValueError(
+                    f"Invalid JSON, expected ',' or '}}' but found {character!r}",
+                )
+
+    def iter_array(self) -> Generator[int, None, None]:
+        """Iterate over indexes of array items, the item has to be read or skipped before the iteration continues."""
+        self._expect("[")
+        if self._peek() == "]":
+            self._position += 1
+            return
+
+        index = 0
+        while True:
+            yield index
+            index += 1
+
+            character = self._peek()
+            self._position += 1
+            if character == "]":
+                return
+            if character != ",":
+                raise ValueError(
+                    f"Invalid JSON, expected ',' or ']' but found {character!r}",
+                )
+
+    def read_value(self) -> Any:
+        """Read the next value."""
+        character = self._peek()
+        if character == "{":
+            return {key: self.read_value() for key in self.iter_object()}
+        if character == "[":
+            return [self.read_value() for _ in self.iter_array()]
+        if character == '"':
+            return self._read_string()
+
+        return self._read_literal()
+
+    def skip_value(self) -> None:
+        """Skip the next value without building it."""
+        character = self._peek()
+        if character == "{":
+            for _ in self.iter_object():
+                self.skip_value()
+        elif character == "[":
+            for _ in self.iter_array():
+                self.skip_value()
+        elif character == '"':
+            self._position += 1
+            self._scan_string(keep=False)
+        else:
+            self._read_literal()
+
+
+def iter_notebook_cells(stream: IO[Any]) -> Generator[Tuple[int, str], None, None]:
+    """Iterate over code cells of a notebook (nbformat 4), yield cell indexes and sources.
+
+    Cells are indexed from 0 including non-code cells. Values other than cell types and sources
+    (e.g. outputs) are skipped while parsing.
+    """
+    parser = _JsonPullParser(stream)
+    for key in parser.iter_object():
+        if key != "cells":
+            parser.skip_value()
+            continue
+
+        for index in parser.iter_array():
+            cell_type = None
+            source = None
+            for cell_key in parser.iter_object():
+                if cell_key == "cell_type":
+                    cell_type = parser.read_value()
+                elif cell_key == "source":
+                    source = parser.read_value()
+                else:
+                    parser.skip_value()
+
+            if cell_type == "code" and source is not None:
+                yield index, "".join(source) if isinstance(source, list) else source
+
+        # Nothing else is needed from the notebook.
+        return
+
+    _LOGGER.warning("No cells found in the notebook, only nbformat 4 is supported")
+
+
+def _scan_line(
+    line: str,
+    depth: int,
+    quote: Optional[str],
+) -> Tuple[int, Optional[str], bool]:
+    """Scan a line of Python code to find out whether the logical line continues on the next line.
+
+    Take bracket depth and quote of the string open at the start of the line, return them as found at the end
+    of the line along with a flag stating whether the line is explicitly joined with the next one.
+    """
+    joined = False
+    position = 0
+    while position < len(line):
+        character = line[position]
+        if character == "\\":
+            # A backslash escapes the next character in strings, joins lines if it is the last one.
+            joined = position == len(line) - 1
+            position += 2
+        elif quote is not None:
+            if line.startswith(quote, position):
+                position += len(quote)
+                quote = None
+            else:
+                position += 1
+        elif character == "#":
+            break
+        elif character in "\"'":
+            quote = (
+                character * 3 if line.startswith(character * 3, position) else character
+            )
+            position += len(quote)
+        else:
+            if character in _OPENING_BRACKETS:
+                depth += 1
+            elif character in _CLOSING_BRACKETS:
+                depth = max(depth - 1, 0)
+            position += 1
+
+    if quote is not None and len(quote) == 1 and not joined:
+        # An unterminated string literal, the parser reports it.
+        quote = None
+
+    return depth, quote, joined
+
+
+def strip_magics(source: str) -> str:
+    """Replace IPython magics, shell commands and help requests with Python statements, line numbers are kept."""
+    lines = source.splitlines()
+    if lines and lines[0].startswith("%%"):
+        magic = lines[0][2:].split(maxsplit=1)
+        if magic and magic[0] in _PYTHON_CELL_MAGICS:
+            lines[0] = ""
+        else:
+            return "\n" * len(lines)
+
+    result = []
+    depth, quote, joined = 0, None, False
+    for line in lines:
+        if depth or quote is not None or joined:
+            # Magics can only start a logical line, this one continues a Python statement.
+            result.append(line)
+            depth, quote, joined = _scan_line(line, depth, quote)
+            continue
+
+        stripped = line.lstrip()
+        indentation = line[: len(line) - len(stripped)]
+        assignment = _MAGIC_ASSIGNMENT.match(line)
+        if assignment is not None:
+            # Keep names bound, e.g. files = !ls
+            result.append(f"{assignment.group(1)}{assignment.group(2)} = None")
+        elif stripped.startswith(("%", "!", "?")) or _HELP_REQUEST.match(line):
+            result.append(f"{indentation}pass")
+        else:
+            result.append(line)
+            depth, quote, joined = _scan_line(line, depth, quote)
+
+    return "\n".join(result) + "\n"
+
+
+def read_notebook(
+    content: Union[bytes, str, Path, IO[Any]],
+) -> Tuple[str, List[Tuple[int, int]]]:
+    """Turn code cells of a notebook into a single module.
+
+    Return Python source and (first line, cell index) pairs for each code cell so that lines in the module
+    can be mapped back to cells.
+    """
+    if isinstance(content, Path):
+        with open(content, "rb") as notebook_file:
+            return read_notebook(notebook_file)
+
+    if isinstance(content, bytes):
+        content = io.BytesIO(content)
+    elif isinstance(content, str):
+        content = io.StringIO(content)
+
+    parts = []
+    cells = []
+    line = 1
+    for index, cell_source in iter_notebook_cells(content):
+        python_source = strip_magics(cell_source)
+        cells.append((line, index))
+        parts.append(python_source)
+        line += python_source.count("\n")
+
+    return "".join(parts), cells
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Plugins run in the same traversal of sources as Invectio visitors."""
+
+import abc
+import ast
+import logging
+from importlib import metadata
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Type
+
+import attr
+
+_LOGGER = logging.getLogger(__name__)
+_ENTRY_POINT_GROUP = "invectio.plugins"
+
+_REGISTERED_PLUGINS: List[Type["InvectioPlugin"]] = []
+_ENTRY_POINT_PLUGINS: Optional[List[Type["InvectioPlugin"]]] = None
+
+
+class InvectioPlugin(abc.ABC):
+    """A base class for plugins, a plugin instance is created for each file analyzed.
+
+    Plugins implement `visit_<NodeType>` methods the same way as `ast.NodeVisitor` does, each method is called
+    once for every node of the given type. Unlike with `ast.NodeVisitor`, the methods must not visit child nodes.
+    Results returned by `get_report` are stored in the "plugins" part of the report under the plugin name.
+    """
+
+    name: str = ""
+
+    def __init__(self, file_name: str) -> None:
+        """Initialize the plugin for the given file."""
+        self.file_name = file_name
+
+    @abc.abstractmethod
+    def get_report(self) -> Any:
+        """Get a JSON serializable report once the traversal is done."""
+
+
+def register_plugin(plugin: Type[InvectioPlugin]) -> Type[InvectioPlugin]:
+    """Register the given plugin class, can be used as a class decorator."""
+    if not plugin.name:
+        raise ValueError(f"Plugin {plugin.__name__!r} does not state its name")
+
+    if plugin not in _REGISTERED_PLUGINS:
+        _REGISTERED_PLUGINS.append(plugin)
+
+    return plugin
+
+
+def _load_entry_point_plugins() -> List[Type[InvectioPlugin]]:
+    """Load plugins registered using entry points."""
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        group = entry_points.select(group=_ENTRY_POINT_GROUP)  # type: ignore
+    else:
+        group = entry_points.get(_ENTRY_POINT_GROUP, [])  # type: ignore
+
+    result = []
+    for entry_point in group:
+        _LOGGER.debug("Loading plugin %r from %r", entry_point.name, entry_point.value)
+        result.append(entry_point.load())
+
+    return result
+
+
+def get_plugins() -> List[Type[InvectioPlugin]]:
+    """Get all the plugins registered in code or using entry points (group `invectio.plugins`)."""
+    global _ENTRY_POINT_PLUGINS
+
+    if _ENTRY_POINT_PLUGINS is None:
+        _ENTRY_POINT_PLUGINS = _load_entry_point_plugins()
+
+    result = list(_REGISTERED_PLUGINS)
+    for plugin in _ENTRY_POINT_PLUGINS:
+        if plugin not in result:
+            result.append(plugin)
+
+    return result
+
+
+@attr.s(slots=True)
+class PluginDispatcher:
+    """Dispatch AST nodes to plugins interested in them."""
+
+    plugins = attr.ib(type=List[InvectioPlugin])
+    _handlers = attr.ib(
+        type=Dict[type, List[Callable[[ast.AST], None]]],
+        factory=dict,
+        init=False,
+    )
+
+    @classmethod
+    def create(
+        cls,
+        plugins: Sequence[Type[InvectioPlugin]],
+        file_name: str,
+    ) -> "PluginDispatcher":
+        """Instantiate the given plugins for the given file."""
+        return cls(plugins=[plugin(file_name) for plugin in plugins])
+
+    def dispatch(self, node: ast.AST) -> None:
+        """Dispatch the given node to interested plugins, child nodes are not dispatched."""
+        handlers = self._handlers.get(node.__class__)
+        if handlers is None:
+            handler_name = f"visit_{node.__class__.__name__}"
+            handlers = [
+                getattr(plugin, handler_name)
+                for plugin in self.plugins
+                if hasattr(plugin, handler_name)
+            ]
+            self._handlers[node.__class__] = handlers
+
+        for handler in handlers:
+            handler(node)
+
+    def walk(self, node: ast.AST) -> None:
+        """Dispatch the given node and all its child nodes."""
+        for item in ast.walk(node):
+            self.dispatch(item)
+
+    def get_reports(self) -> Dict[str, Any]:
+        """Get reports of all the plugins keyed by plugin names."""
+        return {plugin.name: plugin.get_report() for plugin in self.plugins}
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Check whether sources use the given library symbols, stop as soon as all of them are found."""
+
+import ast
+import logging
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Generator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Set
+from typing import Tuple
+from typing import Union
+
+import attr
+
+from invectio import __version__ as invectio_version
+from .lib import InvectioLibraryUsageVisitor
+from .lib import get_cell_location
+from .notebook import read_notebook
+from .sources import _NOTEBOOK_SUFFIX
+from .sources import _get_python_files
+from .sources import _iter_source_ast
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _AllFound(Exception):
+    """Raised to stop the traversal once all the symbols queried were found."""
+
+
+@attr.s(slots=True)
+class _InvectioUsesVisitor(InvectioLibraryUsageVisitor):
+    """Visitor recording the first location of symbols queried instead of building the usage report."""
+
+    file_name = attr.ib(type=str, default="")
+    pending = attr.ib(type=Set[str], factory=set)
+    found = attr.ib(type=Dict[str, Dict[str, Any]], factory=dict)
+    cells = attr.ib(type=Optional[List[Tuple[int, int]]], default=None)
+
+    def _mark_usage(self, module: str, used: str, node: ast.AST) -> None:
+        """Record the location if the used symbol matches a pending query."""
+        for symbol in [
+            s for s in self.pending if used == s or used.startswith(f"{s}.")
+        ]:
+            self.pending.discard(symbol)
+            self.found[symbol] = {
+                "column": getattr(node, "col_offset", None),
+                "file": self.file_name,
+                "line": getattr(node, "lineno", None),
+                "symbol": used,
+            }
+            if self.cells and self.found[symbol]["line"] is not None:
+                # Locations in notebooks are relative to cells.
+                cell, line = get_cell_location(self.cells, self.found[symbol]["line"])
+                self.found[symbol].update(cell=cell, line=line)
+
+        if not self.pending:
+            raise _AllFound
+
+
+def _get_module(symbol: str) -> str:
+    """Get top-level module of the given symbol."""
+    return symbol.split(".", maxsplit=1)[0]
+
+
+def _iter_prescanned_sources(
+    python_files: List[str],
+    pending: Set[str],
+) -> Generator[Tuple[str, Union[bytes, Path]], None, None]:
+    """Read the given files, skip files which do not mention any module of symbols still pending.
+
+    Builtins are available without any import, files are not skipped if a builtin is queried. Code cells of
+    notebooks are extracted (streaming the notebook) to be checked, notebooks are read again when parsed.
+    """
+    for python_file in python_files:
+        if not pending:
+            return
+
+        modules = {_get_module(symbol) for symbol in pending}
+        content: Union[bytes, Path]
+        if python_file.endswith(_NOTEBOOK_SUFFIX):
+            content = Path(python_file)
+            notebook_source = read_notebook(content)[0]
+            mentioned = any(module in notebook_source for module in modules)
+        else:
+            content = Path(python_file).read_bytes()
+            mentioned = any(module.encode() in content for module in modules)
+
+        if "__builtins__" not in modules and not mentioned:
+            _LOGGER.debug(
+                "Skipping file %r, none of the modules queried is mentioned",
+                python_file,
+            )
+            continue
+
+        yield python_file, content
+
+
+def find_library_usage(
+    path: str,
+    symbols: Sequence[str],
+    *,
+    ignore_errors: bool = False,
+    scope_aware: bool = False,
+    target_python: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Check whether sources in the given path use the given symbols, report the first location of each symbol.
+
+    A symbol matches its usage or usage of any of its attributes (e.g. "os.path" matches "os.path.join", "os"
+    matches any usage of the os module). Files not mentioning modules of any of the symbols still looked for are
+    not parsed, files are not processed further once all the symbols are found. Builtins are queried as
+    "__builtins__.<name>".
+    """
+    pending = set(symbols)
+    found: Dict[str, Dict[str, Any]] = {}
+    errors: Dict[str, str] = {}
+    without_builtins = all(_get_module(symbol) != "__builtins__" for symbol in symbols)
+
+    python_files = sorted(_get_python_files(path, notebooks=True))
+    notebook_cells: Dict[str, List[Tuple[int, int]]] = {}
+    for file_name, file_ast in _iter_source_ast(
+        _iter_prescanned_sources(python_files, pending),
+        ignore_errors=ignore_errors,
+        target_python=target_python,
+        errors=errors,
+        notebook_cells=notebook_cells,
+    ):
+        visitor = _InvectioUsesVisitor(
+            without_builtins=without_builtins,
+            scope_aware=scope_aware,
+            file_name=file_name,
+            pending=pending,
+            found=found,
+            cells=notebook_cells.pop(file_name, None),
+        )
+        try:
+            visitor.visit(file_ast)
+        except _AllFound:
+            _LOGGER.debug("All the symbols queried were found in %r", file_name)
+            break
+
+    return {
+        "errors": errors,
+        "found": found,
+        "missing": sorted(pending),
+        "version": invectio_version,
+    }
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Typed results of the analysis backed by frozensets, serialized only when asked."""
+
+from collections.abc import Mapping
+from typing import AbstractSet
+from typing import Dict
+from typing import FrozenSet
+from typing import Iterator
+from typing import List
+
+import attr
+
+
+@attr.s(slots=True, frozen=True, hash=False)
+class LibraryUsage(Mapping):
+    """Library usage of a single file - symbols used keyed by modules they are imported from.
+
+    The object is a read-only mapping of modules to frozensets of symbols. Nothing is sorted or copied into
+    lists until the report form is requested using `to_dict`.
+    """
+
+    _usage = attr.ib(type=Dict[str, FrozenSet[str]])
+
+    @classmethod
+    def from_sets(cls, usage: "Mapping[str, AbstractSet[str]]") -> "LibraryUsage":
+        """Create library usage from sets of symbols used keyed by modules."""
+        return cls({module: frozenset(symbols) for module, symbols in usage.items()})
+
+    def __getitem__(self, module: str) -> FrozenSet[str]:
+        """Get symbols used from the given module."""
+        return self._usage[module]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over modules used."""
+        return iter(self._usage)
+
+    def __len__(self) -> int:
+        """Get number of modules used."""
+        return len(self._usage)
+
+    def uses(self, symbol: str) -> bool:
+        """Check if the given symbol (e.g. "os.path.join") is used."""
+        # Symbols are keyed by their top-level module.
+        return symbol in self._usage.get(symbol.split(".", maxsplit=1)[0], ())
+
+    def count(self) -> int:
+        """Get number of symbols used."""
+        return sum(len(symbols) for symbols in self._usage.values())
+
+    def to_dict(self) -> Dict[str, List[str]]:
+        """Get the report form of library usage - sorted lists of symbols keyed by modules."""
+        return {
+            module: sorted(symbols) for module, symbols in sorted(self._usage.items())
+        }
+
+
+@attr.s(slots=True, frozen=True)
+class SymbolsProvided:
+    """Symbols provided by a single module, symbols are reported as dotted names prefixed with the module name.
+
+    Names are kept in a frozenset, dotted names are built only when iterating or when the report form is
+    requested using `to_list`.
+    """
+
+    module_name = attr.ib(type=str)
+    names = attr.ib(type=FrozenSet[str])
+
+    def __contains__(self, symbol: object) -> bool:
+        """Check if the given dotted name (e.g. "mypkg.module.func") is provided."""
+        prefix = f"{self.module_name}."
+        return (
+            isinstance(symbol, str)
+            and symbol.startswith(prefix)
+            and symbol[len(prefix) :] in self.names
+        )
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over dotted names of symbols provided, in no particular order."""
+        return (f"{self.module_name}.{name}" for name in self.names)
+
+    def __len__(self) -> int:
+        """Get number of symbols provided."""
+        return len(self.names)
+
+    def to_list(self) -> List[str]:
+        """Get the report form of symbols provided - a sorted list of dotted names."""
+        return sorted(self)
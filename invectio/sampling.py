@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Estimate library usage by analyzing a random sample of files."""
+
+import logging
+import math
+import os
+import random
+from pathlib import Path
+from statistics import NormalDist
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+from typing import Union
+
+from invectio import __version__ as invectio_version
+from .gather import iter_library_usage_from_sources
+from .sources import _get_python_files
+
+_LOGGER = logging.getLogger(__name__)
+_ROOT_STRATUM = "."
+
+Sample = Union[float, int]
+
+
+def parse_sample(sample: str) -> Sample:
+    """Parse sample size given as a fraction of files (e.g. 0.1) or as a number of files (e.g. 1000)."""
+    try:
+        if "." not in sample:
+            count = int(sample)
+            if count < 1:
+                raise ValueError
+            return count
+
+        fraction = float(sample)
+        if not 0.0 < fraction <= 1.0:
+            raise ValueError
+        return fraction
+    except ValueError as exc:
+        raise ValueError(
+            f"Invalid sample {sample!r}, expected a fraction in (0, 1] or a positive number of files",
+        ) from exc
+
+
+def _get_stratum(python_file: str, root: str) -> str:
+    """Get stratum of the given file - the top-level directory it is stored in relative to the root."""
+    parts = Path(os.path.relpath(python_file, root)).parts
+    return parts[0] if len(parts) > 1 else _ROOT_STRATUM
+
+
+def _get_sample_size(sample: Sample, population: int) -> int:
+    """Get number of files to be sampled from the given population."""
+    if isinstance(sample, float):
+        return min(population, max(1, round(sample * population)))
+
+    return min(population, sample)
+
+
+def sample_files(
+    python_files: List[str],
+    sample: Sample,
+    *,
+    seed: int,
+    root: Optional[str] = None,
+) -> Dict[str, Tuple[int, List[str]]]:
+    """Sample the given files, return population size and sampled files for each stratum.
+
+    If a root is given, files are stratified by the top-level directory relative to the root and each stratum is
+    sampled proportionally (at least one file per stratum). Otherwise all files form a single stratum.
+    """
+    strata: Dict[str, List[str]] = {}
+    for python_file in sorted(python_files):
+        stratum = _get_stratum(python_file, root) if root is not None else _ROOT_STRATUM
+        strata.setdefault(stratum, []).append(python_file)
+
+    size = _get_sample_size(sample, len(python_files))
+    rng = random.Random(seed)
+
+    result = {}
+    for stratum in sorted(strata):
+        population = strata[stratum]
+        stratum_size = min(
+            len(population),
+            max(1, round(size * len(population) / len(python_files))),
+        )
+        result[stratum] = (
+            len(population),
+            sorted(rng.sample(population, stratum_size)),
+        )
+
+    return result
+
+
+def _wilson_interval(
+    successes: int,
+    sampled: int,
+    population: int,
+    z: float,
+) -> Tuple[float, float]:
+    """Compute Wilson score interval for a proportion, finite population correction adjusts the sample size."""
+    proportion = successes / sampled
+    if sampled >= population:
+        return proportion, proportion
+
+    # The effective sample size grows as the sample approaches the whole population.
+    effective = sampled * (population - 1) / (population - sampled)
+    denominator = 1 + z * z / effective
+    center = (proportion + z * z / (2 * effective)) / denominator
+    margin = (
+        z
+        * math.sqrt(
+            proportion * (1 - proportion) / effective
+            + z * z / (4 * effective * effective),
+        )
+        / denominator
+    )
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def _stratified_interval(
+    strata: List[Tuple[int, int, int]],
+    population: int,
+    z: float,
+) -> Tuple[float, Tuple[float, float]]:
+    """Estimate a proportion and its normal approximation interval from (successes, sampled, population) of strata.
+
+    Variance of a stratum with a single file sampled cannot be estimated, its upper bound is used instead.
+    """
+    estimate = 0.0
+    variance = 0.0
+    for successes, sampled, stratum_population in strata:
+        weight = stratum_population / population
+        proportion = successes / sampled
+        estimate += weight * proportion
+        correction = 1 - sampled / stratum_population
+        if sampled > 1:
+            stratum_variance = proportion * (1 - proportion) / (sampled - 1)
+        else:
+            stratum_variance = 0.25
+
+        variance += weight * weight * correction * stratum_variance
+
+    margin = z * math.sqrt(variance)
+    return estimate, (max(0.0, estimate - margin), min(1.0, estimate + margin))
+
+
+def _estimate(
+    strata_counts: List[Tuple[int, int, int]],
+    population: int,
+    z: float,
+) -> Dict[str, Any]:
+    """Estimate the number of files using a module or a symbol from counts observed in strata."""
+    if len(strata_counts) == 1:
+        successes, sampled, _ = strata_counts[0]
+        frequency = successes / sampled
+        interval = _wilson_interval(successes, sampled, population, z)
+    else:
+        frequency, interval = _stratified_interval(strata_counts, population, z)
+
+    return {
+        "files": round(frequency * population, 2),
+        "frequency": round(frequency, 6),
+        "interval": [round(interval[0], 6), round(interval[1], 6)],
+    }
+
+
+def _get_strata_counts(
+    counts: Dict[str, int],
+    strata: Dict[str, Tuple[int, List[str]]],
+    sampled: Dict[str, int],
+) -> List[Tuple[int, int, int]]:
+    """Get (successes, sampled, population) for strata with at least one file analyzed."""
+    return [
+        (counts.get(stratum, 0), sampled[stratum], strata[stratum][0])
+        for stratum in sampled
+    ]
+
+
+def gather_library_usage_sample(
+    path: str,
+    sample: Sample,
+    *,
+    seed: Optional[int] = None,
+    stratify: bool = False,
+    confidence: float = 0.95,
+    ignore_errors: bool = False,
+    without_standard_imports: bool = False,
+    without_builtin_imports: bool = False,
+    without_builtins: bool = False,
+    scope_aware: bool = False,
+    target_python: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Estimate library usage in the given path by analyzing a random sample of files.
+
+    The sample is given as a fraction of files (float) or as a number of files (int). Results are reproducible
+    for the same seed, the seed used is reported. For each module and symbol, the estimated number and frequency
+    of files using it is reported under the "estimates" key together with a confidence interval - a Wilson score
+    interval, or a normal approximation interval if files are stratified by top-level directories. Finite
+    population correction is applied in both cases. Files that fail to parse are excluded from the sample.
+    """
+    if not 0.0 < confidence < 1.0:
+        raise ValueError(
+            f"Invalid confidence level {confidence!r}, expected a value in (0, 1)",
+        )
+
+    if seed is None:
+        seed = random.randrange(2**32)
+
+    python_files = _get_python_files(path, notebooks=True)
+    root = (
+        (path if os.path.isdir(path) else os.path.dirname(path)) if stratify else None
+    )
+    strata = sample_files(python_files, sample, seed=seed, root=root)
+    z = NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+
+    errors: Dict[str, str] = {}
+    report: Dict[str, Dict[str, List[str]]] = {}
+    # Counts of files using modules and symbols per stratum.
+    module_counts: Dict[str, Dict[str, int]] = {}
+    symbol_counts: Dict[str, Dict[str, Dict[str, int]]] = {}
+    sampled: Dict[str, int] = {}
+    for stratum, (_, stratum_files) in strata.items():
+        for file_name, file_report in iter_library_usage_from_sources(
+            ((python_file, Path(python_file)) for python_file in stratum_files),
+            ignore_errors=ignore_errors,
+            without_standard_imports=without_standard_imports,
+            without_builtin_imports=without_builtin_imports,
+            without_builtins=without_builtins,
+            scope_aware=scope_aware,
+            target_python=target_python,
+            errors=errors,
+        ):
+            report[file_name] = file_report
+            sampled[stratum] = sampled.get(stratum, 0) + 1
+            for module, symbols in file_report.items():
+                counts = module_counts.setdefault(module, {})
+                counts[stratum] = counts.get(stratum, 0) + 1
+                module_symbol_counts = symbol_counts.setdefault(module, {})
+                for symbol in set(symbols):
+                    counts = module_symbol_counts.setdefault(symbol, {})
+                    counts[stratum] = counts.get(stratum, 0) + 1
+
+    # Strata with all the sampled files failing to parse cannot be used for estimation.
+    population = sum(strata[stratum][0] for stratum in sampled)
+    skipped: Set[str] = strata.keys() - sampled.keys()
+    if skipped:
+        _LOGGER.warning(
+            "No file could be analyzed in strata %s, estimates do not cover them",
+            sorted(skipped),
+        )
+
+    single = sorted(
+        stratum
+        for stratum, stratum_sampled in sampled.items()
+        if stratum_sampled == 1 and strata[stratum][0] > 1
+    )
+    if stratify and single:
+        _LOGGER.warning(
+            "Only one file analyzed in strata %s, intervals are widened to cover any variance in them",
+            single,
+        )
+
+    estimates = {}
+    for module in sorted(module_counts):
+        estimates[module] = _estimate(
+            _get_strata_counts(module_counts[module], strata, sampled),
+            population,
+            z,
+        )
+        estimates[module]["symbols"] = {
+            symbol: _estimate(
+                _get_strata_counts(counts, strata, sampled),
+                population,
+                z,
+            )
+            for symbol, counts in sorted(symbol_counts[module].items())
+        }
+
+    sample_info: Dict[str, Any] = {
+        "confidence": confidence,
+        "files": len(python_files),
+        "sampled": sum(sampled.values()),
+        "seed": seed,
+    }
+    if stratify:
+        sample_info["strata"] = {
+            stratum: {"files": stratum_population, "sampled": sampled.get(stratum, 0)}
+            for stratum, (stratum_population, _) in strata.items()
+        }
+
+    return {
+        "errors": errors,
+        "estimates": estimates,
+        "report": report,
+        "sample": sample_info,
+        "version": invectio_version,
+    }
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Split scans into shards and merge their results."""
+
+import hashlib
+import heapq
+import json
+import logging
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Generator
+from typing import List
+from typing import Optional
+from typing import TextIO
+from typing import Tuple
+
+from invectio import __version__ as invectio_version
+from .aggregate import merge_counts
+from .aggregate import merge_usage
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def parse_shard(shard: str) -> Tuple[int, int]:
+    """Parse shard given as K/N, where K is the shard number (starting from 1) and N the number of shards."""
+    try:
+        index, count = (int(i) for i in shard.split("/", maxsplit=1))
+    except ValueError as exc:
+        raise ValueError(f"Invalid shard {shard!r}, expected K/N") from exc
+
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(
+            f"Invalid shard {shard!r}, shard number has to be between 1 and number of shards",
+        )
+
+    return index, count
+
+
+def in_shard(key: str, shard: Tuple[int, int]) -> bool:
+    """Check if the given key (a file path or a distribution name) belongs to the given shard.
+
+    The assignment is based on a hash of the key so it is stable across processes and machines.
+    """
+    index, count = shard
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count == index - 1
+
+
+def _write_record(record: Dict[str, Any], output: TextIO) -> None:
+    """Write a single record of newline delimited JSON."""
+    output.write(json.dumps(record, sort_keys=True))
+    output.write("\n")
+
+
+def _get_header(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Get entries describing the whole result, they are written to the header record."""
+    header: Dict[str, Any] = {}
+    if "aggregate" in result:
+        header["aggregate"] = result["aggregate"]
+
+    for part in ("counts", "locations"):
+        if part in result:
+            header[part] = True
+
+    if "plugins" in result:
+        header["plugins"] = sorted(result["plugins"])
+
+    if "distributions" in result:
+        header["distributions"] = True
+
+    return header
+
+
+def write_ndjson(result: Dict[str, Any], output: TextIO) -> None:
+    """Write the given result as newline delimited JSON, one record per file sorted by file name.
+
+    Records are objects with "key" (file, directory or package if usage is aggregated, or distribution name)
+    and either "report" (along with "counts", "locations" and reports of plugins under "plugins", if any) or
+    "error" entries. Distributions providing modules used are written as records with "key" (module name) and
+    "distributions" entries after records of files. If any of the optional parts is present, the first record
+    is a header record with a "header" entry.
+    """
+    header = _get_header(result)
+    if header:
+        _write_record({"header": header}, output)
+
+    errors = result["errors"]
+    report = result["report"]
+    plugins = result.get("plugins", {})
+    for key in sorted(errors.keys() | report.keys()):
+        if key in report:
+            record = {"key": key, "report": report[key]}
+            for part in ("counts", "locations"):
+                if key in result.get(part, {}):
+                    record[part] = result[part][key]
+
+            key_plugins = {
+                plugin_name: plugin_report[key]
+                for plugin_name, plugin_report in plugins.items()
+                if key in plugin_report
+            }
+            if key_plugins:
+                record["plugins"] = key_plugins
+            _write_record(record, output)
+
+        if key in errors:
+            _write_record({"key": key, "error": errors[key]}, output)
+
+    for module, distributions in sorted(result.get("distributions", {}).items()):
+        _write_record({"key": module, "distributions": distributions}, output)
+
+
+def _read_header(file_path: str) -> Dict[str, Any]:
+    """Read the header record of a newline delimited JSON file, if any."""
+    with open(file_path) as shard_file:
+        for line in shard_file:
+            if line.strip():
+                return json.loads(line).get("header", {})
+
+    return {}
+
+
+def _iter_records(
+    file_path: str,
+    kind: str,
+    name: Optional[str] = None,
+) -> Generator[Tuple[str, Any], None, None]:
+    """Iterate over records of the given kind stored in a newline delimited JSON file.
+
+    If a name is given, records of the given kind are objects and only their entry of the given name is yielded.
+    """
+    with open(file_path) as shard_file:
+        for line in shard_file:
+            if not line.strip():
+                continue
+
+            record = json.loads(line)
+            if "key" not in record or kind not in record:
+                continue
+
+            value = record[kind]
+            if name is not None:
+                if name not in value:
+                    continue
+                value = value[name]
+
+            yield record["key"], value
+
+
+def _keep_first(value: Any, _: Any) -> Any:
+    """Keep the first of duplicate values, meant for values that are the same in all the shards."""
+    return value
+
+
+def _iter_merged(
+    shard_files: List[str],
+    kind: str,
+    name: Optional[str],
+    combine: Optional[Callable[[Any, Any], Any]],
+) -> Generator[Tuple[str, Any], None, None]:
+    """Merge sorted records of the given kind from all the shards, values of records with the same key are combined."""
+    last_key = None
+    last_value = None
+    for key, value in heapq.merge(
+        *(_iter_records(file_path, kind, name) for file_path in shard_files),
+        key=lambda item: item[0],
+    ):
+        if key == last_key:
+            if combine is None:
+                _LOGGER.warning(
+                    "Entry %r found in multiple shards, keeping the first one",
+                    key,
+                )
+            else:
+                last_value = combine(last_value, value)
+            continue
+
+        if last_key is not None:
+            if key < last_key:
+                raise ValueError(
+                    f"Records in shards are not sorted, found {key!r} after {last_key!r}",
+                )
+
+            yield last_key, last_value
+
+        last_key, last_value = key, value
+
+    if last_key is not None:
+        yield last_key, last_value
+
+
+def _write_merged(
+    shard_files: List[str],
+    kind: str,
+    output: TextIO,
+    *,
+    name: Optional[str] = None,
+    combine: Optional[Callable[[Any, Any], Any]] = None,
+) -> None:
+    """Merge records of the given kind from all the shards and write them as members of a JSON object.
+
+    Values of records with the same key are combined using the given function, if not given, the first one
+    is kept and a warning is issued.
+    """
+    output.write("{")
+    for index, (key, value) in enumerate(
+        _iter_merged(shard_files, kind, name, combine),
+    ):
+        output.write(", " if index else "")
+        output.write(f"{json.dumps(key)}: {json.dumps(value, sort_keys=True)}")
+
+    output.write("}")
+
+
+def merge_shards(shard_files: List[str], output: TextIO) -> None:
+    """Merge shard results stored as newline delimited JSON into a single JSON result.
+
+    Shards are stream-merged, only one record per shard is kept in memory. Each part of the result is merged
+    in a separate pass so that keys of the resulting document are sorted. All the shards have to be produced
+    with the same options (usage aggregated, counts or locations reported, plugins run, distributions annotated).
+    If usage was aggregated, usage and counts of a directory or a package found in multiple shards are merged.
+    """
+    headers = [_read_header(file_path) for file_path in shard_files]
+    header = headers[0] if headers else {}
+    if any(shard_header != header for shard_header in headers):
+        raise ValueError(
+            "Shards were produced with different options and cannot be merged",
+        )
+
+    aggregate = header.get("aggregate")
+    output.write("{")
+    if aggregate is not None:
+        output.write(f'"aggregate": {json.dumps(aggregate)}, ')
+
+    if header.get("counts"):
+        output.write('"counts": ')
+        _write_merged(
+            shard_files,
+            "counts",
+            output,
+            combine=merge_counts if aggregate is not None else None,
+        )
+        output.write(", ")
+
+    if header.get("distributions"):
+        output.write('"distributions": ')
+        _write_merged(shard_files, "distributions", output, combine=_keep_first)
+        output.write(", ")
+
+    output.write('"errors": ')
+    _write_merged(shard_files, "error", output)
+
+    if header.get("locations"):
+        output.write(', "locations": ')
+        _write_merged(shard_files, "locations", output)
+
+    if "plugins" in header:
+        output.write(', "plugins": {')
+        for index, plugin_name in enumerate(header["plugins"]):
+            output.write(f"{', ' if index else ''}{json.dumps(plugin_name)}: ")
+            _write_merged(shard_files, "plugins", output, name=plugin_name)
+        output.write("}")
+
+    output.write(', "report": ')
+    _write_merged(
+        shard_files,
+        "report",
+        output,
+        combine=merge_usage if aggregate is not None else None,
+    )
+    output.write(f', "version": {json.dumps(invectio_version)}}}\n')
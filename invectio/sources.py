@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Find, read and parse Python sources stored on the filesystem or in memory."""
+
+import ast
+import glob
+import importlib
+import logging
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Container
+from typing import Dict
+from typing import Generator
+from typing import IO
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+from .metrics import ScanMetrics
+from .notebook import read_notebook
+from .shard import in_shard
+
+_LOGGER = logging.getLogger(__name__)
+
+# Files larger than this size in bytes are memory mapped when read.
+_MMAP_THRESHOLD = 1024 * 1024
+_NOTEBOOK_SUFFIX = ".ipynb"
+
+SourceContent = Union[bytes, str]
+Source = Union[Tuple[str, Union[SourceContent, Path, IO[Any]]], IO[Any]]
+
+
+def _get_python_files(path: str, *, notebooks: bool = False) -> List[str]:
+    """Get Python files for the given path, include Jupyter notebooks if requested."""
+    if os.path.isfile(path):
+        files = [path]
+    else:
+        files = glob.glob(f"{path}/**/*.py", recursive=True)
+        if notebooks:
+            files.extend(glob.glob(f"{path}/**/*{_NOTEBOOK_SUFFIX}", recursive=True))
+
+    if not files:
+        raise FileNotFoundError(f"No files to process for {str(path)!r}")
+
+    return files
+
+
+def _get_feature_version(target_python: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Get feature version for the AST parser based on the target Python version given as a string (e.g. 3.8)."""
+    if target_python is None:
+        return None
+
+    try:
+        major, minor = (int(i) for i in target_python.split(".", maxsplit=1))
+    except ValueError as exc:
+        raise ValueError(
+            f"Invalid target Python version {target_python!r}, expected <major>.<minor>",
+        ) from exc
+
+    if major != 3:
+        _LOGGER.warning(
+            "Grammar of Python %s is not supported by the AST parser, the default grammar is used; "
+            "use a fallback parser to parse sources that are not compatible",
+            target_python,
+        )
+        return None
+
+    return major, minor
+
+
+def _load_parser(parser: str) -> Callable[[SourceContent, str], ast.Module]:
+    """Load a parser given as an import string (e.g. `package.module:parse`)."""
+    module_name, _, callable_name = parser.partition(":")
+    if not module_name or not callable_name:
+        raise ValueError(
+            f"Invalid parser {parser!r}, expected an import string in form of <module>:<callable>",
+        )
+
+    return getattr(importlib.import_module(module_name), callable_name)  # type: ignore
+
+
+def _parse_source_fallback(
+    source: SourceContent,
+    file_name: str,
+    parser: str,
+) -> ast.Module:
+    """Parse a source with the given fallback parser, meant to be run in a worker process."""
+    return _load_parser(parser)(source, file_name)
+
+
+def _format_error(exc: Exception) -> str:
+    """Format an error raised during parsing so that it can be reported."""
+    return f"{exc.__class__.__name__}: {exc}"
+
+
+def _read_source(
+    content: Union[SourceContent, Path, IO[Any]],
+) -> Union[SourceContent, mmap.mmap]:
+    """Read source code from a file on the filesystem or from a file-like object.
+
+    Files are read as raw bytes so that the parser respects encoding declarations (PEP 263), large files
+    are memory mapped. The caller is responsible for closing the memory map.
+    """
+    if isinstance(content, (bytes, str)):
+        return content
+
+    if isinstance(content, Path):
+        with open(content, "rb") as source_file:
+            size = os.fstat(source_file.fileno()).st_size
+            if size == 0 or size < _MMAP_THRESHOLD:
+                return source_file.read()
+
+            return mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    return content.read()  # type: ignore
+
+
+def _get_source_size(
+    content: Union[SourceContent, Path, IO[Any]],
+    source: Optional[Union[SourceContent, mmap.mmap]],
+) -> int:
+    """Get size of a source read, files are stat-ed so that the whole notebook is accounted for."""
+    if isinstance(content, Path):
+        return content.stat().st_size
+
+    if isinstance(content, (bytes, str)):
+        return len(content)
+
+    return len(source) if source is not None else 0
+
+
+def _iter_sources(sources: Iterable[Source]) -> Generator[Tuple[str, Any], None, None]:
+    """Iterate over sources given as (name, content) pairs or as named file-like objects."""
+    for source in sources:
+        if isinstance(source, tuple):
+            file_name, content = source
+        else:
+            file_name, content = source.name, source
+
+        yield str(file_name), content
+
+
+def _iter_source_ast(
+    sources: Iterable[Source],
+    *,
+    ignore_errors: bool,
+    target_python: Optional[str] = None,
+    fallback_parser: Optional[str] = None,
+    errors: Optional[Dict[str, str]] = None,
+    notebook_cells: Optional[Dict[str, List[Tuple[int, int]]]] = None,
+    metrics: Optional[ScanMetrics] = None,
+) -> Generator[Tuple[str, ast.Module], None, None]:
+    """Get AST for all the given sources.
+
+    Sources that cannot be parsed are retried with the fallback parser (if any) in parallel worker processes.
+    If errors are ignored, errors are stored in the errors dictionary keyed by file. Code cells of Jupyter
+    notebooks are parsed as a single module, (first line, cell index) pairs of cells are stored in the notebook
+    cells dictionary keyed by file, if given. Metrics, if given, are updated once the consumer is done with
+    each file so that the latency observed covers reading, parsing and analyzing the file (parsing in worker
+    processes is not included).
+    """
+    feature_version = _get_feature_version(target_python)
+    if fallback_parser is not None:
+        # Fail early if the parser cannot be imported.
+        _load_parser(fallback_parser)
+
+    failed = []
+    for file_name, content in _iter_sources(sources):
+        _LOGGER.debug("Parsing file %r", file_name)
+        started = time.monotonic()
+        source: Optional[Union[SourceContent, mmap.mmap]] = None
+        try:
+            if file_name.endswith(_NOTEBOOK_SUFFIX):
+                source, cells = read_notebook(content)
+                if notebook_cells is not None:
+                    notebook_cells[file_name] = cells
+            else:
+                source = _read_source(content)
+
+            file_ast = ast.parse(
+                source,
+                filename=file_name,
+                feature_version=feature_version,
+            )
+        except Exception as exc:
+            if fallback_parser is not None and source is not None:
+                _LOGGER.debug(
+                    "Failed to parse Python file %r, scheduling fallback parser: %s",
+                    file_name,
+                    str(exc),
+                )
+                failed.append(
+                    (source[:] if isinstance(source, mmap.mmap) else source, file_name),
+                )
+                continue
+
+            if ignore_errors:
+                _LOGGER.exception("Failed to parse Python file %r", file_name)
+                if errors is not None:
+                    errors[file_name] = _format_error(exc)
+                if metrics is not None:
+                    metrics.observe_file(
+                        _get_source_size(content, source),
+                        time.monotonic() - started,
+                        error=True,
+                    )
+                continue
+
+            raise
+        finally:
+            # The parser copies the source, do not keep the file mapped while the consumer analyzes it.
+            if isinstance(source, mmap.mmap):
+                source.close()
+
+        yield file_name, file_ast
+
+        if metrics is not None:
+            metrics.observe_file(
+                _get_source_size(content, source),
+                time.monotonic() - started,
+            )
+
+    if not failed:
+        return
+
+    with ProcessPoolExecutor() as executor:
+        futures = {
+            executor.submit(_parse_source_fallback, source, file_name, fallback_parser): (  # type: ignore
+                file_name,
+                len(source),
+            )
+            for source, file_name in failed
+        }
+        del failed
+
+        for future in as_completed(futures):
+            file_name, size = futures[future]
+            started = time.monotonic()
+            try:
+                file_ast = future.result()
+            except Exception as exc:
+                if ignore_errors:
+                    _LOGGER.error(
+                        "Failed to parse Python file %r using fallback parser %r: %s",
+                        file_name,
+                        fallback_parser,
+                        str(exc),
+                    )
+                    if errors is not None:
+                        errors[file_name] = _format_error(exc)
+                    if metrics is not None:
+                        metrics.observe_file(
+                            size,
+                            time.monotonic() - started,
+                            error=True,
+                        )
+                    continue
+
+                raise
+
+            yield file_name, file_ast
+
+            if metrics is not None:
+                metrics.observe_file(size, time.monotonic() - started)
+
+
+def _iter_path_sources(
+    path: str,
+    *,
+    notebooks: bool = False,
+    shard: Optional[Tuple[int, int]] = None,
+    exclude: Optional[Container[str]] = None,
+    metrics: Optional[ScanMetrics] = None,
+) -> Generator[Tuple[str, Path], None, None]:
+    """Iterate over sources found in the given path as (name, path) pairs, include Jupyter notebooks if requested.
+
+    Only files belonging to the given shard and not excluded are listed. The number of files listed is stored in
+    metrics, if given.
+    """
+    python_files = _get_python_files(path, notebooks=notebooks)
+    if shard is not None:
+        # Paths relative to the path scanned are hashed so that shards do not depend on where sources are stored.
+        root = path if os.path.isdir(path) else os.path.dirname(path)
+        python_files = [
+            python_file
+            for python_file in python_files
+            if in_shard(os.path.relpath(python_file, root), shard)
+        ]
+
+    if exclude is not None:
+        python_files = [
+            python_file for python_file in python_files if python_file not in exclude
+        ]
+
+    if metrics is not None:
+        metrics.files_total = len(python_files)
+
+    for python_file in python_files:
+        yield python_file, Path(python_file)
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Watch a source tree and keep a library usage index up to date."""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import time
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Generator
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+from typing import Union
+
+import attr
+
+from invectio import __version__ as invectio_version
+from .gather import iter_library_usage_from_sources
+
+_LOGGER = logging.getLogger(__name__)
+
+# See inotify(7).
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_WATCH_MASK = (
+    _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+)
+_INOTIFY_EVENT = struct.Struct("iIII")
+_INOTIFY_READ_SIZE = 64 * 1024
+
+
+def _is_hidden(name: str) -> bool:
+    """Check if the given file or directory is hidden, hidden entries are not matched by glob used to find sources."""
+    return name.startswith(".")
+
+
+def _iter_directories(path: str) -> Generator[str, None, None]:
+    """Iterate over directories to be watched for the given path."""
+    if os.path.isfile(path):
+        yield os.path.dirname(path) or "."
+        return
+
+    for dir_path, dir_names, _ in os.walk(path):
+        dir_names[:] = [dir_name for dir_name in dir_names if not _is_hidden(dir_name)]
+        yield os.path.normpath(dir_path)
+
+
+def _iter_python_files(path: str) -> Generator[str, None, None]:
+    """Iterate over Python files found in the given path, paths are normalized."""
+    if os.path.isfile(path):
+        yield os.path.normpath(path)
+        return
+
+    for dir_path, dir_names, file_names in os.walk(path):
+        dir_names[:] = [dir_name for dir_name in dir_names if not _is_hidden(dir_name)]
+        for file_name in file_names:
+            if file_name.endswith(".py") and not _is_hidden(file_name):
+                yield os.path.normpath(os.path.join(dir_path, file_name))
+
+
+class _InotifyWatcher:
+    """Watch directories using inotify, available on Linux only."""
+
+    def __init__(self, path: str) -> None:
+        """Start watching all the directories in the given path."""
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        # Raises AttributeError if inotify is not available.
+        self._inotify_add_watch = libc.inotify_add_watch
+        self._inotify_add_watch.argtypes = (
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint32,
+        )
+
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"Failed to initialize inotify: {os.strerror(errno)}")
+
+        self._directories: Dict[int, str] = {}
+        for directory in _iter_directories(path):
+            self._add_watch(directory)
+
+    def _add_watch(self, directory: str) -> None:
+        """Add a watch for the given directory."""
+        watch_descriptor = self._inotify_add_watch(
+            self._fd,
+            os.fsencode(directory),
+            _IN_WATCH_MASK,
+        )
+        if watch_descriptor < 0:
+            errno = ctypes.get_errno()
+            _LOGGER.warning(
+                "Failed to watch directory %r: %s",
+                directory,
+                os.strerror(errno),
+            )
+            return
+
+        self._directories[watch_descriptor] = directory
+
+    def wait(self, timeout: float) -> Optional[Set[str]]:
+        """Wait for changes, return changed files and directories or None if events were lost."""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        try:
+            data = os.read(self._fd, _INOTIFY_READ_SIZE)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            watch_descriptor, mask, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+            offset += _INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & _IN_Q_OVERFLOW:
+                _LOGGER.warning(
+                    "Inotify event queue overflowed, changes have to be rescanned",
+                )
+                return None
+
+            if mask & _IN_IGNORED:
+                self._directories.pop(watch_descriptor, None)
+                continue
+
+            directory = self._directories.get(watch_descriptor)
+            if directory is None or not name or _is_hidden(name):
+                continue
+
+            path = os.path.join(directory, name)
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    for new_directory in _iter_directories(path):
+                        self._add_watch(new_directory)
+
+                changed.add(path)
+            elif name.endswith(".py"):
+                changed.add(path)
+
+        return changed
+
+    def close(self) -> None:
+        """Stop watching."""
+        os.close(self._fd)
+
+
+class _PollingWatcher:
+    """Watch Python files by periodically checking their modification time and size."""
+
+    def __init__(self, path: str) -> None:
+        """Take the initial snapshot of files in the given path."""
+        self._path = path
+        self._snapshot = self._take_snapshot()
+
+    def _take_snapshot(self) -> Dict[str, Tuple[int, int]]:
+        """Get modification time and size of Python files found."""
+        snapshot = {}
+        for python_file in _iter_python_files(self._path):
+            try:
+                stat = os.stat(python_file)
+            except FileNotFoundError:
+                continue
+
+            snapshot[python_file] = (stat.st_mtime_ns, stat.st_size)
+
+        return snapshot
+
+    def wait(self, timeout: float) -> Optional[Set[str]]:
+        """Wait for the given time, return files changed in the meantime."""
+        time.sleep(timeout)
+        snapshot = self._take_snapshot()
+        changed = {
+            python_file
+            for python_file in self._snapshot.keys() | snapshot.keys()
+            if self._snapshot.get(python_file) != snapshot.get(python_file)
+        }
+        self._snapshot = snapshot
+        return changed
+
+    def close(self) -> None:
+        """Stop watching."""
+
+
+@attr.s(slots=True)
+class UsageIndex:
+    """Library usage reports per file together with an aggregate index of symbols used per module."""
+
+    report = attr.ib(type=Dict[str, Dict[str, List[str]]], factory=dict)
+    errors = attr.ib(type=Dict[str, str], factory=dict)
+    # Number of files using a symbol, kept so that files can be removed without recomputing the index.
+    _symbols = attr.ib(type=Dict[str, Dict[str, int]], factory=dict, init=False)
+
+    def _unindex(self, file_name: str) -> None:
+        """Remove symbols used by the given file from the aggregate index."""
+        for module, symbols in self.report.pop(file_name, {}).items():
+            module_symbols = self._symbols[module]
+            for symbol in symbols:
+                module_symbols[symbol] -= 1
+                if not module_symbols[symbol]:
+                    del module_symbols[symbol]
+
+            if not module_symbols:
+                del self._symbols[module]
+
+    def update(self, file_name: str, file_report: Dict[str, List[str]]) -> None:
+        """Store a new report for the given file."""
+        self._unindex(file_name)
+        self.errors.pop(file_name, None)
+
+        self.report[file_name] = file_report
+        for module, symbols in file_report.items():
+            module_symbols = self._symbols.setdefault(module, {})
+            for symbol in symbols:
+                module_symbols[symbol] = module_symbols.get(symbol, 0) + 1
+
+    def set_error(self, file_name: str, error: str) -> None:
+        """Mark the given file as failed to be analyzed."""
+        self._unindex(file_name)
+        self.errors[file_name] = error
+
+    def remove(self, file_name: str) -> None:
+        """Remove the given file from the index."""
+        self._unindex(file_name)
+        self.errors.pop(file_name, None)
+
+    def query(self, module: str) -> List[str]:
+        """Get symbols used from the given module in any of the files."""
+        return sorted(self._symbols.get(module, {}))
+
+    def query_files(self, symbol: str) -> List[str]:
+        """Get files using the given symbol, a module name can be given to obtain files importing the module."""
+        return sorted(
+            file_name
+            for file_name, file_report in self.report.items()
+            if symbol in file_report
+            or symbol in file_report.get(symbol.rsplit(".", maxsplit=1)[0], ())
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the index, the aggregate index is stored under the "index" key."""
+        return {
+            "errors": self.errors,
+            "index": {
+                module: sorted(symbols) for module, symbols in self._symbols.items()
+            },
+            "report": self.report,
+            "version": invectio_version,
+        }
+
+
+@attr.s(slots=True)
+class LibraryUsageWatch:
+    """Keep a library usage index for the given path up to date, only changed files are re-analyzed.
+
+    Changes are detected using inotify if available, polling is used otherwise. Files that fail to parse
+    (e.g. while being edited) are reported in errors of the index instead of failing the watch.
+    """
+
+    path = attr.ib(type=str)
+    without_standard_imports = attr.ib(type=bool, default=False)
+    without_builtin_imports = attr.ib(type=bool, default=False)
+    without_builtins = attr.ib(type=bool, default=False)
+    scope_aware = attr.ib(type=bool, default=False)
+    target_python = attr.ib(type=Optional[str], default=None)
+    debounce = attr.ib(type=float, default=0.2)
+    polling = attr.ib(type=bool, default=False)
+    index = attr.ib(type=UsageIndex, factory=UsageIndex)
+    _watcher = attr.ib(
+        type=Optional[Union[_InotifyWatcher, _PollingWatcher]],
+        default=None,
+        init=False,
+    )
+
+    def start(self) -> None:
+        """Start watching and compute the initial index."""
+        if not self.polling:
+            try:
+                self._watcher = _InotifyWatcher(self.path)
+            except (AttributeError, OSError) as exc:
+                _LOGGER.warning(
+                    "Inotify cannot be used, falling back to polling: %s",
+                    str(exc),
+                )
+
+        if self._watcher is None:
+            self._watcher = _PollingWatcher(self.path)
+
+        # Watches are set up first so that no change done during the initial analysis is missed.
+        self.refresh(_iter_python_files(self.path))
+
+    def stop(self) -> None:
+        """Stop watching."""
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+
+    def __enter__(self) -> "LibraryUsageWatch":
+        """Start watching."""
+        self.start()
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        """Stop watching."""
+        self.stop()
+
+    def _expand(self, paths: Optional[Set[str]]) -> Set[str]:
+        """Turn changed files and directories into files to be refreshed, None stands for a full rescan."""
+        known = self.index.report.keys() | self.index.errors.keys()
+        if paths is None:
+            return known | set(_iter_python_files(self.path))
+
+        path = os.path.normpath(self.path)
+        result = set()
+        for changed in paths:
+            changed = os.path.normpath(changed)
+            if changed.endswith(".py"):
+                if os.path.isdir(path) or changed == path:
+                    result.add(changed)
+                continue
+
+            # A directory was created, moved or removed.
+            prefix = changed + os.sep
+            result.update(
+                file_name for file_name in known if file_name.startswith(prefix)
+            )
+            if os.path.isdir(changed):
+                result.update(_iter_python_files(changed))
+
+        return result
+
+    def refresh(self, files: Iterable[str]) -> Set[str]:
+        """Re-analyze the given files, files that do not exist anymore are removed from the index."""
+        refreshed = set()
+        existing = []
+        for file_name in files:
+            refreshed.add(file_name)
+            if os.path.isfile(file_name):
+                existing.append(file_name)
+            else:
+                _LOGGER.debug("Removing file %r from index", file_name)
+                self.index.remove(file_name)
+
+        errors: Dict[str, str] = {}
+        for file_name, file_report in iter_library_usage_from_sources(
+            ((file_name, Path(file_name)) for file_name in existing),
+            ignore_errors=True,
+            without_standard_imports=self.without_standard_imports,
+            without_builtin_imports=self.without_builtin_imports,
+            without_builtins=self.without_builtins,
+            scope_aware=self.scope_aware,
+            target_python=self.target_python,
+            errors=errors,
+        ):
+            self.index.update(file_name, file_report)
+
+        for file_name, error in errors.items():
+            self.index.set_error(file_name, error)
+
+        return refreshed
+
+    def step(self, timeout: float) -> Set[str]:
+        """Wait for changes up to the given timeout and refresh changed files, return files refreshed.
+
+        Once a change is seen, changes are collected until there is no change for the debounce period so that
+        a burst of writes (e.g. a branch checkout) is processed at once.
+        """
+        if self._watcher is None:
+            raise ValueError("Watch has not been started")
+
+        changed = self._watcher.wait(timeout)
+        if not changed and changed is not None:
+            return set()
+
+        while changed is not None:
+            more = self._watcher.wait(self.debounce)
+            if more is None:
+                changed = None
+            elif not more:
+                break
+            else:
+                changed |= more
+
+        return self.refresh(self._expand(changed))
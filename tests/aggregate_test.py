@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+"""Test aggregating library usage per directory or package."""
+
+import pytest
+
+from invectio import InvectioPlugin
+from invectio import gather_library_usage
+from invectio import gather_library_usage_from_sources
+from invectio.aggregate import get_aggregate_key
+
+
+class _NoopPlugin(InvectioPlugin):
+    """A plugin reporting nothing."""
+
+    name = "noop"
+
+    def get_report(self) -> None:
+        return None
+
+
+@pytest.fixture
+def project(tmp_path):
+    """Create a project with a package containing a subpackage."""
+    (tmp_path / "pkg" / "sub").mkdir(parents=True)
+    (tmp_path / "setup.py").write_text("import setuptools\nsetuptools.setup()\n")
+    (tmp_path / "pkg" / "a.py").write_text("import os\nos.getcwd()\n")
+    (tmp_path / "pkg" / "sub" / "b.py").write_text(
+        "import os\nos.getcwd()\nos.path.join()\n",
+    )
+    (tmp_path / "pkg" / "sub" / "c.py").write_text("")
+    return tmp_path
+
+
+class TestAggregate:
+    """Test aggregating library usage per directory or package."""
+
+    @pytest.mark.parametrize(
+        "file_name,aggregate,root,expected",
+        [
+            ("proj/pkg/sub/a.py", "directory", "proj", "proj/pkg/sub"),
+            ("proj/pkg/sub/a.py", "package", "proj/", "proj/pkg"),
+            ("proj/setup.py", "package", "proj", "proj"),
+            ("pkg/a.py", "package", "", "pkg"),
+            ("setup.py", "directory", "", "."),
+        ],
+    )
+    def test_get_aggregate_key(self, file_name, aggregate, root, expected) -> None:
+        """Test computing keys usage of files is aggregated to."""
+        assert get_aggregate_key(file_name, aggregate, root) == expected
+
+    def test_package(self, project) -> None:
+        """Test usage and counts are merged per top-level package."""
+        result = gather_library_usage(
+            str(project),
+            without_builtins=True,
+            with_counts=True,
+            aggregate="package",
+        )
+        assert result["aggregate"] == "package"
+        assert result["report"] == {
+            str(project): {"setuptools": ["setuptools.setup"]},
+            str(project / "pkg"): {"os": ["os.getcwd", "os.path.join"]},
+        }
+        assert result["counts"][str(project / "pkg")] == {
+            "os.getcwd": 2,
+            "os.path.join": 1,
+        }
+
+    def test_directory(self, project) -> None:
+        """Test usage is merged per directory."""
+        result = gather_library_usage(
+            str(project),
+            without_builtins=True,
+            aggregate="directory",
+        )
+        assert result["report"] == {
+            str(project): {"setuptools": ["setuptools.setup"]},
+            str(project / "pkg"): {"os": ["os.getcwd"]},
+            str(project / "pkg" / "sub"): {"os": ["os.getcwd", "os.path.join"]},
+        }
+        assert "counts" not in result
+
+    def test_from_sources(self) -> None:
+        """Test names of in-memory sources are used as paths."""
+        result = gather_library_usage_from_sources(
+            [
+                ("pkg/a.py", b"import os\nos.getcwd()\n"),
+                ("pkg/b/c.py", b"import yaml\nyaml.load()\n"),
+            ],
+            aggregate="package",
+        )
+        assert result["report"] == {"pkg": {"os": ["os.getcwd"], "yaml": ["yaml.load"]}}
+
+    def test_invalid(self, project) -> None:
+        """Test invalid aggregation requests are refused before files are analyzed."""
+        with pytest.raises(ValueError):
+            gather_library_usage(str(project), aggregate="module")
+
+        with pytest.raises(ValueError, match="Locations"):
+            gather_library_usage(str(project), aggregate="package", with_locations=True)
+
+        with pytest.raises(ValueError, match="Plugins"):
+            gather_library_usage(
+                str(project),
+                aggregate="package",
+                plugins=[_NoopPlugin],
+            )
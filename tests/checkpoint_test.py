@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+"""Test checkpointed scans."""
+
+import json
+
+import pytest
+
+from invectio import gather_library_usage
+from invectio.checkpoint import gather_library_usage_checkpoint
+
+
+@pytest.fixture
+def project(tmp_path):
+    """Create a project with a few files, one of them fails to parse."""
+    project_path = tmp_path / "project"
+    project_path.mkdir()
+    (project_path / "a.py").write_text("import os\nos.getcwd()\nos.getcwd()\n")
+    (project_path / "b.py").write_text("import yaml\nyaml.safe_load()\n")
+    (project_path / "c.py").write_text("def broken(:\n")
+    (project_path / "d.py").write_text("import json\njson.dumps()\n")
+    return project_path
+
+
+class TestCheckpoint:
+    """Test checkpointed scans."""
+
+    OPTIONS = {"ignore_errors": True, "with_counts": True, "with_locations": True}
+
+    def test_uninterrupted(self, project, tmp_path) -> None:
+        """Test the result is the same as the result of a scan without checkpoints."""
+        checkpoint = tmp_path / "checkpoint.ndjson"
+        result = gather_library_usage_checkpoint(
+            str(project), str(checkpoint), **self.OPTIONS
+        )
+        assert result == gather_library_usage(str(project), **self.OPTIONS)
+
+        lines = checkpoint.read_text().splitlines()
+        # A header and a record per file.
+        assert len(lines) == 5
+        assert json.loads(lines[0])["options"]["path"] == str(project)
+
+    def test_resume(self, project, tmp_path) -> None:
+        """Test an interrupted scan is resumed, files journaled are not analyzed again."""
+        expected = gather_library_usage(str(project), **self.OPTIONS)
+        checkpoint = tmp_path / "checkpoint.ndjson"
+        gather_library_usage_checkpoint(str(project), str(checkpoint), **self.OPTIONS)
+
+        # Keep the header and two records, the third record was interrupted while being written.
+        lines = checkpoint.read_text().splitlines(keepends=True)
+        checkpoint.write_text("".join(lines[:3]) + lines[3][:10])
+        journaled = {json.loads(line)["key"] for line in lines[1:3]}
+        for file_name in journaled:
+            with open(file_name, "w") as source_file:
+                source_file.write("import sys\nsys.exit()\n")
+
+        result = gather_library_usage_checkpoint(
+            str(project), str(checkpoint), **self.OPTIONS
+        )
+        assert result == expected
+        assert len(checkpoint.read_text().splitlines()) == 5
+
+        # A completed checkpoint is reused as is.
+        assert (
+            gather_library_usage_checkpoint(
+                str(project), str(checkpoint), **self.OPTIONS
+            )
+            == expected
+        )
+
+    def test_different_options(self, project, tmp_path) -> None:
+        """Test a checkpoint cannot be resumed with different options."""
+        checkpoint = tmp_path / "checkpoint.ndjson"
+        gather_library_usage_checkpoint(
+            str(project),
+            str(checkpoint),
+            ignore_errors=True,
+        )
+        with pytest.raises(ValueError, match="different options"):
+            gather_library_usage_checkpoint(
+                str(project),
+                str(checkpoint),
+                ignore_errors=True,
+                without_builtins=True,
+            )
+
+    def test_corrupted(self, project, tmp_path) -> None:
+        """Test a corrupted checkpoint is reported."""
+        checkpoint = tmp_path / "checkpoint.ndjson"
+        gather_library_usage_checkpoint(
+            str(project),
+            str(checkpoint),
+            ignore_errors=True,
+        )
+        lines = checkpoint.read_text().splitlines(keepends=True)
+        checkpoint.write_text(lines[0] + "{\n" + "".join(lines[1:]))
+        with pytest.raises(ValueError, match="corrupted"):
+            gather_library_usage_checkpoint(
+                str(project),
+                str(checkpoint),
+                ignore_errors=True,
+            )
@@ -0,0 +1,36 @@
+import json
+import numpy as np
+from os import path
+
+
+def process(np, data):
+    return np.array(data)
+
+
+def load(json):
+    return json.loads("{}")
+
+
+def local_import():
+    import yaml
+
+    return yaml.safe_load("")
+
+
+def uses_module_level():
+    return np.zeros(1)
+
+
+def comprehension(items):
+    return [path for path in items if path.exists()]
+
+
+class Config:
+    json = None
+
+    def dump(self):
+        return json.dumps({})
+
+
+len = 3
+print(len)
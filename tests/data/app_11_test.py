@@ -0,0 +1,8 @@
+import json
+
+
+def handle(message):
+    if (payload := json.loads(message)) is not None:
+        return payload.get("action")
+
+    return None
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+import pytest
+
+from invectio import diff_paths
+from invectio import diff_reports
+from invectio import __version__ as invectio_version
+
+
+class TestDiff:
+    """Test comparing reports produced by Invectio."""
+
+    def test_diff_library_usage(self) -> None:
+        old = {
+            "report": {
+                "a.py": {"numpy": ["numpy.array", "numpy.zeros"]},
+                "b.py": {"flask": ["flask.Flask"]},
+            },
+        }
+        new = {
+            "report": {
+                "a.py": {"numpy": ["numpy.array"]},
+                "c.py": {"numpy": ["numpy.ones"], "yaml": ["yaml.safe_load"]},
+            },
+        }
+
+        result = diff_reports(old, new)
+        assert result == {
+            "added": {"numpy": ["numpy.ones"], "yaml": ["yaml.safe_load"]},
+            "removed": {"flask": ["flask.Flask"], "numpy": ["numpy.zeros"]},
+            "version": invectio_version,
+        }
+
+    def test_diff_symbols_provided(self) -> None:
+        old = {"report": {"lib/a.py": ["lib.a.X", "lib.a.Y"], "lib/b.py": ["lib.b.Z"]}}
+        new = {"report": {"lib/a.py": ["lib.a.W", "lib.a.X"], "lib/b.py": ["lib.b.Z"]}}
+
+        result = diff_reports(old, new)
+        assert result["added"] == {"lib.a": ["lib.a.W"]}
+        assert result["removed"] == {"lib.a": ["lib.a.Y"]}
+
+    def test_diff_environment(self) -> None:
+        old = {
+            "report": {
+                "foo": {"1.0": {"foo/__init__.py": ["foo.X", "foo.Y"]}},
+                "bar": {"0.1": {"bar.py": ["bar.Z"]}},
+            },
+        }
+        new = {
+            "report": {
+                "foo": {"2.0": {"foo/__init__.py": ["foo.W", "foo.X"]}},
+                "bar": {"0.1": {"bar.py": ["bar.Z"]}},
+                "baz": {"3.0": {"baz.py": []}},
+            },
+        }
+
+        result = diff_reports(old, new)
+        assert result["added"] == {"foo": ["foo.W"]}
+        assert result["removed"] == {"foo": ["foo.Y"]}
+        assert result["versions"] == {
+            "baz": {"new": ["3.0"], "old": []},
+            "foo": {"new": ["2.0"], "old": ["1.0"]},
+        }
+
+        with pytest.raises(ValueError):
+            diff_reports(old, {"report": {"a.py": {"numpy": ["numpy.array"]}}})
+
+    def test_diff_same(self) -> None:
+        report = {"report": {"a.py": {"numpy": ["numpy.array"]}}}
+        result = diff_reports(report, report)
+        assert result["added"] == {}
+        assert result["removed"] == {}
+
+    def test_diff_mismatch(self) -> None:
+        with pytest.raises(ValueError):
+            diff_reports(
+                {"report": {"a.py": {"numpy": ["numpy.array"]}}},
+                {"report": {"a.py": ["a.X"]}},
+            )
+
+    def test_diff_paths(self, tmp_path) -> None:
+        old = tmp_path / "old"
+        new = tmp_path / "new"
+        (old / "lib").mkdir(parents=True)
+        (new / "lib").mkdir(parents=True)
+        (old / "lib" / "api.py").write_text(
+            "import numpy\n\ndef get():\n    return numpy.array([])\n",
+        )
+        (new / "lib" / "api.py").write_text(
+            "import numpy\n\ndef fetch():\n    return numpy.zeros(1)\n",
+        )
+
+        result = diff_paths(str(old), str(new))
+        assert result["added"] == {"lib.api": ["lib.api.fetch"]}
+        assert result["removed"] == {"lib.api": ["lib.api.get"]}
+
+        result = diff_paths(str(old), str(new), library_usage=True)
+        assert result["added"] == {"numpy": ["numpy.zeros"]}
+        assert result["removed"] == {"numpy": ["numpy.array"]}
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+import ast
+import io
+
+import pytest
+
+from invectio import InvectioPlugin
+from invectio import gather_symbols_provided_env
+from invectio.environment import annotate_distributions
+from invectio.environment import get_import_index
+from invectio.environment import load_import_index
+
+
+def _install(site_packages, name: str, version: str, files: dict) -> None:
+    """Install a fake distribution into the given site-packages directory."""
+    dist_info = site_packages / f"{name}-{version}.dist-info"
+    dist_info.mkdir()
+    (dist_info / "METADATA").write_text(
+        f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n",
+    )
+
+    record = []
+    for file_name, content in files.items():
+        file_path = site_packages / file_name
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text(content)
+        record.append(f"{file_name},,")
+
+    record.append(f"{dist_info.name}/METADATA,,")
+    record.append(f"{dist_info.name}/RECORD,,")
+    record.append(f"../../bin/{name}-script.py,,")
+    (dist_info / "RECORD").write_text("\n".join(record) + "\n")
+
+
+class _AssignCounter(InvectioPlugin):
+    """Count assignments in a file."""
+
+    name = "assignments"
+
+    def __init__(self, file_name: str) -> None:
+        super().__init__(file_name)
+        self.assignments = 0
+
+    def visit_Assign(self, node: ast.Assign) -> None:  # noqa: N802
+        self.assignments += 1
+
+    def get_report(self) -> int:
+        return self.assignments
+
+
+@pytest.fixture
+def site_packages(tmp_path):
+    """Create a site-packages directory with a few distributions installed."""
+    _install(
+        tmp_path,
+        "fake-lib",
+        "1.0.0",
+        {
+            "fakelib/__init__.py": "from .api import get\n",
+            "fakelib/api.py": "def get():\n    pass\n\n\ndef _private():\n    pass\n",
+            "fakelib/data.txt": "Not a Python file",
+        },
+    )
+    _install(tmp_path, "other", "0.1", {"other.py": "VALUE = 42\n"})
+    # A file not recorded in any RECORD file is not reported.
+    (tmp_path / "stray.py").write_text("STRAY = 1\n")
+    return tmp_path
+
+
+class TestEnvironment:
+    """Test gathering symbols provided by installed distributions."""
+
+    def test_environment(self, site_packages) -> None:
+        result = gather_symbols_provided_env([str(site_packages)], jobs=2)
+        assert result["errors"] == {}
+        assert result["report"] == {
+            "fake-lib": {
+                "1.0.0": {
+                    "fakelib/__init__.py": [],
+                    "fakelib/api.py": ["fakelib.api.get"],
+                },
+            },
+            "other": {"0.1": {"other.py": ["other.VALUE"]}},
+        }
+
+    def test_environment_include_private(self, site_packages) -> None:
+        result = gather_symbols_provided_env([str(site_packages)], include_private=True)
+        assert result["report"]["fake-lib"]["1.0.0"]["fakelib/api.py"] == [
+            "fakelib.api._private",
+            "fakelib.api.get",
+        ]
+
+    def test_environment_errors(self, site_packages) -> None:
+        (site_packages / "other.py").write_text("def broken(:\n")
+        with pytest.raises(SyntaxError):
+            gather_symbols_provided_env([str(site_packages)])
+
+        result = gather_symbols_provided_env([str(site_packages)], ignore_errors=True)
+        assert result["report"]["other"] == {"0.1": {}}
+        assert list(result["errors"]["other"]["0.1"]) == ["other.py"]
+
+    def test_environment_broken_metadata(self, site_packages) -> None:
+        (site_packages / "broken-0.dist-info").mkdir()
+        result = gather_symbols_provided_env([str(site_packages)])
+        assert set(result["report"]) == {"fake-lib", "other"}
+        assert set(get_import_index([str(site_packages)])) == {"fakelib", "other"}
+
+    def test_environment_shadowed(self, site_packages, tmp_path_factory) -> None:
+        other_site_packages = tmp_path_factory.mktemp("site-packages")
+        _install(other_site_packages, "Fake_Lib", "2.0.0", {"fakelib/__init__.py": ""})
+        result = gather_symbols_provided_env(
+            [str(site_packages), str(other_site_packages)],
+        )
+        assert set(result["report"]) == {"fake-lib", "other"}
+        assert list(result["report"]["fake-lib"]) == ["1.0.0"]
+
+    def test_environment_fallback_parser(self, site_packages) -> None:
+        (site_packages / "other.py").write_text("VALUE = (value := 42)\n")
+        result = gather_symbols_provided_env(
+            [str(site_packages)],
+            target_python="3.7",
+            fallback_parser="ast:parse",
+        )
+        assert result["errors"] == {}
+        assert result["report"]["other"] == {"0.1": {"other.py": ["other.VALUE"]}}
+
+    def test_environment_plugins(self, site_packages) -> None:
+        result = gather_symbols_provided_env(
+            [str(site_packages)],
+            plugins=[_AssignCounter],
+        )
+        assert result["plugins"] == {
+            "assignments": {
+                "fake-lib": {"1.0.0": {"fakelib/__init__.py": 0, "fakelib/api.py": 0}},
+                "other": {"0.1": {"other.py": 1}},
+            },
+        }
+
+
+class TestImportIndex:
+    """Test mapping import names to distributions."""
+
+    def test_import_index(self, site_packages) -> None:
+        _install(
+            site_packages,
+            "PyYAML",
+            "6.0",
+            {"yaml/__init__.py": "", "_yaml/__init__.py": ""},
+        )
+        (site_packages / "PyYAML-6.0.dist-info" / "top_level.txt").write_text(
+            "_yaml\nyaml\n",
+        )
+        _install(site_packages, "fake-lib-extras", "1.0.0", {"fakelib/extras.py": ""})
+
+        index = get_import_index([str(site_packages)])
+        assert index == {
+            "_yaml": ("PyYAML",),
+            "fakelib": ("fake-lib", "fake-lib-extras"),
+            "other": ("other",),
+            "yaml": ("PyYAML",),
+        }
+        assert get_import_index([str(site_packages)]) is index
+
+    def test_load_import_index(self) -> None:
+        index = load_import_index(
+            io.StringIO('{"yaml": "PyYAML", "sklearn": ["scikit-learn"]}'),
+        )
+        assert index == {"yaml": ("PyYAML",), "sklearn": ("scikit-learn",)}
+
+    def test_annotate_distributions(self) -> None:
+        result = {
+            "report": {
+                "a.py": {"yaml": ["yaml.safe_load"], "json": ["json.dumps"]},
+                "b.py": {"sklearn": ["sklearn.svm.SVC"]},
+            },
+        }
+        annotate_distributions(
+            result,
+            {"yaml": ("PyYAML",), "sklearn": ("scikit-learn",)},
+        )
+        assert result["distributions"] == {
+            "json": [],
+            "sklearn": ["scikit-learn"],
+            "yaml": ["PyYAML"],
+        }
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+import subprocess
+
+import pytest
+
+from invectio.git import gather_library_usage_git
+
+
+def _git(repo, *args) -> str:
+    return subprocess.run(
+        [
+            "git",
+            "-c",
+            "user.name=Invectio",
+            "-c",
+            "user.email=invectio@example.com",
+            "-C",
+            str(repo),
+            *args,
+        ],
+        check=True,
+        stdout=subprocess.PIPE,
+    ).stdout.decode()
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """Create a git repository with two commits."""
+    _git(tmp_path, "init", "-q")
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "app.py").write_text("import numpy\n\nnumpy.array\n")
+    (tmp_path / "pkg" / "old.py").write_text("import flask\n\nflask.Flask\n")
+    (tmp_path / "unchanged.py").write_text("import yaml\n\nyaml.safe_load\n")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-q", "-m", "Initial commit")
+
+    (tmp_path / "pkg" / "app.py").write_text("import numpy\n\nnumpy.zeros\n")
+    (tmp_path / "pkg" / "old.py").unlink()
+    (tmp_path / "pkg" / "new.py").write_bytes(
+        b"# -*- coding: latin-1 -*-\nimport requests\n\nrequests.get('\xe9')\n",
+    )
+    (tmp_path / "README").write_text("Not a Python file.\n")
+    _git(tmp_path, "add", "-A")
+    _git(tmp_path, "commit", "-q", "-m", "Second commit")
+
+    # Changes in the working tree are not taken into account.
+    (tmp_path / "pkg" / "app.py").write_text("import numpy\n\nnumpy.ones\n")
+    return tmp_path
+
+
+class TestGit:
+    """Test gathering library usage for files changed in a revision range."""
+
+    def test_git_diff(self, repo) -> None:
+        result = gather_library_usage_git(
+            "HEAD~1..HEAD",
+            repo=str(repo),
+            without_builtins=True,
+        )
+        assert result["errors"] == {}
+        assert result["report"] == {
+            "pkg/app.py": {"numpy": ["numpy.zeros"]},
+            "pkg/new.py": {"requests": ["requests.get"]},
+        }
+
+    def test_git_diff_single_revision(self, repo) -> None:
+        result = gather_library_usage_git(
+            "HEAD~1",
+            repo=str(repo),
+            without_builtins=True,
+        )
+        assert set(result["report"]) == {"pkg/app.py", "pkg/new.py"}
+
+    @pytest.mark.parametrize("prefix", [".", "{repo_name}", "{repo}"])
+    def test_git_diff_base_report(self, repo, monkeypatch, prefix) -> None:
+        # Base reports created by scanning the repository store paths prefixed with the path scanned.
+        monkeypatch.chdir(repo.parent)
+        prefix = prefix.format(repo=repo, repo_name=repo.name)
+        base_report = {
+            "report": {
+                f"{prefix}/pkg/app.py": {"numpy": ["numpy.array"]},
+                f"{prefix}/pkg/old.py": {"flask": ["flask.Flask"]},
+                f"{prefix}/unchanged.py": {"yaml": ["yaml.safe_load"]},
+            },
+        }
+        result = gather_library_usage_git(
+            "HEAD~1..",
+            repo=repo.name if prefix == repo.name else str(repo),
+            base_report=base_report,
+            without_builtins=True,
+        )
+        assert result["report"] == {
+            "pkg/app.py": {"numpy": ["numpy.zeros"]},
+            "pkg/new.py": {"requests": ["requests.get"]},
+            "unchanged.py": {"yaml": ["yaml.safe_load"]},
+        }
+
+    def test_git_diff_base_report_outside(self, repo) -> None:
+        with pytest.raises(ValueError):
+            gather_library_usage_git(
+                "HEAD~1..",
+                repo=str(repo),
+                base_report={"report": {str(repo.parent / "other.py"): {}}},
+            )
+
+    def test_git_diff_invalid_revision(self, repo) -> None:
+        with pytest.raises(ValueError):
+            gather_library_usage_git("nonexisting..HEAD", repo=str(repo))
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+import csv
+import io
+import os
+from xml.etree import ElementTree
+
+from invectio import iter_library_usage
+from invectio.graph import iter_usage_edges
+from invectio.graph import write_edge_list
+from invectio.graph import write_graphml
+
+_GRAPHML_NS = "{http://graphml.graphdrawing.org/xmlns}"
+
+
+class TestGraph:
+    """Test exporting library usage as a graph."""
+
+    _PROJECT_DIR = str(os.path.join("tests", "data", "project_dir"))
+    _UTILS_FILE = str(
+        os.path.join("tests", "data", "project_dir", "proj", "utils_test.py"),
+    )
+
+    def test_iter_usage_edges(self) -> None:
+        edges = set(iter_usage_edges(iter_library_usage(self._PROJECT_DIR)))
+        assert (self._UTILS_FILE, "datetime", "datetime.datetime.utcnow") in edges
+        assert len(edges) == 7
+
+    def test_edge_list(self) -> None:
+        output = io.StringIO()
+        count = write_edge_list(
+            iter_usage_edges(iter_library_usage(self._PROJECT_DIR)),
+            output,
+        )
+        assert count == 7
+
+        rows = list(csv.reader(io.StringIO(output.getvalue())))
+        assert rows[0] == ["file", "module", "symbol"]
+        assert len(rows) == 8
+        assert [self._UTILS_FILE, "datetime", "datetime.datetime.utcnow"] in rows
+
+    def test_graphml(self) -> None:
+        output = io.StringIO()
+        write_graphml(
+            [
+                ("a.py", "numpy", "numpy.array"),
+                ("a.py", "numpy", "numpy.zeros"),
+                ("b.py", "numpy", "numpy.array"),
+                ("b.py", "flask", "flask.<Flask>"),
+            ],
+            output,
+        )
+
+        graph = ElementTree.fromstring(output.getvalue()).find(f"{_GRAPHML_NS}graph")
+        nodes = [node.get("id") for node in graph.iter(f"{_GRAPHML_NS}node")]
+        edges = [
+            (
+                edge.get("source"),
+                edge.get("target"),
+                edge.find(f"{_GRAPHML_NS}data").text,
+            )
+            for edge in graph.iter(f"{_GRAPHML_NS}edge")
+        ]
+
+        assert len(nodes) == len(set(nodes))
+        assert set(nodes) == {
+            "file:a.py",
+            "file:b.py",
+            "module:numpy",
+            "module:flask",
+            "symbol:numpy.array",
+            "symbol:numpy.zeros",
+            "symbol:flask.<Flask>",
+        }
+        assert len(edges) == len(set(edges))
+        assert set(edges) == {
+            ("file:a.py", "module:numpy", "imports"),
+            ("file:b.py", "module:numpy", "imports"),
+            ("file:b.py", "module:flask", "imports"),
+            ("module:numpy", "symbol:numpy.array", "provides"),
+            ("module:numpy", "symbol:numpy.zeros", "provides"),
+            ("module:flask", "symbol:flask.<Flask>", "provides"),
+            ("file:a.py", "symbol:numpy.array", "uses"),
+            ("file:a.py", "symbol:numpy.zeros", "uses"),
+            ("file:b.py", "symbol:numpy.array", "uses"),
+            ("file:b.py", "symbol:flask.<Flask>", "uses"),
+        }
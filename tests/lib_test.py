@@ -16,13 +16,19 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 # type: ignore
 
+import io
+import mmap
 import os
 import pytest
 
 from invectio import gather_symbols_provided
+from invectio import gather_symbols_provided_from_sources
 from invectio import gather_library_usage
+from invectio import gather_library_usage_from_sources
 from invectio import get_standard_imports
 from invectio import __version__ as invectio_version
+from invectio import lib as invectio_lib
+from invectio import sources as invectio_sources
 
 
 class InvectioTestBase:
@@ -157,6 +163,73 @@ class TestLibraryUsage(InvectioTestBase):
             ],
         }
 
+    def test_app_10(self) -> None:
+        file_path = self._get_test_path("app_10_test.py")
+        result = gather_library_usage(file_path)
+        assert "report" in result
+        assert result["report"] == {
+            file_path: {
+                "__builtins__": ["__builtins__.len", "__builtins__.print"],
+                "json": ["json.", "json.dumps", "json.loads"],
+                "numpy": ["numpy.array", "numpy.zeros"],
+                "os": ["os.path", "os.path.exists"],
+                "yaml": ["yaml.safe_load"],
+            },
+        }
+
+    def test_app_10_scope_aware(self) -> None:
+        file_path = self._get_test_path("app_10_test.py")
+        result = gather_library_usage(file_path, scope_aware=True)
+        assert "report" in result
+        assert result["report"] == {
+            file_path: {
+                "__builtins__": ["__builtins__.print"],
+                "json": ["json.dumps"],
+                "numpy": ["numpy.zeros"],
+                "yaml": ["yaml.safe_load"],
+            },
+        }
+
+    def test_scope_aware_same_results(self) -> None:
+        file_path = self._get_test_path("lstm_test.py")
+        assert gather_library_usage(file_path) == gather_library_usage(
+            file_path,
+            scope_aware=True,
+        )
+
+    def test_target_python(self) -> None:
+        file_path = self._get_test_path("app_11_test.py")
+        with pytest.raises(SyntaxError):
+            gather_library_usage(file_path, target_python="3.7")
+
+        result = gather_library_usage(
+            file_path,
+            target_python="3.7",
+            ignore_errors=True,
+        )
+        assert result["report"] == {}
+        assert set(result["errors"]) == {file_path}
+        assert result["errors"][file_path].startswith("SyntaxError: ")
+
+        result = gather_library_usage(file_path, target_python="3.8")
+        assert result["errors"] == {}
+        assert result["report"] == {file_path: {"json": ["json.loads"]}}
+
+    def test_fallback_parser(self) -> None:
+        file_path = self._get_test_path("app_11_test.py")
+        result = gather_library_usage(
+            file_path,
+            target_python="3.7",
+            fallback_parser="ast:parse",
+        )
+        assert result["errors"] == {}
+        assert result["report"] == {file_path: {"json": ["json.loads"]}}
+
+    def test_invalid_target_python(self) -> None:
+        file_path = self._get_test_path("empty_test.py")
+        with pytest.raises(ValueError):
+            gather_library_usage(file_path, target_python="three")
+
     def test_project_dir(self) -> None:
         project_path = self._get_test_path("project_dir")
         result = gather_library_usage(project_path)
@@ -286,6 +359,20 @@ class TestSymbolsProvided(InvectioTestBase):
         with pytest.raises(FileNotFoundError):
             gather_symbols_provided(file_path)
 
+    def test_errors(self, tmp_path) -> None:
+        (tmp_path / "valid.py").write_text("X = 1\n")
+        (tmp_path / "invalid.py").write_text("def X(:\n")
+
+        with pytest.raises(SyntaxError):
+            gather_symbols_provided(str(tmp_path))
+
+        result = gather_symbols_provided(str(tmp_path), ignore_errors=True)
+        assert list(result["report"]) == [str(tmp_path / "valid.py")]
+        assert list(result["errors"]) == [str(tmp_path / "invalid.py")]
+        assert result["errors"][str(tmp_path / "invalid.py")].startswith(
+            "SyntaxError: ",
+        )
+
     def test_app9(self) -> None:
         file_path = self._get_test_path("app_9_test.py")
         result = gather_symbols_provided(file_path)
@@ -304,9 +391,186 @@ class TestSymbolsProvided(InvectioTestBase):
         }
 
 
+class TestSourceEncoding:
+    """Test reading sources respecting their encoding."""
+
+    _SOURCE = "# -*- coding: latin-1 -*-\nimport json\n\njson.dumps('\u00e9')\n"
+
+    def test_coding_declaration(self, tmp_path) -> None:
+        (tmp_path / "app.py").write_bytes(self._SOURCE.encode("latin-1"))
+        result = gather_library_usage(str(tmp_path), without_builtins=True)
+        assert result["errors"] == {}
+        assert result["report"] == {str(tmp_path / "app.py"): {"json": ["json.dumps"]}}
+
+    def test_memory_mapped(self, tmp_path, monkeypatch) -> None:
+        monkeypatch.setattr(invectio_sources, "_MMAP_THRESHOLD", 1)
+        (tmp_path / "app.py").write_bytes(self._SOURCE.encode("latin-1"))
+        (tmp_path / "empty.py").write_bytes(b"")
+        result = gather_library_usage(str(tmp_path), without_builtins=True)
+        assert result["errors"] == {}
+        assert result["report"] == {
+            str(tmp_path / "app.py"): {"json": ["json.dumps"]},
+            str(tmp_path / "empty.py"): {},
+        }
+
+    def test_memory_map_closed(self, tmp_path, monkeypatch) -> None:
+        monkeypatch.setattr(invectio_sources, "_MMAP_THRESHOLD", 1)
+        (tmp_path / "app.py").write_bytes(self._SOURCE.encode("latin-1"))
+        maps = []
+        original_read_source = invectio_sources._read_source
+
+        def read_source(content):
+            source = original_read_source(content)
+            maps.append(source)
+            return source
+
+        monkeypatch.setattr(invectio_sources, "_read_source", read_source)
+        for _ in invectio_sources._iter_source_ast(
+            invectio_sources._iter_path_sources(str(tmp_path)),
+            ignore_errors=False,
+        ):
+            assert isinstance(maps[-1], mmap.mmap)
+            assert maps[-1].closed
+
+        assert len(maps) == 1
+
+    def test_decode_error(self, tmp_path) -> None:
+        (tmp_path / "app.py").write_bytes(
+            self._SOURCE.encode("latin-1").split(b"\n", maxsplit=1)[1],
+        )
+        result = gather_library_usage(str(tmp_path), ignore_errors=True)
+        assert result["report"] == {}
+        assert list(result["errors"]) == [str(tmp_path / "app.py")]
+
+
+class TestSources(InvectioTestBase):
+    """Test analyzing in-memory sources."""
+
+    def test_library_usage_from_sources(self) -> None:
+        file_path = self._get_test_path("app_7_test.py")
+        with open(file_path, "rb") as source_file:
+            content = source_file.read()
+
+        result = gather_library_usage_from_sources(
+            [
+                ("app.py", content),
+                ("app_str.py", content.decode()),
+                ("app_file.py", io.BytesIO(content)),
+            ],
+        )
+        expected = gather_library_usage(file_path)["report"][file_path]
+        assert result["errors"] == {}
+        assert result["report"] == {
+            "app.py": expected,
+            "app_str.py": expected,
+            "app_file.py": expected,
+        }
+
+    def test_library_usage_from_file_objects(self) -> None:
+        file_path = self._get_test_path("app_7_test.py")
+        with open(file_path, "rb") as source_file:
+            result = gather_library_usage_from_sources([source_file])
+
+        assert result == gather_library_usage(file_path)
+
+    def test_library_usage_from_sources_errors(self) -> None:
+        sources = [
+            ("valid.py", b"import json\njson.dumps\n"),
+            ("invalid.py", b"def f(:\n"),
+        ]
+        with pytest.raises(SyntaxError):
+            gather_library_usage_from_sources(sources)
+
+        result = gather_library_usage_from_sources(sources, ignore_errors=True)
+        assert result["report"] == {"valid.py": {"json": ["json.dumps"]}}
+        assert list(result["errors"]) == ["invalid.py"]
+
+    def test_symbols_provided_from_sources(self) -> None:
+        file_path = self._get_test_path("app_9_test.py")
+        with open(file_path, "rb") as source_file:
+            content = source_file.read()
+
+        result = gather_symbols_provided_from_sources([(file_path, content)])
+        assert result == gather_symbols_provided(file_path)
+
+
+class TestCountsLocations:
+    """Test collecting counts and locations of symbols used."""
+
+    _SOURCE = b"""\
+import os
+import os.path
+import json
+
+os.path.join("a", "b")
+json.dumps(os.path.join("c", os.getcwd()))
+print(len([]))
+"""
+
+    def test_default(self) -> None:
+        result = gather_library_usage_from_sources([("app.py", self._SOURCE)])
+        assert "counts" not in result
+        assert "locations" not in result
+
+    def test_counts_locations(self) -> None:
+        result = gather_library_usage_from_sources(
+            [("app.py", self._SOURCE)],
+            with_counts=True,
+            with_locations=True,
+            without_builtins=True,
+        )
+        assert result["counts"] == {
+            "app.py": {"json.dumps": 1, "os.getcwd": 1, "os.path.join": 2},
+        }
+        assert result["locations"] == {
+            "app.py": {
+                "json.dumps": {"columns": [0], "lines": [6]},
+                "os.getcwd": {"columns": [29], "lines": [6]},
+                "os.path.join": {"columns": [0, 11], "lines": [5, 1]},
+            },
+        }
+        assert invectio_lib.decode_locations(
+            result["locations"]["app.py"]["os.path.join"],
+        ) == [(5, 0), (6, 11)]
+
+    def test_standard_imports_omitted(self) -> None:
+        result = gather_library_usage_from_sources(
+            [("app.py", self._SOURCE)],
+            with_counts=True,
+            with_locations=True,
+            without_standard_imports=True,
+        )
+        assert result["counts"] == {
+            "app.py": {"__builtins__.len": 1, "__builtins__.print": 1},
+        }
+        assert set(result["locations"]["app.py"]) == {
+            "__builtins__.len",
+            "__builtins__.print",
+        }
+
+    def test_encode_locations(self) -> None:
+        locations = [(10, 4), (3, 0), (10, 1), (250, 8)]
+        encoded = invectio_lib.encode_locations(locations)
+        assert encoded == {"columns": [0, 1, 4, 8], "lines": [3, 7, 0, 240]}
+        assert invectio_lib.decode_locations(encoded) == sorted(locations)
+
+
 def test_get_standard_imports() -> None:
     standard_imports = get_standard_imports()
     assert isinstance(standard_imports, set)
     assert len(standard_imports) > 0
     assert "json" in standard_imports
     assert "collections" in standard_imports
+
+
+class TestCompatibility:
+    """Test names available in earlier versions are still importable."""
+
+    def test_lib_gather_functions(self) -> None:
+        from invectio.lib import gather_library_usage as lib_gather_library_usage
+        from invectio.lib import gather_symbols_provided as lib_gather_symbols_provided
+
+        assert lib_gather_library_usage is gather_library_usage
+        assert lib_gather_symbols_provided is gather_symbols_provided
+        with pytest.raises(AttributeError):
+            invectio_lib.gather_nothing
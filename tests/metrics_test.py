@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+"""Test collecting scan metrics."""
+
+import io
+import urllib.request
+
+import pytest
+
+from invectio import gather_library_usage
+from invectio import gather_library_usage_from_sources
+from invectio.metrics import ScanMetrics
+
+
+class TestMetrics:
+    """Test collecting scan metrics."""
+
+    def test_observe_file(self) -> None:
+        """Test counters and the latency histogram are updated."""
+        metrics = ScanMetrics()
+        metrics.observe_file(10, 0.0005)
+        metrics.observe_file(20, 0.01)
+        metrics.observe_file(30, 20.0, error=True)
+
+        assert metrics.files_processed == 3
+        assert metrics.parse_errors == 1
+        assert metrics.bytes_read == 60
+        text = metrics.to_prometheus()
+        assert "invectio_files_processed_total 3\n" in text
+        assert "invectio_parse_errors_total 1\n" in text
+        assert "invectio_bytes_read_total 60\n" in text
+        assert 'invectio_file_latency_seconds_bucket{le="0.001"} 1\n' in text
+        assert 'invectio_file_latency_seconds_bucket{le="0.01"} 2\n' in text
+        assert 'invectio_file_latency_seconds_bucket{le="10.0"} 2\n' in text
+        assert 'invectio_file_latency_seconds_bucket{le="+Inf"} 3\n' in text
+        assert "invectio_file_latency_seconds_count 3\n" in text
+        # The number of files is not known.
+        assert "invectio_files " not in text
+        assert metrics.get_eta() is None
+
+    def test_progress(self) -> None:
+        """Test progress is reported on the given stream."""
+        progress = io.StringIO()
+        metrics = ScanMetrics(files_total=4, progress=progress)
+        metrics.observe_file(10, 0.1)
+        metrics.report(final=True)
+
+        assert metrics.get_eta() is not None
+        lines = progress.getvalue().split("\r")
+        assert lines[1].startswith("1/4 files (25.0 %), ")
+        assert lines[-1].endswith("\n")
+
+    def test_gather_library_usage(self, tmp_path) -> None:
+        """Test metrics are updated while files in a path are analyzed."""
+        (tmp_path / "a.py").write_text("import os\nos.getcwd()\n")
+        (tmp_path / "b.py").write_text("def broken(:\n")
+        textfile = tmp_path / "metrics.prom"
+        metrics = ScanMetrics(textfile=str(textfile))
+        gather_library_usage(str(tmp_path), ignore_errors=True, metrics=metrics)
+        metrics.report(final=True)
+
+        assert metrics.files_total == 2
+        assert metrics.files_processed == 2
+        assert metrics.parse_errors == 1
+        assert metrics.bytes_read == 22 + 13
+        assert "invectio_files 2\n" in textfile.read_text()
+
+    def test_gather_library_usage_from_sources(self) -> None:
+        """Test metrics are updated while in-memory sources are analyzed."""
+        metrics = ScanMetrics()
+        gather_library_usage_from_sources([("a.py", b"import os\n")], metrics=metrics)
+        assert metrics.files_processed == 1
+        assert metrics.bytes_read == 10
+
+    def test_serve(self) -> None:
+        """Test metrics are exposed over HTTP."""
+        metrics = ScanMetrics()
+        metrics.observe_file(10, 0.1)
+        server = metrics.serve(0, "127.0.0.1")
+        try:
+            with urllib.request.urlopen(
+                f"http://127.0.0.1:{server.server_address[1]}/metrics",
+            ) as response:
+                assert response.headers["Content-Type"].startswith(
+                    "text/plain; version=0.0.4",
+                )
+                assert b"invectio_files_processed_total 1\n" in response.read()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_errors_not_ignored(self) -> None:
+        """Test files failing to parse are not counted if errors are raised."""
+        metrics = ScanMetrics()
+        with pytest.raises(SyntaxError):
+            gather_library_usage_from_sources(
+                [("a.py", b"def broken(:\n")],
+                metrics=metrics,
+            )
+        assert metrics.files_processed == 0
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+"""Test extracting Python sources from Jupyter notebooks."""
+
+import io
+import json
+
+import pytest
+
+from invectio import gather_library_usage
+from invectio import gather_library_usage_from_sources
+from invectio.lib import decode_locations
+from invectio.notebook import iter_notebook_cells
+from invectio.notebook import read_notebook
+from invectio.notebook import strip_magics
+from invectio.query import find_library_usage
+import invectio.notebook
+
+
+def _make_notebook(*cells):
+    """Create a notebook with the given (cell type, source) cells, code cells get large outputs."""
+    return json.dumps(
+        {
+            "cells": [
+                {
+                    "cell_type": cell_type,
+                    "metadata": {"tags": ['a "quoted" \\ tag']},
+                    "outputs": [
+                        {
+                            "data": {"image/png": "x" * 10000},
+                            "output_type": "display_data",
+                        },
+                    ],
+                    "source": source,
+                }
+                for cell_type, source in cells
+            ],
+            "metadata": {"language_info": {"name": "python"}},
+            "nbformat": 4,
+            "nbformat_minor": 5,
+        },
+    )
+
+
+class TestNotebook:
+    """Test extracting Python sources from Jupyter notebooks."""
+
+    @pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 65536])
+    def test_iter_notebook_cells(self, monkeypatch, chunk_size) -> None:
+        """Test code cells are extracted regardless of how the stream is split into chunks."""
+        monkeypatch.setattr(invectio.notebook, "_CHUNK_SIZE", chunk_size)
+        content = _make_notebook(
+            ("markdown", "# Title é"),
+            ("code", ["import os\n", 'print("é\\n")']),
+            ("code", "x = 1.5e3"),
+        )
+        assert list(iter_notebook_cells(io.BytesIO(content.encode()))) == [
+            (1, 'import os\nprint("é\\n")'),
+            (2, "x = 1.5e3"),
+        ]
+
+    def test_iter_notebook_cells_invalid(self) -> None:
+        """Test invalid JSON is reported."""
+        with pytest.raises(ValueError):
+            list(iter_notebook_cells(io.StringIO('{"cells": [{"source": "x" ')))
+
+    @pytest.mark.parametrize(
+        "source,expected",
+        [
+            ("%matplotlib inline\nimport os\n", "pass\nimport os\n"),
+            ("!pip install yaml\nfiles = !ls\n", "pass\nfiles = None\n"),
+            ("os.path?\n  %time f()\n", "pass\n  pass\n"),
+            ("%%time\nimport os\n", "\nimport os\n"),
+            ("%%bash\nls\nimport os\n", "\n\n\n"),
+            ("# what?\nx = 1\n", "# what?\nx = 1\n"),
+            (
+                "import numpy as np  # is this needed?\nnp.zeros(3)\n",
+                "import numpy as np  # is this needed?\nnp.zeros(3)\n",
+            ),
+            ('x = "why?"\nnp.*load*??\n', 'x = "why?"\npass\n'),
+            ('msg = ("%s"\n       % name)\n', 'msg = ("%s"\n       % name)\n'),
+            ("x = 7 \\\n    % 2\n!ls\n", "x = 7 \\\n    % 2\npass\n"),
+            ('doc = """\n%s\n"""\n%time f()\n', 'doc = """\n%s\n"""\npass\n'),
+            ("f('(', # )\n  'what?')\n", "f('(', # )\n  'what?')\n"),
+        ],
+    )
+    def test_strip_magics(self, source, expected) -> None:
+        """Test magics are replaced keeping line numbers."""
+        assert strip_magics(source) == expected
+
+    def test_read_notebook(self) -> None:
+        """Test cells are concatenated into a single module."""
+        source, cells = read_notebook(
+            _make_notebook(
+                ("code", "%load_ext autoreload\nimport os"),
+                ("raw", "import yaml"),
+                ("code", "os.getcwd()\n"),
+            ),
+        )
+        assert source == "pass\nimport os\nos.getcwd()\n"
+        assert cells == [(1, 0), (3, 2)]
+
+    def test_gather_library_usage(self, tmp_path) -> None:
+        """Test notebooks found in a directory are analyzed as a single module."""
+        (tmp_path / "a.py").write_text("import yaml\nyaml.safe_load()\n")
+        (tmp_path / "b.ipynb").write_text(
+            _make_notebook(("code", "import os\n!ls"), ("code", "os.getcwd()")),
+        )
+        (tmp_path / "c.ipynb").write_text(_make_notebook(("code", "def broken(:")))
+        result = gather_library_usage(
+            str(tmp_path),
+            ignore_errors=True,
+            without_builtins=True,
+        )
+        assert result["report"] == {
+            str(tmp_path / "a.py"): {"yaml": ["yaml.safe_load"]},
+            str(tmp_path / "b.ipynb"): {"os": ["os.getcwd"]},
+        }
+        assert list(result["errors"]) == [str(tmp_path / "c.ipynb")]
+
+    def test_locations(self) -> None:
+        """Test locations in notebooks are reported relative to cells."""
+        content = _make_notebook(
+            ("code", "import os\n"),
+            ("markdown", "text"),
+            ("code", "%time x = 1\n\nos.getcwd()\nos.getcwd()"),
+        )
+        result = gather_library_usage_from_sources(
+            [("notebook.ipynb", content.encode())],
+            with_locations=True,
+        )
+        assert result["report"] == {"notebook.ipynb": {"os": ["os.getcwd"]}}
+        encoded = result["locations"]["notebook.ipynb"]["os.getcwd"]
+        assert "cells" in encoded
+        assert decode_locations(encoded) == [(2, 3, 0), (2, 4, 0)]
+
+    def test_find_library_usage(self, tmp_path) -> None:
+        """Test symbols queried are found in notebooks, locations are relative to cells."""
+        (tmp_path / "a.ipynb").write_text(
+            _make_notebook(("code", "import os"), ("code", "\nos.getcwd()")),
+        )
+        result = find_library_usage(str(tmp_path), ["os.getcwd"])
+        assert result["found"] == {
+            "os.getcwd": {
+                "cell": 1,
+                "column": 0,
+                "file": str(tmp_path / "a.ipynb"),
+                "line": 2,
+                "symbol": "os.getcwd",
+            },
+        }
+
+    def test_find_library_usage_prescan(self, tmp_path) -> None:
+        """Test notebooks mentioning modules queried only outside of code cells are not parsed."""
+        (tmp_path / "a.ipynb").write_text(
+            _make_notebook(("markdown", "import yaml"), ("code", "def broken(:")),
+        )
+        result = find_library_usage(str(tmp_path), ["yaml.safe_load"])
+        assert result["errors"] == {}
+        assert result["missing"] == ["yaml.safe_load"]
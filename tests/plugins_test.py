@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+import ast
+
+import pytest
+
+from invectio import InvectioPlugin
+from invectio import gather_library_usage_from_sources
+from invectio import gather_symbols_provided_from_sources
+from invectio import get_plugins
+from invectio import register_plugin
+from invectio.plugins import PluginDispatcher
+
+_SOURCE = b"""\
+import os
+
+def join(path):
+    return os.path.join(path, "foo")
+
+class Foo:
+    def bar(self):
+        return join(os.getcwd())
+"""
+
+
+class _CallCounter(InvectioPlugin):
+    """Count calls in a file."""
+
+    name = "calls"
+
+    def __init__(self, file_name: str) -> None:
+        super().__init__(file_name)
+        self.calls = 0
+
+    def visit_Call(self, node: ast.Call) -> None:  # noqa: N802
+        self.calls += 1
+
+    def get_report(self) -> int:
+        return self.calls
+
+
+class _NameCollector(InvectioPlugin):
+    """Collect all the names seen in a file."""
+
+    name = "names"
+
+    def __init__(self, file_name: str) -> None:
+        super().__init__(file_name)
+        self.names = set()
+
+    def visit_Name(self, node: ast.Name) -> None:  # noqa: N802
+        self.names.add(node.id)
+
+    def visit_arg(self, node: ast.arg) -> None:
+        self.names.add(node.arg)
+
+    def get_report(self) -> list:
+        return sorted(self.names)
+
+
+def _walk_reports(source: bytes) -> dict:
+    """Compute reports of the test plugins by walking the whole tree."""
+    dispatcher = PluginDispatcher.create([_CallCounter, _NameCollector], "app.py")
+    dispatcher.walk(ast.parse(source))
+    return dispatcher.get_reports()
+
+
+class TestPlugins:
+    """Test running plugins in the same traversal as Invectio visitors."""
+
+    @pytest.mark.parametrize("scope_aware", [False, True])
+    def test_library_usage(self, scope_aware: bool) -> None:
+        """Test plugins see every node once during library usage gathering."""
+        result = gather_library_usage_from_sources(
+            [("app.py", _SOURCE)],
+            scope_aware=scope_aware,
+            plugins=[_CallCounter, _NameCollector],
+        )
+        assert result["report"] == {"app.py": {"os": ["os.getcwd", "os.path.join"]}}
+        assert result["plugins"] == {
+            "calls": {"app.py": 3},
+            "names": {"app.py": ["join", "os", "path", "self"]},
+        }
+        assert {
+            name: report["app.py"] for name, report in result["plugins"].items()
+        } == _walk_reports(_SOURCE)
+
+    def test_symbols_provided(self) -> None:
+        """Test plugins run when gathering symbols provided."""
+        result = gather_symbols_provided_from_sources(
+            [("app.py", _SOURCE)],
+            plugins=[_CallCounter],
+        )
+        assert result["report"] == {"app.py": ["app.Foo", "app.join"]}
+        assert result["plugins"] == {"calls": {"app.py": 3}}
+
+    def test_no_plugins(self) -> None:
+        """Test no plugin reports are stored if no plugins are given."""
+        result = gather_library_usage_from_sources([("app.py", _SOURCE)])
+        assert "plugins" not in result
+
+    def test_register_plugin(self) -> None:
+        """Test registering plugins in code."""
+        assert register_plugin(_CallCounter) is _CallCounter
+        assert _CallCounter in get_plugins()
+
+    def test_register_plugin_without_name(self) -> None:
+        """Test a plugin has to state its name to be registered."""
+
+        class Unnamed(InvectioPlugin):
+            pass
+
+        with pytest.raises(ValueError):
+            register_plugin(Unnamed)
+
+    def test_plugin_without_report(self) -> None:
+        """Test a plugin not implementing get_report cannot be instantiated."""
+
+        class NoReport(InvectioPlugin):
+            name = "no-report"
+
+        with pytest.raises(TypeError):
+            NoReport("app.py")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+import pytest
+
+from invectio.query import find_library_usage
+
+
+@pytest.fixture
+def project(tmp_path):
+    """Create a project with a few files, files are processed in sorted order."""
+    (tmp_path / "a.py").write_text("import os\n\nos.getcwd()\n")
+    (tmp_path / "b.py").write_text(
+        "import os\nimport yaml\n\n\ndef load(os):\n    return yaml.safe_load(os.path.join())\n",
+    )
+    (tmp_path / "c.py").write_text("import yaml\nyaml.dump(\n")
+    (tmp_path / "d.py").write_text("def broken(:\n")
+    return tmp_path
+
+
+class TestQuery:
+    """Test checking whether sources use the given symbols."""
+
+    def test_found(self, project) -> None:
+        """Test the first location of each symbol is reported."""
+        result = find_library_usage(str(project), ["yaml.safe_load", "os"])
+        assert result["found"] == {
+            "os": {
+                "column": 0,
+                "file": str(project / "a.py"),
+                "line": 3,
+                "symbol": "os.getcwd",
+            },
+            "yaml.safe_load": {
+                "column": 11,
+                "file": str(project / "b.py"),
+                "line": 6,
+                "symbol": "yaml.safe_load",
+            },
+        }
+        # Files following the one where all the symbols were found are not parsed.
+        assert result["errors"] == {}
+        assert result["missing"] == []
+
+    def test_prescan(self, project) -> None:
+        """Test files not mentioning modules queried are not parsed."""
+        result = find_library_usage(str(project), ["os.path.join"])
+        assert result["found"]["os.path.join"]["file"] == str(project / "b.py")
+        assert result["errors"] == {}
+
+        with pytest.raises(SyntaxError):
+            find_library_usage(str(project), ["yaml.dump"])
+
+        result = find_library_usage(str(project), ["yaml.dump"], ignore_errors=True)
+        assert result["found"] == {}
+        assert result["missing"] == ["yaml.dump"]
+        assert set(result["errors"]) == {str(project / "c.py")}
+
+    def test_scope_aware(self, project) -> None:
+        """Test local names shadowing imports are not reported in the scope-aware mode."""
+        result = find_library_usage(
+            str(project),
+            ["os.path"],
+            scope_aware=True,
+            ignore_errors=True,
+        )
+        assert result["found"] == {}
+        assert result["missing"] == ["os.path"]
+
+    def test_builtins(self, project) -> None:
+        """Test querying builtins."""
+        (project / "e.py").write_text("print(len([]))\n")
+        result = find_library_usage(
+            str(project),
+            ["__builtins__.len"],
+            ignore_errors=True,
+        )
+        assert result["found"]["__builtins__.len"]["file"] == str(project / "e.py")
+        assert result["found"]["__builtins__.len"]["column"] == 6
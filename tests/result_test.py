@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+"""Test typed results of the analysis."""
+
+from invectio import LibraryUsage
+from invectio import SymbolsProvided
+from invectio import gather_library_usage
+from invectio import gather_symbols_provided
+from invectio import iter_library_usage_results
+from invectio import iter_library_usage_results_from_sources
+from invectio import iter_symbols_provided_results
+from invectio import iter_symbols_provided_results_from_sources
+
+
+class TestResult:
+    """Test typed results of the analysis."""
+
+    def test_library_usage(self) -> None:
+        """Test library usage supports lookups and produces the report form on request."""
+        usage = LibraryUsage.from_sets(
+            {"yaml": {"yaml.load"}, "os": {"os.path.join", "os.getcwd"}},
+        )
+        assert "os" in usage
+        assert "sys" not in usage
+        assert usage["os"] == frozenset({"os.getcwd", "os.path.join"})
+        assert usage.uses("os.path.join")
+        assert not usage.uses("os.path")
+        assert not usage.uses("sys.exit")
+        assert not usage.uses("yaml")
+        assert len(usage) == 2
+        assert usage.count() == 3
+        assert usage.to_dict() == {
+            "os": ["os.getcwd", "os.path.join"],
+            "yaml": ["yaml.load"],
+        }
+        assert list(usage.to_dict()) == ["os", "yaml"]
+
+    def test_symbols_provided(self) -> None:
+        """Test symbols provided support lookups and produce the report form on request."""
+        provided = SymbolsProvided("pkg.module", frozenset({"func", "Class"}))
+        assert "pkg.module.func" in provided
+        assert "func" not in provided
+        assert "pkg.other.func" not in provided
+        assert len(provided) == 2
+        assert set(provided) == {"pkg.module.func", "pkg.module.Class"}
+        assert provided.to_list() == ["pkg.module.Class", "pkg.module.func"]
+
+    def test_iter_library_usage_results(self, tmp_path) -> None:
+        """Test typed results match the report form computed by gathering functions."""
+        (tmp_path / "a.py").write_text(
+            "import os\nimport yaml\nos.getcwd()\nyaml.safe_load(os.path.join())\n",
+        )
+        (tmp_path / "b.py").write_text("def broken(:\n")
+        errors = {}
+        results = dict(
+            iter_library_usage_results(
+                str(tmp_path),
+                ignore_errors=True,
+                without_builtins=True,
+                errors=errors,
+            ),
+        )
+        expected = gather_library_usage(
+            str(tmp_path),
+            ignore_errors=True,
+            without_builtins=True,
+        )
+        assert {
+            file_name: usage.to_dict() for file_name, usage in results.items()
+        } == expected["report"]
+        assert list(errors) == list(expected["errors"])
+
+    def test_iter_library_usage_results_from_sources(self) -> None:
+        """Test typed results are computed for in-memory sources, standard imports can be omitted."""
+        ((file_name, usage),) = iter_library_usage_results_from_sources(
+            [("a.py", b"import os\nimport yaml\nos.getcwd()\nyaml.load()\n")],
+            without_standard_imports=True,
+        )
+        assert file_name == "a.py"
+        assert dict(usage) == {"yaml": frozenset({"yaml.load"})}
+
+    def test_iter_symbols_provided_results(self, tmp_path) -> None:
+        """Test typed symbols provided match the report form computed by gathering functions."""
+        (tmp_path / "module.py").write_text(
+            "def func():\n    pass\n\nclass Class:\n    pass\n\n_private = 1\n",
+        )
+        results = dict(iter_symbols_provided_results(str(tmp_path)))
+        expected = gather_symbols_provided(str(tmp_path))
+        assert {
+            file_name: provided.to_list() for file_name, provided in results.items()
+        } == expected["report"]
+
+        ((_, provided),) = iter_symbols_provided_results_from_sources(
+            [("pkg/module.py", b"_private = 1\n")],
+            include_private=True,
+        )
+        assert provided.to_list() == ["pkg.module._private"]
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+import os
+
+import pytest
+
+from invectio import gather_library_usage
+from invectio.sampling import gather_library_usage_sample
+from invectio.sampling import parse_sample
+from invectio.sampling import sample_files
+
+
+def _write_tree(root) -> None:
+    """Create a tree with 40 files, every fourth file uses yaml, all files use os."""
+    for directory in ("a", "b"):
+        for i in range(20):
+            content = "import os\nos.getcwd()\n"
+            if i % 4 == 0:
+                content += "import yaml\nyaml.safe_load()\n"
+            path = root / directory / f"module_{i}.py"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(content)
+
+
+class TestSampling:
+    """Test estimating library usage from a sample of files."""
+
+    @pytest.mark.parametrize(
+        "sample,expected",
+        [
+            ("0.1", 0.1),
+            ("1.0", 1.0),
+            ("10", 10),
+        ],
+    )
+    def test_parse_sample(self, sample: str, expected) -> None:
+        """Test parsing sample sizes."""
+        result = parse_sample(sample)
+        assert result == expected
+        assert type(result) is type(expected)
+
+    @pytest.mark.parametrize("sample", ["0", "0.0", "1.5", "-3", "foo"])
+    def test_parse_sample_invalid(self, sample: str) -> None:
+        """Test parsing invalid sample sizes."""
+        with pytest.raises(ValueError):
+            parse_sample(sample)
+
+    def test_sample_files(self) -> None:
+        """Test sampling is reproducible and stratified proportionally."""
+        files = [
+            os.path.join("root", directory, f"{i}.py")
+            for directory in ("a", "b")
+            for i in range(30)
+        ]
+        files += [os.path.join("root", "setup.py")]
+
+        result = sample_files(files, 10, seed=42)
+        assert list(result) == ["."]
+        assert result["."][0] == 61
+        assert len(result["."][1]) == 10
+        assert sample_files(list(reversed(files)), 10, seed=42) == result
+
+        result = sample_files(files, 0.5, seed=42, root="root")
+        assert {
+            stratum: (population, len(sampled))
+            for stratum, (population, sampled) in result.items()
+        } == {
+            ".": (1, 1),
+            "a": (30, 15),
+            "b": (30, 15),
+        }
+        assert all(
+            python_file.startswith(os.path.join("root", "a", ""))
+            for python_file in result["a"][1]
+        )
+
+    @pytest.mark.parametrize("stratify", [False, True])
+    def test_whole_population(self, tmp_path, stratify: bool) -> None:
+        """Test estimates are exact if all the files are sampled."""
+        _write_tree(tmp_path)
+        result = gather_library_usage_sample(
+            str(tmp_path),
+            1.0,
+            seed=0,
+            stratify=stratify,
+        )
+
+        assert result["report"] == gather_library_usage(str(tmp_path))["report"]
+        assert result["estimates"]["yaml"]["files"] == 10
+        assert result["estimates"]["yaml"]["interval"] == [0.25, 0.25]
+        assert result["estimates"]["os"]["symbols"]["os.getcwd"]["frequency"] == 1.0
+
+    @pytest.mark.parametrize("stratify", [False, True])
+    def test_sample(self, tmp_path, stratify: bool) -> None:
+        """Test estimates computed from a sample."""
+        _write_tree(tmp_path)
+        result = gather_library_usage_sample(
+            str(tmp_path),
+            16,
+            seed=1,
+            stratify=stratify,
+            confidence=0.99,
+        )
+        assert result == gather_library_usage_sample(
+            str(tmp_path),
+            16,
+            seed=1,
+            stratify=stratify,
+            confidence=0.99,
+        )
+
+        assert len(result["report"]) == 16
+        assert result["sample"]["files"] == 40
+        assert result["sample"]["sampled"] == 16
+        assert result["sample"]["seed"] == 1
+        assert ("strata" in result["sample"]) is stratify
+
+        estimate = result["estimates"]["yaml"]["symbols"]["yaml.safe_load"]
+        lower, upper = estimate["interval"]
+        assert lower < 0.25 < upper
+        assert lower <= estimate["frequency"] <= upper
+        assert estimate["files"] == pytest.approx(estimate["frequency"] * 40, abs=0.01)
+
+    def test_single_file_strata(self, tmp_path) -> None:
+        """Test intervals do not collapse if only one file is sampled from each stratum."""
+        for directory in "abcde":
+            for i in range(20):
+                path = tmp_path / directory / f"module_{i}.py"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text("import os\nos.getcwd()\n" if i % 2 else "x = 1\n")
+
+        result = gather_library_usage_sample(str(tmp_path), 0.05, seed=0, stratify=True)
+        assert all(
+            stratum["sampled"] == 1 for stratum in result["sample"]["strata"].values()
+        )
+
+        estimate = result["estimates"]["os"]
+        lower, upper = estimate["interval"]
+        assert lower < 0.5 < upper
+        assert lower <= estimate["frequency"] <= upper
+
+    def test_seed_reported(self, tmp_path) -> None:
+        """Test a random seed is reported if not provided."""
+        _write_tree(tmp_path)
+        result = gather_library_usage_sample(str(tmp_path), 5)
+        assert result == gather_library_usage_sample(
+            str(tmp_path),
+            5,
+            seed=result["sample"]["seed"],
+        )
+
+    def test_invalid_confidence(self, tmp_path) -> None:
+        """Test confidence level is checked."""
+        _write_tree(tmp_path)
+        with pytest.raises(ValueError):
+            gather_library_usage_sample(str(tmp_path), 5, confidence=1.0)
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+import ast
+import io
+import json
+import os
+
+import pytest
+
+from invectio import InvectioPlugin
+from invectio import gather_library_usage
+from invectio import gather_symbols_provided
+from invectio.environment import annotate_distributions
+from invectio.shard import in_shard
+from invectio.shard import merge_shards
+from invectio.shard import parse_shard
+from invectio.shard import write_ndjson
+
+
+class _ImportCounter(InvectioPlugin):
+    """Count import statements in a file."""
+
+    name = "imports"
+
+    def __init__(self, file_name: str) -> None:
+        super().__init__(file_name)
+        self.imports = 0
+
+    def visit_Import(self, node: ast.Import) -> None:  # noqa: N802
+        self.imports += 1
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:  # noqa: N802
+        self.imports += 1
+
+    def get_report(self) -> int:
+        return self.imports
+
+
+def _write_shards(tmp_path, results: list) -> list:
+    """Write the given results of shards as newline delimited JSON files."""
+    shard_files = []
+    for index, result in enumerate(results, start=1):
+        shard_file = str(tmp_path / f"shard_{index}.ndjson")
+        with open(shard_file, "w") as output:
+            write_ndjson(result, output)
+        shard_files.append(shard_file)
+
+    return shard_files
+
+
+class TestShard:
+    """Test splitting scans into shards and merging their results."""
+
+    _PROJECT_DIR = os.path.join("tests", "data", "project_dir")
+
+    @pytest.mark.parametrize(
+        "shard,expected",
+        [
+            ("1/1", (1, 1)),
+            ("2/3", (2, 3)),
+        ],
+    )
+    def test_parse_shard(self, shard: str, expected: tuple) -> None:
+        """Test parsing shards."""
+        assert parse_shard(shard) == expected
+
+    @pytest.mark.parametrize("shard", ["1", "a/b", "0/3", "4/3", "1/0"])
+    def test_parse_shard_invalid(self, shard: str) -> None:
+        """Test parsing invalid shards."""
+        with pytest.raises(ValueError):
+            parse_shard(shard)
+
+    def test_in_shard(self) -> None:
+        """Test each key is assigned to exactly one shard."""
+        keys = [f"proj/module_{i}.py" for i in range(100)]
+        shards = [
+            [key for key in keys if in_shard(key, (index, 4))] for index in range(1, 5)
+        ]
+        assert sorted(key for shard in shards for key in shard) == sorted(keys)
+        assert all(shards)
+        assert shards == [
+            [key for key in keys if in_shard(key, (index, 4))] for index in range(1, 5)
+        ]
+
+    @pytest.mark.parametrize("gather", [gather_library_usage, gather_symbols_provided])
+    def test_shards_merge(self, tmp_path, gather) -> None:
+        """Test merged results of all the shards are the same as results of a single scan."""
+        expected = gather(self._PROJECT_DIR)
+
+        shard_files = []
+        for index in range(1, 4):
+            result = gather(self._PROJECT_DIR, shard=(index, 3))
+            shard_file = str(tmp_path / f"shard_{index}.ndjson")
+            with open(shard_file, "w") as output:
+                write_ndjson(result, output)
+            shard_files.append(shard_file)
+
+        output = io.StringIO()
+        merge_shards(shard_files, output)
+        assert json.loads(output.getvalue()) == expected
+
+    @pytest.mark.parametrize("gather", [gather_library_usage, gather_symbols_provided])
+    def test_shards_merge_plugins(self, tmp_path, gather) -> None:
+        """Test reports of plugins are merged."""
+        expected = gather(self._PROJECT_DIR, plugins=[_ImportCounter])
+        assert expected["plugins"]["imports"]
+
+        shard_files = _write_shards(
+            tmp_path,
+            [
+                gather(self._PROJECT_DIR, plugins=[_ImportCounter], shard=(i, 3))
+                for i in range(1, 4)
+            ],
+        )
+        output = io.StringIO()
+        merge_shards(shard_files, output)
+        assert json.loads(output.getvalue()) == expected
+
+    def test_shards_merge_counts_locations(self, tmp_path) -> None:
+        """Test counts and locations of symbols are merged."""
+        expected = gather_library_usage(
+            self._PROJECT_DIR,
+            with_counts=True,
+            with_locations=True,
+        )
+        assert expected["counts"]
+        assert expected["locations"]
+
+        shard_files = _write_shards(
+            tmp_path,
+            [
+                gather_library_usage(
+                    self._PROJECT_DIR,
+                    with_counts=True,
+                    with_locations=True,
+                    shard=(i, 3),
+                )
+                for i in range(1, 4)
+            ],
+        )
+        output = io.StringIO()
+        merge_shards(shard_files, output)
+        assert json.loads(output.getvalue()) == expected
+
+    def test_shards_merge_distributions(self, tmp_path) -> None:
+        """Test distributions annotated in shards are merged."""
+        import_index = {"flask": ("Flask",)}
+        expected = annotate_distributions(
+            gather_library_usage(self._PROJECT_DIR),
+            import_index,
+        )
+        assert expected["distributions"]["flask"] == ["Flask"]
+
+        shard_files = _write_shards(
+            tmp_path,
+            [
+                annotate_distributions(
+                    gather_library_usage(self._PROJECT_DIR, shard=(i, 3)),
+                    import_index,
+                )
+                for i in range(1, 4)
+            ],
+        )
+        output = io.StringIO()
+        merge_shards(shard_files, output)
+        assert json.loads(output.getvalue()) == expected
+
+    def test_shards_merge_aggregated(self, tmp_path) -> None:
+        """Test usage of the same package found in multiple shards is merged."""
+        project_dir = tmp_path / "project"
+        (project_dir / "pkg").mkdir(parents=True)
+        for index in range(8):
+            (project_dir / "pkg" / f"mod{index}.py").write_text(
+                f"import os\nimport mod{index}\nos.getcwd()\nmod{index}.run()\n",
+            )
+
+        expected = gather_library_usage(
+            str(project_dir),
+            with_counts=True,
+            aggregate="package",
+        )
+        results = [
+            gather_library_usage(
+                str(project_dir),
+                with_counts=True,
+                aggregate="package",
+                shard=(i, 2),
+            )
+            for i in range(1, 3)
+        ]
+        assert all(result["report"] for result in results)
+
+        output = io.StringIO()
+        merge_shards(_write_shards(tmp_path, results), output)
+        merged = json.loads(output.getvalue())
+        assert merged == expected
+        assert merged["counts"][str(project_dir / "pkg")]["os.getcwd"] == 8
+        assert len(merged["report"][str(project_dir / "pkg")]) == 9
+
+    def test_merge_different_options(self, tmp_path) -> None:
+        """Test shards produced with different options are not merged."""
+        shard_files = _write_shards(
+            tmp_path,
+            [
+                gather_library_usage(
+                    self._PROJECT_DIR,
+                    plugins=[_ImportCounter],
+                    shard=(1, 2),
+                ),
+                gather_library_usage(self._PROJECT_DIR, shard=(2, 2)),
+            ],
+        )
+        with pytest.raises(ValueError):
+            merge_shards(shard_files, io.StringIO())
+
+    def test_merge_errors(self, tmp_path) -> None:
+        """Test errors are merged, keys of the merged document are sorted."""
+        shard_1 = tmp_path / "shard_1.ndjson"
+        shard_1.write_text(
+            '{"key": "a.py", "report": {"os": ["os.getcwd"]}}\n'
+            '{"key": "c.py", "error": "SyntaxError: invalid syntax"}\n',
+        )
+        shard_2 = tmp_path / "shard_2.ndjson"
+        shard_2.write_text('{"key": "b.py", "report": {}}\n')
+
+        output = io.StringIO()
+        merge_shards([str(shard_1), str(shard_2)], output)
+        result = json.loads(output.getvalue())
+        assert result["errors"] == {"c.py": "SyntaxError: invalid syntax"}
+        assert list(result["report"]) == ["a.py", "b.py"]
+        assert list(result) == ["errors", "report", "version"]
+
+    def test_merge_unsorted(self, tmp_path) -> None:
+        """Test shards with records not sorted are rejected."""
+        shard = tmp_path / "shard.ndjson"
+        shard.write_text(
+            '{"key": "b.py", "report": {}}\n{"key": "a.py", "report": {}}\n',
+        )
+
+        with pytest.raises(ValueError):
+            merge_shards([str(shard)], io.StringIO())
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# Invectio
+# Copyright(C) 2019 - 2021 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+import os
+
+import pytest
+
+from invectio.watch import LibraryUsageWatch
+from invectio.watch import UsageIndex
+from invectio.watch import _InotifyWatcher
+
+try:
+    _InotifyWatcher(".").close()
+    _INOTIFY_AVAILABLE = True
+except (AttributeError, OSError):
+    _INOTIFY_AVAILABLE = False
+
+
+def _write(path, content: str) -> None:
+    """Write the given content to a file, creating parent directories."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+class TestUsageIndex:
+    """Test keeping the aggregate usage index up to date."""
+
+    def test_update(self) -> None:
+        """Test updating reports of files updates the aggregate index."""
+        index = UsageIndex()
+        index.update("a.py", {"os": ["os.getcwd"]})
+        index.update(
+            "b.py",
+            {"os": ["os.getcwd", "os.path.join"], "yaml": ["yaml.safe_load"]},
+        )
+        assert index.query("os") == ["os.getcwd", "os.path.join"]
+        assert index.query("yaml") == ["yaml.safe_load"]
+        assert index.query_files("os.getcwd") == ["a.py", "b.py"]
+        assert index.query_files("yaml") == ["b.py"]
+
+        index.update("b.py", {"os": ["os.getcwd"]})
+        assert index.query("os") == ["os.getcwd"]
+        assert index.query("yaml") == []
+        assert index.to_dict()["index"] == {"os": ["os.getcwd"]}
+
+    def test_remove(self) -> None:
+        """Test removing files and storing errors."""
+        index = UsageIndex()
+        index.update("a.py", {"os": ["os.getcwd"]})
+        index.update("b.py", {"os": ["os.getcwd"]})
+
+        index.remove("a.py")
+        assert index.query_files("os.getcwd") == ["b.py"]
+
+        index.set_error("b.py", "SyntaxError: invalid syntax")
+        assert index.query("os") == []
+        assert index.to_dict()["errors"] == {"b.py": "SyntaxError: invalid syntax"}
+        assert index.to_dict()["report"] == {}
+
+        index.update("b.py", {})
+        assert index.errors == {}
+
+
+class TestLibraryUsageWatch:
+    """Test watching sources for changes."""
+
+    @pytest.fixture(
+        params=[
+            True,
+            pytest.param(
+                False,
+                marks=pytest.mark.skipif(
+                    not _INOTIFY_AVAILABLE,
+                    reason="inotify is not available",
+                ),
+            ),
+        ],
+        ids=["polling", "inotify"],
+    )
+    def polling(self, request) -> bool:
+        """Run tests using polling and inotify if available."""
+        return request.param
+
+    @staticmethod
+    def _step(library_usage_watch: LibraryUsageWatch) -> set:
+        """Wait for changes to be processed."""
+        for _ in range(10):
+            refreshed = library_usage_watch.step(0.1)
+            if refreshed:
+                return refreshed
+
+        return set()
+
+    def test_watch(self, tmp_path, polling: bool) -> None:
+        """Test changed, new and removed files are reflected in the index."""
+        app = tmp_path / "app.py"
+        utils = tmp_path / "proj" / "utils.py"
+        _write(app, "import os\nos.getcwd()\n")
+        _write(utils, "import yaml\nyaml.safe_load()\n")
+        _write(tmp_path / ".hidden" / "hidden.py", "import json\n")
+
+        with LibraryUsageWatch(
+            str(tmp_path),
+            polling=polling,
+            debounce=0.05,
+        ) as library_usage_watch:
+            index = library_usage_watch.index
+            assert index.report == {
+                str(app): {"os": ["os.getcwd"]},
+                str(utils): {"yaml": ["yaml.safe_load"]},
+            }
+
+            _write(app, "import os\nos.path.join()\n")
+            assert self._step(library_usage_watch) == {str(app)}
+            assert index.query("os") == ["os.path.join"]
+
+            utils.unlink()
+            assert self._step(library_usage_watch) == {str(utils)}
+            assert index.query("yaml") == []
+
+            _write(app, "import os\nos.path.join(\n")
+            assert self._step(library_usage_watch) == {str(app)}
+            assert str(app) in index.errors
+            assert str(app) not in index.report
+
+            new = tmp_path / "new" / "sub" / "new.py"
+            _write(new, "import attr\nattr.s()\n")
+            assert self._step(library_usage_watch) == {str(new)}
+            assert index.query("attr") == ["attr.s"]
+
+    def test_watch_file(self, tmp_path, polling: bool) -> None:
+        """Test watching a single file."""
+        app = tmp_path / "app.py"
+        _write(app, "import os\nos.getcwd()\n")
+
+        with LibraryUsageWatch(
+            str(app),
+            polling=polling,
+            debounce=0.05,
+        ) as library_usage_watch:
+            _write(tmp_path / "other.py", "import yaml\n")
+            _write(app, "import os\nos.path.join()\n")
+            assert self._step(library_usage_watch) == {str(app)}
+            assert library_usage_watch.index.to_dict()["index"] == {
+                "os": ["os.path.join"],
+            }
+
+    def test_not_started(self) -> None:
+        """Test changes cannot be processed if the watch is not started."""
+        with pytest.raises(ValueError):
+            LibraryUsageWatch(os.path.join("tests", "data")).step(0)